@@ -0,0 +1,45 @@
+"""
+Projection des médecins (id, nom, prénom, service) pour les filtres de
+l'annuaire du personnel.
+
+La liste est petite et change rarement : elle est gardée dans le cache
+partagé (SoftwareProject.projections, durée finie) et invalidée, après
+validation de la transaction, par les signaux de signals.py à chaque
+enregistrement ou suppression d'un Employe. Les opérations de masse
+(update(), bulk_create) doivent appeler invalider_medecins().
+"""
+from SoftwareProject import projections
+
+from .models import Employe
+
+CLE = 'employe:medecins'
+COLONNES = ('id', 'nom', 'prenom', 'service')
+
+
+def _requete():
+    return Employe.objects.filter(role='medecin').order_by('service', 'nom', 'prenom').values(*COLONNES)
+
+
+def medecins():
+    """[{'id', 'nom', 'prenom', 'service'}] des médecins, par service puis nom."""
+    return projections.lire(CLE, lambda: list(_requete()))
+
+
+async def amedecins():
+    """Version asynchrone de medecins() (vues async)."""
+    async def calculer():
+        return [m async for m in _requete()]
+
+    return await projections.alire(CLE, calculer)
+
+
+def services_medecins(projection):
+    """[(service, nombre de médecins)] triés par service."""
+    services = {}
+    for medecin in projection:
+        services[medecin['service']] = services.get(medecin['service'], 0) + 1
+    return sorted(services.items())
+
+
+def invalider_medecins():
+    projections.invalider_apres_validation([CLE])
@@ -0,0 +1,149 @@
+"""
+Connexion des employés (login / mot de passe de Employe).
+
+EmployeBackend vérifie le mot de passe avec les hacheurs de Django
+(PASSWORD_HASHERS) : un hachage produit avec un ancien algorithme ou un
+facteur de travail plus faible est refait au passage, à la connexion réussie.
+Les échecs sont comptés dans le cache, par login et par adresse IP : au-delà
+du seuil, les tentatives sont refusées sans même calculer de hachage.
+
+À la connexion, l'identité, le rôle et le service sont copiés dans la
+session : role_requis() n'interroge pas la table Employe à chaque requête.
+La clé de la session est notée dans SessionEmploye ; une modification de la
+fiche (rôle, mot de passe...) ou sa suppression supprime ces sessions du
+magasin de sessions (base et cache), pour tous les processus.
+
+Compteurs d'échecs et sessions sont lus dans le cache : il doit être partagé
+entre les processus (CACHE_URL, contrôlé par `manage.py check --deploy`).
+"""
+import hashlib
+import time
+from functools import wraps
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.backends import BaseBackend
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+
+from .models import Employe, SessionEmploye
+
+CLE_SESSION = 'employe'
+ECHECS_MAX_LOGIN = 5  # par login, sur DUREE_BLOCAGE
+ECHECS_MAX_IP = 50  # par adresse, tous logins confondus
+DUREE_BLOCAGE = 15 * 60
+PREFIXE = 'employe:'
+
+
+def _cles_echecs(request, login):
+    # Login haché : clé de cache ASCII de longueur fixe quel que soit le login saisi
+    cles = [PREFIXE + 'echecs:login:' + hashlib.sha256(login.encode()).hexdigest()[:32]]
+    ip = request.META.get('REMOTE_ADDR') if request is not None else None
+    if ip:
+        cles.append(PREFIXE + 'echecs:ip:' + ip)
+    return cles
+
+
+def connexion_bloquee(request, login):
+    """True si trop d'échecs récents pour ce login ou cette adresse IP."""
+    cles = _cles_echecs(request, login)
+    echecs = cache.get_many(cles)
+    return echecs.get(cles[0], 0) >= ECHECS_MAX_LOGIN or any(
+        echecs.get(cle, 0) >= ECHECS_MAX_IP for cle in cles[1:]
+    )
+
+
+def _noter_echec(request, login):
+    for cle in _cles_echecs(request, login):
+        # add() ne fait rien si la clé existe : la fenêtre part du premier échec
+        cache.add(cle, 0, DUREE_BLOCAGE)
+        try:
+            cache.incr(cle)
+        except ValueError:
+            cache.set(cle, 1, DUREE_BLOCAGE)  # expirée entre add() et incr()
+
+
+class EmployeBackend(BaseBackend):
+    """
+    authenticate(request, login=..., mot_de_passe=...) -> Employe ou None.
+    Ne répond pas aux identifiants de l'administration (username/password).
+    """
+
+    def authenticate(self, request, login=None, mot_de_passe=None):
+        if login is None or mot_de_passe is None:
+            return None
+        if connexion_bloquee(request, login):
+            # Arrête aussi les autres backends ; la vue affiche le blocage
+            raise PermissionDenied
+        employe = Employe.objects.filter(login=login).first()
+        if employe is None:
+            # Même coût qu'un mauvais mot de passe : le login n'est pas deviné au chronomètre
+            make_password(mot_de_passe)
+        else:
+            def mettre_a_jour(brut):
+                # update() : pas de signal post_save, la session en cours n'est pas révoquée
+                employe.mot_de_passe = make_password(brut)
+                Employe.objects.filter(pk=employe.pk).update(mot_de_passe=employe.mot_de_passe)
+
+            if check_password(mot_de_passe, employe.mot_de_passe, setter=mettre_a_jour):
+                cache.delete(_cles_echecs(request, login)[0])
+                return employe
+        _noter_echec(request, login)
+        return None
+
+    def get_user(self, user_id):
+        return Employe.objects.filter(pk=user_id).first()
+
+
+def connecter(request, employe):
+    """Ouvre la session de l'employé (nouvelle clé de session : pas de fixation)."""
+    request.session.cycle_key()
+    request.session[CLE_SESSION] = {
+        'id': employe.pk,
+        'nom': employe.nom,
+        'prenom': employe.prenom,
+        'role': employe.role,
+        'service': employe.service,
+        'connecte_le': time.time(),
+    }
+    # cycle_key() a déjà enregistré la session sous sa nouvelle clé
+    SessionEmploye.objects.create(session_id=request.session.session_key, employe=employe)
+
+
+def deconnecter(request):
+    # La ligne de SessionEmploye part avec la session (on_delete=CASCADE)
+    request.session.flush()
+
+
+def revoquer_sessions(employe_id):
+    """Supprime les sessions ouvertes par l'employé (base et cache)."""
+    magasin = import_module(settings.SESSION_ENGINE).SessionStore
+    for cle in SessionEmploye.objects.filter(employe_id=employe_id).values_list('session_id', flat=True):
+        magasin(cle).delete()
+
+
+def employe_connecte(request):
+    """{'id', 'nom', 'prenom', 'role', 'service', ...} de la session, ou None."""
+    return request.session.get(CLE_SESSION) or None
+
+
+def role_requis(*roles):
+    """
+    Réserve une vue aux employés connectés ayant l'un des rôles (tous si
+    aucun) ; request.employe reçoit les données de session. Le
+    superutilisateur de l'administration passe aussi (création du premier compte).
+    """
+    def decorateur(vue):
+        @wraps(vue)
+        def _vue(request, *args, **kwargs):
+            request.employe = employe = employe_connecte(request)
+            autorise = employe is not None and (not roles or employe['role'] in roles)
+            if not autorise and not request.user.is_superuser:
+                if employe is None:
+                    return redirect_to_login(request.get_full_path(), 'connexion_employe')
+                raise PermissionDenied
+            return vue(request, *args, **kwargs)
+        return _vue
+    return decorateur
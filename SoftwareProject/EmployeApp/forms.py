@@ -1,4 +1,7 @@
 from django import forms
+from django.contrib.auth import authenticate
+from django.contrib.auth.password_validation import validate_password
+from .authentification import connexion_bloquee
 from .models import Employe
 
 class EmployeForm(forms.ModelForm):
@@ -14,3 +17,31 @@ class EmployeForm(forms.ModelForm):
             'date_embauche': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
             'role': forms.Select(attrs={'class': 'form-select'}),
         }
+
+    def clean_mot_de_passe(self):
+        mot_de_passe = self.cleaned_data['mot_de_passe']
+        validate_password(mot_de_passe)
+        return mot_de_passe
+
+
+class ConnexionForm(forms.Form):
+    login = forms.CharField(max_length=50, widget=forms.TextInput(attrs={'class': 'form-control', 'autofocus': True}))
+    mot_de_passe = forms.CharField(label="Mot de passe", widget=forms.PasswordInput(attrs={'class': 'form-control'}))
+
+    def __init__(self, request, *args, **kwargs):
+        self.request = request
+        self.employe = None
+        super().__init__(*args, **kwargs)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        login, mot_de_passe = cleaned_data.get('login'), cleaned_data.get('mot_de_passe')
+        if login and mot_de_passe:
+            # authenticate() absorbe le PermissionDenied du backend : blocage relu ici
+            self.employe = authenticate(self.request, login=login, mot_de_passe=mot_de_passe)
+            if self.employe is None:
+                if connexion_bloquee(self.request, login):
+                    raise forms.ValidationError(
+                        "Trop de tentatives échouées. Réessayez dans quelques minutes.", code='bloque')
+                raise forms.ValidationError("Login ou mot de passe incorrect.", code='invalide')
+        return cleaned_data
@@ -0,0 +1,115 @@
+"""
+Coût d'une connexion d'employé selon le facteur de travail du hacheur.
+
+Pour chaque réglage (itérations PBKDF2, paramètre N de scrypt), un employé
+temporaire reçoit un mot de passe haché avec ce réglage, puis on mesure
+EmployeBackend.authenticate() (requête + vérification du hachage). On mesure
+aussi le refus d'un login bloqué et le contrôle de rôle par la session, qui
+ne calculent aucun hachage. Tout est fait dans une transaction annulée.
+"""
+import datetime
+import statistics
+import time
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, ScryptPasswordHasher, make_password
+from django.contrib.sessions.backends.cached_db import SessionStore
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+
+from EmployeApp.authentification import (
+    ECHECS_MAX_LOGIN, EmployeBackend, _cles_echecs, connecter, employe_connecte,
+)
+from EmployeApp.models import Employe
+
+MOT_DE_PASSE = 'Banc-de-mesure-2024'
+
+
+class PBKDF2Banc(PBKDF2PasswordHasher):
+    iterations = PBKDF2PasswordHasher.iterations
+
+
+class ScryptBanc(ScryptPasswordHasher):
+    work_factor = ScryptPasswordHasher.work_factor
+    # 128 * N * r octets : au-delà de N = 16384, la limite par défaut d'OpenSSL (32 Mo) est dépassée
+    maxmem = 256 * 1024 * 1024
+
+
+def _entiers(texte):
+    return [int(x) for x in texte.split(',') if x.strip()]
+
+
+def _mediane_ms(fonction, repetitions):
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append(time.perf_counter() - debut)
+    return statistics.median(durees) * 1000
+
+
+class Command(BaseCommand):
+    help = "Mesure le coût d'une connexion d'employé selon le facteur de travail du hacheur."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pbkdf2', default='100000,300000,600000,1000000',
+                            help="Itérations PBKDF2 à mesurer, séparées par des virgules")
+        parser.add_argument('--scrypt', default='8192,16384,32768',
+                            help="Paramètre N de scrypt à mesurer, séparé par des virgules")
+        parser.add_argument('--repetitions', type=int, default=5, help="Connexions par réglage (défaut : 5)")
+
+    def handle(self, *args, **options):
+        repetitions = options['repetitions']
+        backend = EmployeBackend()
+        requete = RequestFactory().post('/employes/connexion/', REMOTE_ADDR='192.0.2.1')
+        reglages = [(PBKDF2Banc, 'iterations', n) for n in _entiers(options['pbkdf2'])]
+        reglages += [(ScryptBanc, 'work_factor', n) for n in _entiers(options['scrypt'])]
+
+        with transaction.atomic():
+            employe = Employe.objects.create(
+                nom='Banc', prenom='Mesure', role='administrateur', login='__bench_connexion__',
+                mot_de_passe='', email='bench.connexion@invalid', telephone='0',
+                date_embauche=datetime.date.today(), service='Banc',
+            )
+            self.stdout.write(f"{'hacheur':<15}{'facteur':>10}{'ms/connexion':>14}{'connexions/s':>14}")
+            for hacheur, attribut, valeur in reglages:
+                chemin = f'{hacheur.__module__}.{hacheur.__name__}'
+                with override_settings(PASSWORD_HASHERS=[chemin]):
+                    setattr(hacheur, attribut, valeur)
+                    Employe.objects.filter(pk=employe.pk).update(mot_de_passe=make_password(MOT_DE_PASSE))
+                    ms = _mediane_ms(lambda: backend.authenticate(requete, employe.login, MOT_DE_PASSE), repetitions)
+                self.stdout.write(f"{hacheur.algorithm:<15}{valeur:>10}{ms:>14.1f}{1000 / ms:>14.1f}")
+
+            # Login bloqué : ni requête ni hachage (mot de passe remis au hacheur par défaut)
+            Employe.objects.filter(pk=employe.pk).update(mot_de_passe=make_password(MOT_DE_PASSE))
+            for _ in range(ECHECS_MAX_LOGIN):
+                backend.authenticate(requete, employe.login, 'faux')
+
+            def refus():
+                try:
+                    backend.authenticate(requete, employe.login, MOT_DE_PASSE)
+                except PermissionDenied:
+                    pass
+            self.stdout.write(f"Refus d'un login bloqué : {_mediane_ms(refus, 100):.3f} ms")
+
+            # Rôle relu dans la session (cache) contre une requête sur Employe
+            requete.session = SessionStore()
+            connecter(requete, employe)
+            requete.session.save()
+            cle = requete.session.session_key
+
+            def par_session():
+                requete.session = SessionStore(cle)
+                employe_connecte(requete)
+
+            def par_requete():
+                Employe.objects.only('role', 'service').get(pk=employe.pk)
+
+            self.stdout.write(f"Rôle lu en session : {_mediane_ms(par_session, 1000):.3f} ms, "
+                              f"par requête SQL : {_mediane_ms(par_requete, 1000):.3f} ms")
+
+            requete.session.delete()
+            cache.delete_many(_cles_echecs(requete, employe.login))
+            transaction.set_rollback(True)
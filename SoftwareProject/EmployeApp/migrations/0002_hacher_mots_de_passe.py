@@ -0,0 +1,23 @@
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.db import migrations
+
+
+def hacher_mots_de_passe(apps, schema_editor):
+    """Les mots de passe enregistrés en clair sont remplacés par leur hachage."""
+    Employe = apps.get_model('EmployeApp', 'Employe')
+    for employe in Employe.objects.only('id', 'mot_de_passe').iterator():
+        try:
+            identify_hasher(employe.mot_de_passe)
+        except ValueError:
+            Employe.objects.filter(pk=employe.pk).update(mot_de_passe=make_password(employe.mot_de_passe))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EmployeApp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(hacher_mots_de_passe, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EmployeApp', '0002_hacher_mots_de_passe'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employe',
+            index=models.Index(fields=['role', 'service'], name='employe_role_service_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employe',
+            index=models.Index(fields=['nom', 'prenom'], name='employe_nom_prenom_idx'),
+        ),
+    ]
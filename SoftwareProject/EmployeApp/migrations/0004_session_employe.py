@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EmployeApp', '0003_employe_index_annuaire'),
+        ('sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionEmploye',
+            fields=[
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='sessions.session')),
+                ('employe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sessions', to='EmployeApp.employe')),
+            ],
+        ),
+    ]
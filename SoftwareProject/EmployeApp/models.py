@@ -18,5 +18,26 @@ class Employe(models.Model):
     date_embauche = models.DateField()
     service = models.CharField(max_length=100)
 
+    class Meta:
+        indexes = [
+            # Annuaire du personnel : « médecins du service X »
+            models.Index(fields=['role', 'service'], name='employe_role_service_idx'),
+            # Annuaire et autocomplétion triés par nom, prénom
+            models.Index(fields=['nom', 'prenom'], name='employe_nom_prenom_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Nom lu en base : l'index de recherche n'est refait que s'il change
+        instance._nom_initial = (instance.__dict__.get('nom'), instance.__dict__.get('prenom'))
+        return instance
+
     def __str__(self):
         return f"{self.nom} {self.prenom} ({self.role})"
+
+
+class SessionEmploye(models.Model):
+    """Session ouverte par un employé (supprimée avec elle) : sert à la révoquer."""
+    session = models.OneToOneField('sessions.Session', primary_key=True, on_delete=models.CASCADE)
+    employe = models.ForeignKey(Employe, on_delete=models.CASCADE, related_name='sessions')
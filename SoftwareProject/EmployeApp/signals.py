@@ -0,0 +1,27 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .annuaire import invalider_medecins
+from .authentification import revoquer_sessions
+from .models import Employe
+
+
+# Rôle, service et identité sont copiés dans la session à la connexion :
+# toute modification de la fiche oblige à se reconnecter
+@receiver(post_save, sender=Employe)
+def revoquer_apres_modification(sender, instance, created=False, **kwargs):
+    if not created:
+        revoquer_sessions(instance.pk)
+
+
+# Avant la suppression : ensuite, SessionEmploye n'a plus les clés (CASCADE)
+@receiver(pre_delete, sender=Employe)
+def revoquer_avant_suppression(sender, instance, **kwargs):
+    revoquer_sessions(instance.pk)
+
+
+# Projection des médecins de l'annuaire
+@receiver(post_save, sender=Employe)
+@receiver(post_delete, sender=Employe)
+def invalider_projection_medecins(sender, **kwargs):
+    invalider_medecins()
@@ -1,3 +1,239 @@
-from django.test import TestCase
+import datetime
+import importlib
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from RendezVousApp.recherche import indexer_employes
+
+from .annuaire import medecins
+from .authentification import ECHECS_MAX_IP, ECHECS_MAX_LOGIN
+from .models import Employe, SessionEmploye
+from .views import EMPLOYES_PAR_PAGE
+
+# Hacheur rapide pour les tests ; le coût réel se mesure avec bench_connexion
+HACHEURS_RAPIDES = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=HACHEURS_RAPIDES)
+class ConnexionEmployeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.creer('admin', 'administrateur', 'Direction')
+        cls.infirmiere = cls.creer('infirmiere', 'infirmiere', 'Urgences')
+
+    @classmethod
+    def creer(cls, login, role, service):
+        return Employe.objects.create(
+            nom=login.capitalize(), prenom='Test', role=role, login=login,
+            mot_de_passe=make_password('Clinique-2024'), email=f'{login}@clinique.tn',
+            telephone='71000000', date_embauche=datetime.date(2020, 1, 1), service=service,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def connecter(self, login, mot_de_passe='Clinique-2024', **extra):
+        return self.client.post(reverse('connexion_employe'), {'login': login, 'mot_de_passe': mot_de_passe}, **extra)
+
+    def test_connexion_role_en_session(self):
+        response = self.client.post(reverse('connexion_employe') + '?next=/employes/ajouter/',
+                                    {'login': 'admin', 'mot_de_passe': 'Clinique-2024', 'next': '/employes/ajouter/'})
+        self.assertRedirects(response, reverse('ajouter_employe'))
+        donnees = self.client.session['employe']
+        self.assertEqual((donnees['id'], donnees['role'], donnees['service']),
+                         (self.admin.pk, 'administrateur', 'Direction'))
+        # Redirection externe ignorée
+        response = self.client.post(reverse('connexion_employe'),
+                                    {'login': 'admin', 'mot_de_passe': 'Clinique-2024', 'next': 'https://exemple.com/'})
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+
+    def test_mauvais_mot_de_passe_puis_blocage(self):
+        for _ in range(ECHECS_MAX_LOGIN - 1):
+            response = self.connecter('admin', 'faux')
+            self.assertContains(response, 'Login ou mot de passe incorrect.')
+        # Le dernier échec autorisé annonce le blocage
+        self.assertContains(self.connecter('admin', 'faux'), 'Trop de tentatives')
+        # Même le bon mot de passe est refusé, sans requête ni hachage
+        with self.assertNumQueries(0):
+            self.assertIsNone(authenticate(None, login='admin', mot_de_passe='Clinique-2024'))
+        response = self.connecter('admin')
+        self.assertContains(response, 'Trop de tentatives')
+        self.assertNotIn('employe', self.client.session)
+        # Les autres logins ne sont pas touchés
+        self.assertRedirects(self.connecter('infirmiere'), reverse('home'), fetch_redirect_response=False)
+
+    def test_blocage_par_adresse_ip(self):
+        for i in range(ECHECS_MAX_IP):
+            self.connecter(f'inconnu{i}', 'faux', REMOTE_ADDR='10.0.0.9')
+        response = self.connecter('admin', REMOTE_ADDR='10.0.0.9')
+        self.assertContains(response, 'Trop de tentatives')
+        self.assertRedirects(self.connecter('admin', REMOTE_ADDR='10.0.0.10'), reverse('home'),
+                             fetch_redirect_response=False)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.ScryptPasswordHasher'] + HACHEURS_RAPIDES)
+    def test_hachage_mis_a_jour_a_la_connexion(self):
+        self.assertTrue(self.admin.mot_de_passe.startswith('md5$'))
+        self.assertIsNotNone(authenticate(None, login='admin', mot_de_passe='Clinique-2024'))
+        self.admin.refresh_from_db()
+        self.assertTrue(self.admin.mot_de_passe.startswith('scrypt$'))
+        self.assertTrue(check_password('Clinique-2024', self.admin.mot_de_passe))
+
+    def test_role_requis(self):
+        url = reverse('ajouter_employe')
+        self.assertRedirects(self.client.get(url), f"{reverse('connexion_employe')}?next={url}")
+        self.connecter('infirmiere')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.connecter('admin')
+        # Rôle lu dans la session (en cache) : aucune requête sur Employe
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_modification_de_la_fiche_revoque_la_session(self):
+        self.connecter('admin')
+        self.admin.role = 'medecin'
+        self.admin.save()
+        url = reverse('ajouter_employe')
+        self.assertRedirects(self.client.get(url), f"{reverse('connexion_employe')}?next={url}")
+        self.admin.role = 'administrateur'
+        self.admin.save()
+        self.connecter('admin')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_revocation_en_base_pour_toutes_les_sessions(self):
+        autre = self.client_class()
+        autre.post(reverse('connexion_employe'), {'login': 'admin', 'mot_de_passe': 'Clinique-2024'})
+        self.connecter('admin')
+        cles = [self.client.session.session_key, autre.session.session_key]
+        self.assertEqual(set(SessionEmploye.objects.filter(employe=self.admin).values_list('session_id', flat=True)),
+                         set(cles))
+        self.admin.telephone = '71999999'
+        self.admin.save()
+        # Sessions supprimées de la base (et du cache) : aucun processus ne les relit
+        self.assertFalse(Session.objects.filter(pk__in=cles).exists())
+        url = reverse('ajouter_employe')
+        for client in (self.client, autre):
+            self.assertRedirects(client.get(url), f"{reverse('connexion_employe')}?next={url}")
+
+    def test_suppression_de_la_fiche(self):
+        self.connecter('infirmiere')
+        cle = self.client.session.session_key
+        self.infirmiere.delete()
+        self.assertFalse(Session.objects.filter(pk=cle).exists())
+        self.assertNotIn('employe', self.client.session)
+
+    def test_deconnexion(self):
+        self.connecter('admin')
+        self.assertEqual(self.client.get(reverse('deconnexion_employe')).status_code, 405)
+        self.client.post(reverse('deconnexion_employe'))
+        self.assertNotIn('employe', self.client.session)
+        self.assertFalse(SessionEmploye.objects.exists())
+
+    def test_ajout_employe_mot_de_passe_hache(self):
+        self.connecter('admin')
+        response = self.client.post(reverse('ajouter_employe'), {
+            'nom': 'Gharbi', 'prenom': 'Ines', 'role': 'medecin', 'login': 'igharbi',
+            'mot_de_passe': 'Stethoscope-42', 'email': 'i.gharbi@clinique.tn', 'telephone': '71000001',
+            'date_embauche': '2023-09-01', 'service': 'Pédiatrie',
+        })
+        self.assertRedirects(response, reverse('liste_employes'))
+        employe = Employe.objects.get(login='igharbi')
+        self.assertNotEqual(employe.mot_de_passe, 'Stethoscope-42')
+        self.assertIsNotNone(authenticate(None, login='igharbi', mot_de_passe='Stethoscope-42'))
+        # Mot de passe trop faible refusé par AUTH_PASSWORD_VALIDATORS
+        response = self.client.post(reverse('ajouter_employe'), {
+            'nom': 'Saidi', 'prenom': 'Sami', 'role': 'medecin', 'login': 'ssaidi',
+            'mot_de_passe': '1234', 'email': 's.saidi@clinique.tn', 'telephone': '71000002',
+            'date_embauche': '2023-09-01', 'service': 'Pédiatrie',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Employe.objects.filter(login='ssaidi').exists())
+
+    def test_migration_hache_les_mots_de_passe_en_clair(self):
+        Employe.objects.filter(pk=self.infirmiere.pk).update(mot_de_passe='en-clair')
+        migration = importlib.import_module('EmployeApp.migrations.0002_hacher_mots_de_passe')
+        migration.hacher_mots_de_passe(apps, None)
+        self.infirmiere.refresh_from_db()
+        self.assertTrue(check_password('en-clair', self.infirmiere.mot_de_passe))
+        self.admin.refresh_from_db()
+        self.assertTrue(check_password('Clinique-2024', self.admin.mot_de_passe))
+
+
+class ListeEmployesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        services = ['Cardiologie', 'Pédiatrie', 'Urgences']
+        employes = Employe.objects.bulk_create([
+            Employe(nom=f'Nom{i:03d}', prenom=f'Prenom{i:03d}', role=['medecin', 'infirmiere', 'medecin'][i % 3],
+                    login=f'emp{i}', mot_de_passe='!', email=f'emp{i}@clinique.tn', telephone='71000000',
+                    date_embauche=datetime.date(2020, 1, 1), service=services[i % 4 % 3])
+            for i in range(60)
+        ])
+        # bulk_create ne déclenche pas les signaux qui tiennent l'index de recherche
+        indexer_employes(employes)
+
+    def setUp(self):
+        cache.clear()
+
+    def page(self, **params):
+        response = self.client.get(reverse('liste_employes'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['page_obj']
+
+    def parcourir(self, **params):
+        page = self.page(**params)
+        noms = [e.nom for e in page]
+        while page.has_next():
+            page = self.page(curseur=page.curseur_suivant, **params)
+            noms += [e.nom for e in page]
+        return noms
+
+    def test_parcours_et_filtres(self):
+        self.assertEqual(len(self.page()), EMPLOYES_PAR_PAGE)
+        self.assertEqual(self.parcourir(), [f'Nom{i:03d}' for i in range(60)])
+        attendu = list(Employe.objects.filter(role='medecin', service='Pédiatrie')
+                       .order_by('nom').values_list('nom', flat=True))
+        self.assertTrue(attendu)
+        self.assertEqual(self.parcourir(role='medecin', service='Pédiatrie'), attendu)
+        self.assertEqual([e.nom for e in self.page(search='prenom012')], ['Nom012'])
+        # Rôle inconnu ignoré
+        self.assertEqual(len(self.page(role='directeur')), EMPLOYES_PAR_PAGE)
+
+    def test_projection_des_medecins_en_cache(self):
+        response = self.client.get(reverse('liste_employes'))
+        nb_pediatres = Employe.objects.filter(role='medecin', service='Pédiatrie').count()
+        self.assertIn(('Pédiatrie', nb_pediatres), response.context['services'])
+        # Projection en cache : une seule requête, celle de la page
+        with self.assertNumQueries(1):
+            self.page(role='medecin')
+        # Rafraîchie quand un employé change
+        employe = Employe.objects.filter(role='infirmiere').first()
+        employe.role, employe.service = 'medecin', 'Radiologie'
+        with self.captureOnCommitCallbacks(execute=True):
+            employe.save()
+        self.assertIn(('Radiologie', 1), self.client.get(reverse('liste_employes')).context['services'])
+        self.assertEqual(medecins()[0]['service'], 'Cardiologie')
+        with self.captureOnCommitCallbacks(execute=True):
+            employe.delete()
+        self.assertNotIn('Radiologie', [m['service'] for m in medecins()])
+
+    def test_filtres_lus_dans_les_index(self):
+        for params, index in [({'role': 'medecin', 'service': 'Urgences'}, 'employe_role_service_idx'),
+                              ({}, 'employe_nom_prenom_idx')]:
+            self.page()  # projection en cache
+            with CaptureQueriesContext(connection) as requetes:
+                self.page(**params)
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + requetes[0]['sql'])
+                details = [ligne[-1] for ligne in cursor.fetchall()]
+            with self.subTest(index=index):
+                self.assertTrue(any(index in d for d in details), details)
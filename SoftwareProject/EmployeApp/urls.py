@@ -4,4 +4,7 @@ from . import views
 urlpatterns = [
     path('ajouter/', views.ajouter_employe, name='ajouter_employe'),
     path('liste/', views.liste_employes, name='liste_employes'),
+    path('async/liste/', views.aliste_employes, name='liste_employes_async'),
+    path('connexion/', views.connexion, name='connexion_employe'),
+    path('deconnexion/', views.deconnexion, name='deconnexion_employe'),
 ]
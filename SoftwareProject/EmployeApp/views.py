@@ -1,16 +1,47 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import make_password
 from django.shortcuts import render, redirect
-from .forms import EmployeForm
+from django.template.response import TemplateResponse
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.cache import never_cache
+from django.views.decorators.debug import sensitive_post_parameters
+from django.views.decorators.http import require_POST
+from .authentification import connecter, deconnecter, role_requis
+from .forms import ConnexionForm, EmployeForm
 from django.contrib import messages
 from .models import Employe
+from .annuaire import medecins, amedecins, services_medecins
+from RendezVousApp.pagination import CurseurPaginator
+from RendezVousApp.recherche import filtrer_employes
+from SoftwareProject.exports import format_demande, reponse_export
 
+EMPLOYES_PAR_PAGE = 25
+ORDRE = ('nom', 'prenom', 'id')
+ROLES = {role for role, _ in Employe.ROLE_CHOICES}
+# Colonnes affichées : le mot de passe n'est pas chargé
+COLONNES_LISTE = ('id', 'nom', 'prenom', 'role', 'service', 'email', 'telephone')
+
+# mot_de_passe n'est jamais exporté ; login et email : export réservé aux administrateurs
+COLONNES_EXPORT = [
+    ('id', 'ID'),
+    ('nom', 'Nom'),
+    ('prenom', 'Prénom'),
+    ('role', 'Rôle'),
+    ('service', 'Service'),
+    ('login', 'Login'),
+    ('email', 'Email'),
+    ('telephone', 'Téléphone'),
+    ('date_embauche', "Date d'embauche"),
+]
+
+@sensitive_post_parameters('mot_de_passe')
+@role_requis('administrateur')
 def ajouter_employe(request):
     if request.method == 'POST':
         form = EmployeForm(request.POST)
         if form.is_valid():
-            # Hasher le mot de passe si tu veux
             employe = form.save(commit=False)
-            # from django.contrib.auth.hashers import make_password
-            # employe.mot_de_passe = make_password(form.cleaned_data['mot_de_passe'])
+            employe.mot_de_passe = make_password(form.cleaned_data['mot_de_passe'])
             employe.save()
             messages.success(request, "Employé ajouté avec succès !")
             return redirect('liste_employes')
@@ -19,8 +50,84 @@ def ajouter_employe(request):
     return render(request, 'Employe/ajouter_employe.html', {'form': form})
 
 
+@sensitive_post_parameters('mot_de_passe')
+@never_cache
+def connexion(request):
+    suivant = request.POST.get('next', request.GET.get('next', ''))
+    if not url_has_allowed_host_and_scheme(suivant, allowed_hosts={request.get_host()},
+                                           require_https=request.is_secure()):
+        suivant = ''
+    if request.method == 'POST':
+        form = ConnexionForm(request, request.POST)
+        if form.is_valid():
+            connecter(request, form.employe)
+            return redirect(suivant or 'home')
+    else:
+        form = ConnexionForm(request)
+    return render(request, 'Employe/connexion.html', {'form': form, 'next': suivant})
+
+
+@require_POST
+def deconnexion(request):
+    deconnecter(request)
+    return redirect('connexion_employe')
+
+
+
+
+def _employes_demandes(request):
+    """(employés filtrés, filtres retenus) de la liste."""
+    employes = Employe.objects.only(*COLONNES_LISTE)
+
+    # Filtres : rôle et service (index role, service), nom ou prénom (index de termes)
+    role = request.GET.get('role', '')
+    if role not in ROLES:
+        role = ''
+    service = request.GET.get('service', '').strip()
+    search = request.GET.get('search', '').strip()
+    if role:
+        employes = employes.filter(role=role)
+    if service:
+        employes = employes.filter(service=service)
+    if search:
+        employes = filtrer_employes(employes, search)
+    return employes, {'role': role, 'service': service, 'search': search}
+
+
+def _contexte_employes(page_obj, projection, filtres):
+    return {
+        'employes': page_obj,
+        'page_obj': page_obj,
+        'roles': Employe.ROLE_CHOICES,
+        # Services proposés au filtre : projection des médecins en cache
+        'services': services_medecins(projection),
+        **filtres,
+    }
+
+
+@role_requis('administrateur')
+def exporter_employes(request):
+    """?export=csv|xlsx de la liste : logins et emails, administrateurs seulement."""
+    employes, _ = _employes_demandes(request)
+    return reponse_export(request, employes.order_by(*ORDRE), COLONNES_EXPORT, 'employes')
 
 
 def liste_employes(request):
-    employes = Employe.objects.all()
-    return render(request, 'Employe/liste_employes.html', {'employes': employes})
+    if format_demande(request):
+        return exporter_employes(request)
+    employes, filtres = _employes_demandes(request)
+
+    # Pagination par curseur dans l'ordre de l'index (nom, prenom)
+    page_obj = CurseurPaginator(employes, EMPLOYES_PAR_PAGE, ORDRE).page(request.GET.get('curseur'))
+    return render(request, 'Employe/liste_employes.html', _contexte_employes(page_obj, medecins(), filtres))
+
+
+async def aliste_employes(request):
+    """Version async de liste_employes() (ORM asynchrone), pour ASGI."""
+    if format_demande(request):
+        # Contrôle du rôle : session lue de façon synchrone
+        return await sync_to_async(exporter_employes)(request)
+    employes, filtres = _employes_demandes(request)
+    page_obj = await CurseurPaginator(employes, EMPLOYES_PAR_PAGE, ORDRE).apage(request.GET.get('curseur'))
+    return TemplateResponse(request, 'Employe/liste_employes.html',
+                            _contexte_employes(page_obj, await amedecins(), filtres))
@@ -0,0 +1,72 @@
+"""
+Alertes d'expiration du matériel (hors service exclu).
+
+Le résumé du jour (matériels expirés, et expirant sous 7, 30 et 90 jours)
+est calculé en une seule requête : un intervalle DateExpiration <= J+90
+lu dans l'index materiel_expiration_idx, compté par tranche. Il est gardé
+dans le cache partagé sous une clé datée et versionnée
+(SoftwareProject.projections), pour au plus DUREE_CACHE : recalculé chaque
+jour, ou d'avance par la commande alertes_expiration pour tous les workers.
+Les signaux de signals.py l'invalident, après validation, à chaque
+enregistrement ou suppression d'un MaterielMedical.
+"""
+import datetime
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from SoftwareProject import projections
+from .models import EtatMateriel, MaterielMedical
+
+ECHEANCES = (7, 30, 90)
+PREFIXE = 'materiel:expirations:'
+DUREE_CACHE = 24 * 3600
+
+
+def _cle(jour):
+    return f'{PREFIXE}{jour.isoformat()}'
+
+
+def echeance(jour, jours):
+    return jour + datetime.timedelta(days=jours)
+
+
+def materiels_a_surveiller(jour, jours=ECHEANCES[-1]):
+    """Matériels en usage expirés ou expirant au plus tard à J+`jours`."""
+    return (MaterielMedical.objects.exclude(Etat=EtatMateriel.HORS_SERVICE)
+            .filter(DateExpiration__lte=echeance(jour, jours)))
+
+
+def _agregats(jour):
+    return {
+        'expires': Count('IdMaterial', filter=Q(DateExpiration__lt=jour)),
+        **{f'sous_{jours}': Count('IdMaterial', filter=Q(DateExpiration__gte=jour,
+                                                         DateExpiration__lte=echeance(jour, jours)))
+           for jours in ECHEANCES},
+    }
+
+
+def _resume(valeurs):
+    return {'expires': valeurs['expires'],
+            'echeances': [(jours, valeurs[f'sous_{jours}']) for jours in ECHEANCES]}
+
+
+def resume_expirations(jour=None):
+    """{'expires': n, 'echeances': [(7, n), (30, n), (90, n)]} du jour."""
+    jour = jour or timezone.localdate()
+    return projections.lire(
+        _cle(jour), lambda: _resume(materiels_a_surveiller(jour).aggregate(**_agregats(jour))), DUREE_CACHE)
+
+
+async def aresume_expirations(jour=None):
+    """Version asynchrone de resume_expirations() (vues async)."""
+    jour = jour or timezone.localdate()
+
+    async def calculer():
+        return _resume(await materiels_a_surveiller(jour).aaggregate(**_agregats(jour)))
+
+    return await projections.alire(_cle(jour), calculer, DUREE_CACHE)
+
+
+def invalider_expirations():
+    projections.invalider_apres_validation([_cle(timezone.localdate())])
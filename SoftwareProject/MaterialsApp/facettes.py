@@ -0,0 +1,39 @@
+"""
+Liste des types de matériel (avec le nombre de matériels de chaque type,
+hors service exclus) pour le filtre de l'inventaire.
+
+Elle est calculée en une requête GROUP BY puis gardée dans le cache partagé
+(SoftwareProject.projections : clé versionnée, durée finie) ; les signaux de
+signals.py l'invalident, après validation, à chaque enregistrement ou
+suppression d'un MaterielMedical. Les opérations de masse (update(),
+bulk_create) doivent appeler invalider_types().
+"""
+from django.db.models import Count
+
+from SoftwareProject import projections
+from .models import EtatMateriel, MaterielMedical
+
+CLE = 'materiel:types'
+
+
+def _requete():
+    return (MaterielMedical.objects.exclude(Etat=EtatMateriel.HORS_SERVICE)
+            .values('Type').annotate(n=Count('IdMaterial')).order_by('Type')
+            .values_list('Type', 'n'))
+
+
+def types_materiels():
+    """[(type, nombre de matériels)] triés par type."""
+    return projections.lire(CLE, lambda: list(_requete()))
+
+
+async def atypes_materiels():
+    """Version asynchrone de types_materiels() (vues async)."""
+    async def calculer():
+        return [t async for t in _requete()]
+
+    return await projections.alire(CLE, calculer)
+
+
+def invalider_types():
+    projections.invalider_apres_validation([CLE])
@@ -0,0 +1,55 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from MaterialsApp.expirations import ECHEANCES, materiels_a_surveiller, resume_expirations
+
+COLONNES = ('IdMaterial', 'Nom', 'Type', 'Reference', 'Etat', 'DateExpiration')
+
+
+class Command(BaseCommand):
+    help = "Liste le matériel en usage expiré ou qui expire bientôt, et prépare le résumé du jour."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=ECHEANCES[1],
+                            help=f"Échéance en jours à partir d'aujourd'hui (défaut : {ECHEANCES[1]})")
+        parser.add_argument('--rapport', help="Fichier CSV où écrire les alertes")
+
+    def handle(self, *args, **options):
+        if options['jours'] < 0:
+            raise CommandError("--jours doit être positif.")
+        today = timezone.localdate()
+        try:
+            sortie = open(options['rapport'], 'w', encoding='utf-8', newline='') if options['rapport'] else None
+        except OSError as e:
+            raise CommandError(e)
+        writer = csv.writer(sortie) if sortie else None
+        if writer:
+            writer.writerow([*COLONNES, 'jours_restants'])
+
+        # Un seul intervalle de l'index materiel_expiration_idx, dans l'ordre des dates
+        materiels = (materiels_a_surveiller(today, options['jours'])
+                     .order_by('DateExpiration', 'IdMaterial').values_list(*COLONNES))
+        alertes = 0
+        try:
+            for alertes, ligne in enumerate(materiels.iterator(), start=1):
+                restant = (ligne[-1] - today).days
+                if writer:
+                    writer.writerow([*ligne, restant])
+                else:
+                    pk, nom, type_materiel, reference, etat, date_expiration = ligne
+                    statut = 'EXPIRÉ' if restant < 0 else f"dans {restant} j"
+                    self.stdout.write(f"{date_expiration} ({statut}) {pk} {nom} [{type_materiel}] {reference} {etat}")
+        finally:
+            if sortie:
+                sortie.close()
+
+        # Résumé du jour rangé dans le cache partagé : le widget de l'inventaire
+        # le lit ensuite sans requête, dans tous les workers
+        resume = resume_expirations(today)
+        echeances = ', '.join(f"{nombre} sous {jours} j" for jours, nombre in resume['echeances'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{alertes} alertes d'expiration à {options['jours']} jours "
+            f"({resume['expires']} expirés, {echeances})."
+        ))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MaterialsApp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='materielmedical',
+            index=models.Index(fields=['Nom', 'IdMaterial'], name='materiel_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='materielmedical',
+            index=models.Index(fields=['Etat', 'Nom', 'IdMaterial'], name='materiel_etat_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='materielmedical',
+            index=models.Index(fields=['Type', 'Nom', 'IdMaterial'], name='materiel_type_nom_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MaterialsApp', '0002_materiel_index_inventaire'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='materielmedical',
+            index=models.Index(fields=['DateExpiration', 'Etat'], name='materiel_expiration_idx'),
+        ),
+    ]
@@ -21,5 +21,15 @@ class MaterielMedical(models.Model):
     DateAcquisition = models.DateField()
     DateExpiration = models.DateField()
 
+    class Meta:
+        indexes = [
+            # Inventaire trié par nom ; filtre par état ou par type, puis par nom
+            models.Index(fields=['Nom', 'IdMaterial'], name='materiel_nom_idx'),
+            models.Index(fields=['Etat', 'Nom', 'IdMaterial'], name='materiel_etat_nom_idx'),
+            models.Index(fields=['Type', 'Nom', 'IdMaterial'], name='materiel_type_nom_idx'),
+            # Alertes d'expiration : intervalle de dates, état lu dans l'index
+            models.Index(fields=['DateExpiration', 'Etat'], name='materiel_expiration_idx'),
+        ]
+
     def __str__(self):
         return f"{self.Nom} ({self.Etat})"
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .expirations import invalider_expirations
+from .facettes import invalider_types
+from .models import MaterielMedical
+
+
+# Types (et nombre de matériels par type) du filtre de l'inventaire
+@receiver(post_save, sender=MaterielMedical)
+@receiver(post_delete, sender=MaterielMedical)
+def invalider_types_materiels(sender, **kwargs):
+    invalider_types()
+
+
+# Résumé des expirations du jour (widget de l'inventaire)
+@receiver(post_save, sender=MaterielMedical)
+@receiver(post_delete, sender=MaterielMedical)
+def invalider_expirations_materiels(sender, **kwargs):
+    invalider_expirations()
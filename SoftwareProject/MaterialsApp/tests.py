@@ -1,3 +1,169 @@
+import datetime
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .expirations import resume_expirations
+from .facettes import types_materiels
+from .models import EtatMateriel, MaterielMedical
+from .views import HORS_SERVICE_AFFICHES, MATERIELS_PAR_PAGE
+
+TYPES = ['Diagnostic', 'Chirurgie', 'Imagerie']
+ETATS = [EtatMateriel.EN_SERVICE, EtatMateriel.EN_MAINTENANCE, EtatMateriel.EN_PRET, EtatMateriel.HORS_SERVICE]
+
+
+class InventaireMaterielTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        MaterielMedical.objects.bulk_create([
+            MaterielMedical(Nom=f'Materiel{i:03d}', Type=TYPES[i % 3], Reference=f'REF-{i}',
+                            Etat=ETATS[i % 4], Quantite=1, PrixAchat=100,
+                            DateAcquisition=datetime.date(2020, 1, 1),
+                            DateExpiration=datetime.date(2020 + i % 10, 1, 1))
+            for i in range(80)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def page(self, **params):
+        response = self.client.get(reverse('liste_materiels'), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def parcourir(self, **params):
+        page = self.page(**params).context['page_obj']
+        noms = [m['Nom'] for m in page]
+        while page.has_next():
+            page = self.page(curseur=page.curseur_suivant, **params).context['page_obj']
+            noms += [m['Nom'] for m in page]
+        return noms
+
+    def test_parcours_et_tris(self):
+        actifs = MaterielMedical.objects.exclude(Etat=EtatMateriel.HORS_SERVICE)
+        self.assertEqual(len(self.page().context['page_obj']), MATERIELS_PAR_PAGE)
+        self.assertEqual(self.parcourir(), list(actifs.order_by('Nom').values_list('Nom', flat=True)))
+        self.assertEqual(self.parcourir(tri='-type'),
+                         list(actifs.order_by('-Type', '-Nom').values_list('Nom', flat=True)))
+        # Tri inconnu : par nom
+        self.assertEqual(self.page(tri='prix').context['tri'], 'nom')
+        # Filtre d'état : hors service compris, section à part non calculée
+        response = self.page(etat='hors_service')
+        self.assertEqual(len(response.context['page_obj']), 20)
+        self.assertEqual(response.context['materiels_hors_service'], [])
+
+    def test_section_hors_service_limitee(self):
+        context = self.page().context
+        self.assertEqual(len(context['materiels_hors_service']), HORS_SERVICE_AFFICHES)
+        self.assertTrue(context['autres_hors_service'])
+
+    def test_variante_json(self):
+        donnees = self.page(format='json', tri='type').json()
+        self.assertEqual([m['Type'] for m in donnees['materiels'][19:21]], ['Chirurgie', 'Diagnostic'])
+        self.assertIn({'type': 'Imagerie', 'nombre': 20}, donnees['types'])
+        self.assertIsNone(donnees['curseur_precedent'])
+        noms = [m['Nom'] for m in donnees['materiels']]
+        while donnees['curseur_suivant']:
+            donnees = self.page(format='json', tri='type', curseur=donnees['curseur_suivant']).json()
+            noms += [m['Nom'] for m in donnees['materiels']]
+        self.assertEqual(noms, self.parcourir(tri='type'))
+        materiels = self.page(format='json', type='Imagerie').json()['materiels']
+        self.assertEqual({m['Type'] for m in materiels}, {'Imagerie'})
+        today = timezone.localdate()
+        for m in materiels:
+            self.assertEqual(m['expire'], datetime.date.fromisoformat(m['DateExpiration']) < today)
+
+    def test_types_en_cache_et_invalides(self):
+        self.assertEqual(types_materiels(), [('Chirurgie', 20), ('Diagnostic', 20), ('Imagerie', 20)])
+        with self.assertNumQueries(0):
+            types_materiels()
+        materiel = MaterielMedical.objects.filter(Type='Imagerie').exclude(Etat=EtatMateriel.HORS_SERVICE).first()
+        materiel.Type = 'Laboratoire'
+        with self.captureOnCommitCallbacks(execute=True):
+            materiel.save()
+        self.assertIn(('Laboratoire', 1), types_materiels())
+        self.assertIn(('Imagerie', 19), types_materiels())
+        with self.captureOnCommitCallbacks(execute=True):
+            materiel.delete()
+        self.assertNotIn('Laboratoire', [t for t, _ in types_materiels()])
+
+    def test_filtres_lus_dans_les_index(self):
+        for params, index in [({'type': 'Chirurgie'}, 'materiel_type_nom_idx'),
+                              ({'etat': 'en_pret'}, 'materiel_etat_nom_idx')]:
+            self.page()  # types en cache
+            with CaptureQueriesContext(connection) as requetes:
+                self.page(format='json', **params)
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + requetes[0]['sql'])
+                details = [ligne[-1] for ligne in cursor.fetchall()]
+            with self.subTest(index=index):
+                self.assertTrue(any(index in d for d in details), details)
+
+
+class AlertesExpirationTests(TestCase):
+    # Jours restants avant expiration (négatif : déjà expiré)
+    RESTANTS = [-400, -1, 0, 5, 7, 8, 30, 31, 90, 91, 365]
+
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.localdate()
+        MaterielMedical.objects.bulk_create([
+            MaterielMedical(Nom=f'Materiel{i:02d}', Type='Diagnostic', Reference=f'REF-{i}',
+                            Etat=EtatMateriel.EN_SERVICE, Quantite=1, PrixAchat=100,
+                            DateAcquisition=datetime.date(2020, 1, 1),
+                            DateExpiration=today + datetime.timedelta(days=restant))
+            for i, restant in enumerate(cls.RESTANTS)
+        ])
+        # Hors service : jamais signalé
+        MaterielMedical.objects.create(Nom='Ancien', Type='Diagnostic', Reference='REF-X',
+                                       Etat=EtatMateriel.HORS_SERVICE, Quantite=1, PrixAchat=1,
+                                       DateAcquisition=datetime.date(2020, 1, 1), DateExpiration=today)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_resume_du_jour_en_une_requete(self):
+        with CaptureQueriesContext(connection) as requetes:
+            resume = resume_expirations()
+        self.assertEqual(resume, {'expires': 2, 'echeances': [(7, 3), (30, 5), (90, 7)]})
+        self.assertEqual(len(requetes), 1)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + requetes[0]['sql'])
+            details = [ligne[-1] for ligne in cursor.fetchall()]
+        self.assertTrue(any('COVERING INDEX materiel_expiration_idx' in d for d in details), details)
+        # En cache, puis recalculé après une modification
+        with self.assertNumQueries(0):
+            resume_expirations()
+        materiel = MaterielMedical.objects.get(Nom='Materiel10')
+        materiel.DateExpiration = timezone.localdate()
+        with self.captureOnCommitCallbacks(execute=True):
+            materiel.save()
+        self.assertEqual(resume_expirations()['echeances'], [(7, 4), (30, 6), (90, 8)])
+
+    def test_widget_et_filtre_de_l_inventaire(self):
+        response = self.client.get(reverse('liste_materiels'), {'expiration': '30'})
+        self.assertEqual(response.context['expirations']['expires'], 2)
+        self.assertEqual([m['Nom'] for m in response.context['page_obj']],
+                         ['Materiel02', 'Materiel03', 'Materiel04', 'Materiel05', 'Materiel06'])
+        self.assertContains(response, 'Expirent sous 90 jours')
+        response = self.client.get(reverse('liste_materiels'), {'expiration': 'expire'})
+        self.assertEqual([m['Nom'] for m in response.context['page_obj']], ['Materiel00', 'Materiel01'])
 
-# Create your tests here.
+    def test_commande_alertes(self):
+        sortie = StringIO()
+        call_command('alertes_expiration', '--jours', '7', stdout=sortie)
+        lignes = sortie.getvalue().splitlines()
+        self.assertEqual([ligne.split(') ')[1].split()[1] for ligne in lignes[:-1]],
+                         ['Materiel00', 'Materiel01', 'Materiel02', 'Materiel03', 'Materiel04'])
+        self.assertIn('(EXPIRÉ)', lignes[0])
+        self.assertIn('5 alertes', lignes[-1])
+        # Résumé du jour préparé pour le widget
+        with self.assertNumQueries(0):
+            resume_expirations()
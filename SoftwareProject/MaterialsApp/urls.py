@@ -11,6 +11,9 @@ urlpatterns = [
     path('materiel/<int:pk>/modifier/', views.modifier_materiel, name='modifier_materiel'),
     path('supprimer/<int:pk>/', views.supprimer_materiel, name='supprimer_materiel'),
     path('detail/<int:pk>/', views.materiel_detail, name='materiel_detail'),
+    # Variantes async (ORM asynchrone), pour un déploiement ASGI
+    path('async/materiel/', views.aliste_materiels, name='liste_materiels_async'),
+    path('async/detail/<int:pk>/', views.amateriel_detail, name='materiel_detail_async'),
     path('materiel/<int:pk>/maintenance/', views.mettre_en_maintenance, name='mettre_en_maintenance'),
 path('materiel/<int:pk>/remettre_service/', views.remettre_en_service, name='remettre_en_service'),
 path('materiel/<int:pk>/reparer/', views.reparer_materiel, name='reparer_materiel'),
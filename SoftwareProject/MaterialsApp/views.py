@@ -1,46 +1,178 @@
-from django.shortcuts import render, get_object_or_404, redirect
-from .models import MaterielMedical
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
+from django.template.response import TemplateResponse
+from .models import EtatMateriel, MaterielMedical
 from .forms import MaterielMedicalForm
 from django.contrib import messages
 from datetime import date
 from django.utils import timezone
+from django.http import JsonResponse
+from django.utils.http import urlencode
+from RendezVousApp.pagination import CurseurPaginator
+from SoftwareProject.exports import format_demande, reponse_export
+from .expirations import ECHEANCES, resume_expirations, aresume_expirations, echeance
+from .facettes import types_materiels, atypes_materiels
 
+MATERIELS_PAR_PAGE = 25
+HORS_SERVICE_AFFICHES = 12
+# Colonnes triables -> ordre du curseur (chacun servi par un index de MaterielMedical)
+TRIS = {
+    'nom': ('Nom', 'IdMaterial'),
+    'type': ('Type', 'Nom', 'IdMaterial'),
+    'etat': ('Etat', 'Nom', 'IdMaterial'),
+}
+COLONNES_LISTE = ('IdMaterial', 'Nom', 'Type', 'Reference', 'Etat', 'Quantite', 'PrixAchat',
+                  'DateAcquisition', 'DateExpiration')
+COLONNES_EXPORT = [
+    ('IdMaterial', 'ID'),
+    ('Nom', 'Nom'),
+    ('Type', 'Type'),
+    ('Reference', 'Référence'),
+    ('Etat', 'État'),
+    ('Quantite', 'Quantité'),
+    ('PrixAchat', "Prix d'achat"),
+    ('DateAcquisition', "Date d'acquisition"),
+    ('DateExpiration', "Date d'expiration"),
+]
 
 
+def filtrer_materiels(qs, search='', type_filter='', etat_filter='', types_connus=(), expiration=''):
+    """
+    Filtres de l'inventaire. Un type choisi dans la liste (`types_connus`)
+    est cherché tel quel, par l'index ; un texte libre par sous-chaîne.
+    `expiration` : 'expire' (date dépassée) ou un nombre de jours de ECHEANCES.
+    """
+    if search:
+        qs = qs.filter(Nom__icontains=search)
+    if type_filter:
+        if type_filter in types_connus:
+            qs = qs.filter(Type=type_filter)
+        else:
+            qs = qs.filter(Type__icontains=type_filter)
+    if etat_filter:
+        # Valeurs des choix en majuscules : égalité servie par l'index (pas de LIKE)
+        qs = qs.filter(Etat=etat_filter.upper())
+    if expiration:
+        today = timezone.localdate()
+        if expiration == 'expire':
+            qs = qs.filter(DateExpiration__lt=today)
+        elif expiration.isdigit() and int(expiration) in ECHEANCES:
+            qs = qs.filter(DateExpiration__gte=today, DateExpiration__lte=echeance(today, int(expiration)))
+    return qs
 
-def liste_materiels(request):
-    type_filter = request.GET.get('type', '')
-    etat_filter = request.GET.get('etat', '')
-    search_query = request.GET.get('search', '')
 
-    # Commencez par exclure les matériels hors service
-    materiels = MaterielMedical.objects.exclude(Etat='HORS_SERVICE')
+def _filtres_inventaire(request):
+    """Filtres, tri et ordre du curseur demandés pour l'inventaire."""
+    # Tri demandé (?tri=type, ?tri=-nom...), par nom par défaut
+    tri = request.GET.get('tri', 'nom')
+    if tri.lstrip('-') not in TRIS:
+        tri = 'nom'
+    ordre = TRIS[tri.lstrip('-')]
+    if tri.startswith('-'):
+        ordre = tuple('-' + champ for champ in ordre)
+    return {
+        'type': request.GET.get('type', ''),
+        'etat': request.GET.get('etat', ''),
+        'search': request.GET.get('search', ''),
+        'expiration': request.GET.get('expiration', ''),
+        'tri': tri,
+        'ordre': ordre,
+    }
 
-    if search_query:
-        materiels = materiels.filter(Nom__icontains=search_query)
-    if type_filter:
-        materiels = materiels.filter(Type__icontains=type_filter)
-    if etat_filter:
-        materiels = materiels.filter(Etat__iexact=etat_filter)
 
-    today = timezone.now().date()
-    
-    # Récupérer uniquement les types qui ont des matériels disponibles (non hors service)
-    types = MaterielMedical.objects.exclude(Etat='HORS_SERVICE').values_list('Type', flat=True).distinct()
-    
-    # Récupérer séparément les matériels hors service pour l'affichage
-    materiels_hors_service = MaterielMedical.objects.filter(Etat='HORS_SERVICE')
+def _export_inventaire(request, f):
+    # ?export=csv|xlsx : tout l'inventaire filtré, hors service compris
+    materiels = filtrer_materiels(MaterielMedical.objects.order_by('Nom', 'IdMaterial'),
+                                  f['search'], f['type'], f['etat'], expiration=f['expiration'])
+    return reponse_export(request, materiels, COLONNES_EXPORT, 'materiels')
+
+
+def _paginateur_inventaire(f, types):
+    # Types (et effectifs) en cache : filtre exact quand le type vient de la liste
+    materiels = MaterielMedical.objects.values(*COLONNES_LISTE)
+    if not f['etat']:
+        # Sans filtre d'état, les hors service sont affichés à part
+        materiels = materiels.exclude(Etat=EtatMateriel.HORS_SERVICE)
+    materiels = filtrer_materiels(materiels, f['search'], f['type'], f['etat'],
+                                  types_connus={t for t, _ in types}, expiration=f['expiration'])
+    # Pagination par curseur, sans COUNT ni OFFSET
+    return CurseurPaginator(materiels, MATERIELS_PAR_PAGE, f['ordre'])
+
+
+def _json_inventaire(page_obj, types, today):
+    # ?format=json : la même page pour le tableau (lignes, curseurs et types)
+    return JsonResponse({
+        'materiels': [{**m, 'expire': m['DateExpiration'] < today} for m in page_obj],
+        'curseur_suivant': page_obj.curseur_suivant,
+        'curseur_precedent': page_obj.curseur_precedent,
+        'types': [{'type': t, 'nombre': n} for t, n in types],
+    })
+
+
+def _hors_service(f):
+    """Premiers hors service seulement (la suite avec ?etat=HORS_SERVICE), ou None si filtré."""
+    if f['etat'] or f['expiration']:
+        return None
+    return (MaterielMedical.objects.filter(Etat=EtatMateriel.HORS_SERVICE)
+            .values(*COLONNES_LISTE).order_by('Nom', 'IdMaterial')[:HORS_SERVICE_AFFICHES + 1])
 
-    context = {
-        'materiels': materiels,
-        'materiels_hors_service': materiels_hors_service,
+
+def _contexte_inventaire(f, page_obj, types, hors_service, expirations, today):
+    return {
+        'materiels': page_obj,
+        'page_obj': page_obj,
+        'materiels_hors_service': hors_service[:HORS_SERVICE_AFFICHES],
+        'autres_hors_service': len(hors_service) > HORS_SERVICE_AFFICHES,
         'today': today,
         'types': types,
-        'selected_type': type_filter,
-        'selected_etat': etat_filter,
-        'search_query': search_query,
+        # Widget des alertes d'expiration (résumé du jour, en cache)
+        'expirations': expirations,
+        'selected_expiration': f['expiration'],
+        'selected_type': f['type'],
+        'selected_etat': f['etat'],
+        'search_query': f['search'],
+        'tri': f['tri'],
+        # Filtres courants, repris par les liens de tri et de pagination
+        'filtres': urlencode({k: f[k] for k in ('search', 'type', 'etat', 'expiration') if f[k]}),
     }
-    return render(request, 'materiel/elements.html', context)
+
+
+def liste_materiels(request):
+    f = _filtres_inventaire(request)
+    if format_demande(request):
+        return _export_inventaire(request, f)
+
+    types = types_materiels()
+    page_obj = _paginateur_inventaire(f, types).page(request.GET.get('curseur'))
+    today = timezone.localdate()
+    if request.GET.get('format') == 'json':
+        return _json_inventaire(page_obj, types, today)
+
+    hors_service = _hors_service(f)
+    hors_service = list(hors_service) if hors_service is not None else []
+    return render(request, 'materiel/elements.html',
+                  _contexte_inventaire(f, page_obj, types, hors_service, resume_expirations(today), today))
+
+
+async def aliste_materiels(request):
+    """Version async de liste_materiels() (ORM asynchrone), pour ASGI."""
+    f = _filtres_inventaire(request)
+    if format_demande(request):
+        return _export_inventaire(request, f)
+
+    types = await atypes_materiels()
+    page_obj = await _paginateur_inventaire(f, types).apage(request.GET.get('curseur'))
+    today = timezone.localdate()
+    if request.GET.get('format') == 'json':
+        return _json_inventaire(page_obj, types, today)
+
+    hors_service = _hors_service(f)
+    hors_service = [m async for m in hors_service] if hors_service is not None else []
+    # Le gabarit est rendu après, hors de la boucle d'événements (TemplateResponse)
+    return TemplateResponse(request, 'materiel/elements.html',
+                            _contexte_inventaire(f, page_obj, types, hors_service,
+                                                 await aresume_expirations(today), today))
+
+
 def ajouter_materiel(request):
     if request.method == 'POST':
         form = MaterielMedicalForm(request.POST)
@@ -99,6 +231,12 @@ def materiel_detail(request, pk):
     return render(request, 'materiel/detail_materiel.html', {'materiel': materiel})
 
 
+async def amateriel_detail(request, pk):
+    """Version async de materiel_detail(), pour ASGI."""
+    materiel = await aget_object_or_404(MaterielMedical, IdMaterial=pk)
+    return TemplateResponse(request, 'materiel/detail_materiel.html', {'materiel': materiel})
+
+
 def mettre_en_maintenance(request, pk):
     materiel = get_object_or_404(MaterielMedical, pk=pk)
     materiel.Etat = 'EN_MAINTENANCE'
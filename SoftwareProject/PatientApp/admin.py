@@ -1,3 +1,56 @@
-from django.contrib import admin
+import io
 
-# Register your models here.
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .forms import ImportPatientsForm
+from .importation import importer_patients
+from .models import Patient
+
+MAX_ERREURS_AFFICHEES = 200
+
+
+@admin.register(Patient)
+class PatientAdmin(admin.ModelAdmin):
+    list_display = ('nom', 'prenom', 'dateNaissance', 'sexe', 'num_tel')
+    list_filter = ('sexe',)
+    search_fields = ('nom', 'prenom', 'num_tel')
+    ordering = ('nom', 'prenom')
+    change_list_template = 'admin/PatientApp/patient/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('importer/', self.admin_site.admin_view(self.importer_csv), name='PatientApp_patient_importer'),
+        ] + super().get_urls()
+
+    def importer_csv(self, request):
+        """Import en masse depuis un CSV (même traitement que la commande importer_patients)."""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        rapport = None
+        if request.method == 'POST':
+            form = ImportPatientsForm(request.POST, request.FILES)
+            if form.is_valid():
+                fichier = io.TextIOWrapper(form.cleaned_data['fichier'].file, encoding='utf-8-sig', newline='')
+                try:
+                    rapport = importer_patients(fichier, form.cleaned_data['taille_lot'])
+                except UnicodeDecodeError:
+                    form.add_error('fichier', "Le fichier doit être encodé en UTF-8.")
+                else:
+                    self.message_user(
+                        request, f"{rapport.crees} patients importés sur {rapport.lignes} lignes.",
+                        messages.SUCCESS if not rapport.rejetees else messages.WARNING,
+                    )
+        else:
+            form = ImportPatientsForm()
+        return TemplateResponse(request, 'admin/PatientApp/patient/importer.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Importer des patients (CSV)",
+            'form': form,
+            'rapport': rapport,
+            'erreurs': rapport.erreurs[:MAX_ERREURS_AFFICHEES] if rapport else [],
+            'erreurs_masquees': rapport.rejetees - len(rapport.erreurs[:MAX_ERREURS_AFFICHEES]) if rapport else 0,
+        })
@@ -0,0 +1,124 @@
+"""
+Dossiers patients (scans, souvent plusieurs centaines de Mo).
+
+Envoi : le fichier est écrit sur disque par blocs, son empreinte SHA-256
+calculée au passage ; l'envoi est interrompu dès que DOSSIERS_TAILLE_MAX est
+dépassée, sans lire le reste du corps de la requête.
+Il est rangé sous son empreinte (dossiers_patients/ab/abcd...ef.pdf) : un
+même fichier envoyé deux fois n'est stocké qu'une fois.
+
+Téléchargement : requêtes Range (reprise, lecture partielle d'un PDF), ETag
+tiré de l'empreinte, ou remise du fichier au serveur frontal
+(X-Sendfile / X-Accel-Redirect) s'il est configuré.
+"""
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+
+REPERTOIRE = 'dossiers_patients'
+TAILLE_BLOC = 1024 * 1024  # 1 Mo
+RE_EMPREINTE = re.compile(r'^[0-9a-f]{64}$')
+RE_PLAGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class DossierUploadHandler(TemporaryFileUploadHandler):
+    """
+    Écrit chaque fichier reçu dans un fichier temporaire par blocs de 1 Mo,
+    en calculant son empreinte. Au-delà de la taille maximale, l'envoi est
+    arrêté (fichier temporaire supprimé) et request.dossier_trop_volumineux
+    indique au formulaire l'erreur à afficher.
+    """
+    chunk_size = TAILLE_BLOC
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.empreinte = hashlib.sha256()
+        self.recu = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.recu += len(raw_data)
+        if self.recu > settings.DOSSIERS_TAILLE_MAX:
+            self.request.dossier_trop_volumineux = True
+            raise StopUpload(connection_reset=True)
+        self.empreinte.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        fichier = super().file_complete(file_size)
+        fichier.sha256 = self.empreinte.hexdigest()
+        return fichier
+
+
+def empreinte(fichier):
+    """SHA-256 du fichier : calculée à l'envoi, sinon relue par blocs."""
+    if getattr(fichier, 'sha256', None):
+        return fichier.sha256
+    h = hashlib.sha256()
+    for bloc in fichier.chunks(TAILLE_BLOC):
+        h.update(bloc)
+    fichier.seek(0)
+    return h.hexdigest()
+
+
+def chemin_dossier(sha256, nom_original):
+    extension = os.path.splitext(nom_original)[1].lower()
+    return f'{REPERTOIRE}/{sha256[:2]}/{sha256}{extension}'
+
+
+def enregistrer_dossier(fichier):
+    """Range le fichier sous son empreinte et retourne son nom de stockage."""
+    nom = chemin_dossier(empreinte(fichier), fichier.name)
+    if default_storage.exists(nom):
+        return nom  # déjà stocké : rien à écrire
+    enregistre = default_storage.save(nom, fichier)
+    if enregistre != nom:
+        # Même contenu rangé entre-temps par un envoi concurrent
+        default_storage.delete(enregistre)
+    return nom
+
+
+def etag_dossier(nom, taille, modifie):
+    """ETag fort : l'empreinte pour un fichier rangé par contenu, sinon taille et date."""
+    base = os.path.splitext(os.path.basename(nom))[0]
+    if RE_EMPREINTE.match(base):
+        return f'"{base}"'
+    return f'"{taille:x}-{int(modifie):x}"'
+
+
+def plage_demandee(entete, taille):
+    """
+    (début, fin) inclus d'un en-tête Range à une seule plage, ou None pour
+    envoyer tout le fichier (en-tête absent, mal formé ou multi-plages).
+    ValueError si la plage est hors du fichier (réponse 416).
+    """
+    m = RE_PLAGE.match((entete or '').strip())
+    if not m or m.group(1) == m.group(2) == '':
+        return None
+    debut, fin = m.groups()
+    if debut == '':
+        # bytes=-N : les N derniers octets
+        if int(fin) == 0 or taille == 0:
+            raise ValueError(entete)
+        return max(0, taille - int(fin)), taille - 1
+    debut, fin = int(debut), int(fin) if fin else None
+    if fin is not None and fin < debut:
+        return None
+    if debut >= taille:
+        raise ValueError(entete)
+    return debut, taille - 1 if fin is None else min(fin, taille - 1)
+
+
+def lire_plage(chemin, debut, longueur):
+    """Générateur des octets [debut, debut + longueur) par blocs de 1 Mo."""
+    with open(chemin, 'rb') as f:
+        f.seek(debut)
+        while longueur > 0:
+            bloc = f.read(min(TAILLE_BLOC, longueur))
+            if not bloc:
+                break
+            longueur -= len(bloc)
+            yield bloc
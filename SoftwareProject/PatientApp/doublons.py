@@ -0,0 +1,90 @@
+"""
+Doublons probables de patients, cherchés bloc par bloc.
+
+Seules les fiches de même clé de blocage (phonetique.cle_doublon, indexée)
+sont comparées entre elles : à l'enregistrement, une requête sur l'index ;
+pour un nettoyage de toute la table, une passe GROUP BY sur l'index donne
+les blocs d'au moins deux fiches, puis chaque bloc est comparé paire par paire.
+"""
+from collections import defaultdict
+from itertools import combinations, groupby, islice
+
+from django.db.models import Count
+
+from .models import Patient
+from .phonetique import cle_doublon, ressemblance, SEUIL_RESSEMBLANCE
+
+# Au-delà, la clé est trop peu discriminante (noms vides, fiches de test...)
+# pour une comparaison paire par paire : le bloc est signalé, pas comparé.
+TAILLE_BLOC_MAX = 200
+TAILLE_LOT = 500  # clés lues par requête lors d'une recherche complète
+COLONNES = ('pk', 'nom', 'prenom', 'dateNaissance', 'num_tel', 'cle_doublon')
+
+
+def sont_doublons(a, b, seuil=SEUIL_RESSEMBLANCE):
+    """`a`, `b` : lignes (pk, nom, prenom, dateNaissance, num_tel, ...) d'un même bloc."""
+    if a[4] and a[4] == b[4]:
+        return True  # même bloc et même téléphone
+    return ressemblance(a[1:3], b[1:3]) >= seuil
+
+
+def candidats(nom, prenom, date_naissance, exclure=None, limite=5):
+    """Patients enregistrés qui ressemblent à (nom, prénom, date de naissance)."""
+    qs = Patient.objects.filter(cle_doublon=cle_doublon(nom, prenom, date_naissance))
+    if exclure is not None:
+        qs = qs.exclude(pk=exclure)
+    patients = qs.only('id', 'nom', 'prenom', 'dateNaissance', 'num_tel')[:TAILLE_BLOC_MAX]
+    return [p for p in patients if ressemblance((nom, prenom), (p.nom, p.prenom)) >= SEUIL_RESSEMBLANCE][:limite]
+
+
+def _grappes_du_bloc(lignes, seuil):
+    """Regroupe (union-find) les lignes d'un bloc reliées par sont_doublons()."""
+    parent = list(range(len(lignes)))
+
+    def racine(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in combinations(range(len(lignes)), 2):
+        if racine(i) != racine(j) and sont_doublons(lignes[i], lignes[j], seuil):
+            parent[racine(i)] = racine(j)
+    grappes = defaultdict(list)
+    for i, ligne in enumerate(lignes):
+        grappes[racine(i)].append(ligne)
+    return [g for g in grappes.values() if len(g) > 1]
+
+
+def blocs_ignores():
+    """[(clé, nombre de fiches)] des blocs trop grands pour être comparés."""
+    return list(
+        Patient.objects.values('cle_doublon').annotate(n=Count('pk'))
+        .filter(n__gt=TAILLE_BLOC_MAX).order_by('-n').values_list('cle_doublon', 'n')
+    )
+
+
+def grappes_doublons(seuil=SEUIL_RESSEMBLANCE, taille_lot=TAILLE_LOT, progression=None):
+    """
+    Générateur des groupes de doublons probables de toute la table, chaque
+    groupe étant une liste de lignes (pk, nom, prenom, dateNaissance, num_tel, clé).
+    `progression(blocs)` est appelé après chaque lot de clés.
+    """
+    cles = (
+        Patient.objects.values('cle_doublon').annotate(n=Count('pk'))
+        .filter(n__gt=1, n__lte=TAILLE_BLOC_MAX).order_by('cle_doublon')
+        .values_list('cle_doublon', flat=True)
+    )
+    # Les clés (courtes) sont lues d'abord : pas de lecture croisée sur un curseur ouvert
+    cles = iter(list(cles))
+    blocs = 0
+    while lot := list(islice(cles, taille_lot)):
+        lignes = (
+            Patient.objects.filter(cle_doublon__in=lot)
+            .order_by('cle_doublon', 'pk').values_list(*COLONNES)
+        )
+        for _, bloc in groupby(lignes, key=lambda ligne: ligne[5]):
+            yield from _grappes_du_bloc(list(bloc), seuil)
+        blocs += len(lot)
+        if progression:
+            progression(blocs)
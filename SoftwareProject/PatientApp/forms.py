@@ -1,7 +1,73 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
 from .models import Patient
+from .dossiers import enregistrer_dossier
+from .doublons import candidats
 
 class PatientForm(forms.ModelForm):
+    # Affichée seulement quand des doublons probables ont été trouvés
+    confirmer_doublon = forms.BooleanField(
+        required=False, widget=forms.HiddenInput,
+        label="Il ne s'agit pas d'un de ces patients : enregistrer quand même",
+    )
+
     class Meta:
         model = Patient
         fields = ['nom', 'prenom', 'dateNaissance', 'sexe', 'dossier','num_tel']
+
+    def __init__(self, *args, dossier_trop_volumineux=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Envoi arrêté par DossierUploadHandler : pas de fichier, mais l'erreur de taille
+        self.dossier_trop_volumineux = dossier_trop_volumineux
+        if dossier_trop_volumineux:
+            self.fields['dossier'].required = False
+
+    def clean_dossier(self):
+        dossier = self.cleaned_data.get('dossier')
+        # Seul un fichier nouvellement envoyé est contrôlé (pas le dossier déjà stocké)
+        if self.dossier_trop_volumineux or (
+                isinstance(dossier, UploadedFile) and dossier.size > settings.DOSSIERS_TAILLE_MAX):
+            raise forms.ValidationError(
+                f"Le dossier dépasse la taille maximale ({filesizeformat(settings.DOSSIERS_TAILLE_MAX)})."
+            )
+        return dossier
+
+    def clean(self):
+        cleaned_data = super().clean()
+        nom, prenom = cleaned_data.get('nom'), cleaned_data.get('prenom')
+        date_naissance = cleaned_data.get('dateNaissance')
+        if nom and prenom and date_naissance and not cleaned_data.get('confirmer_doublon'):
+            # Une lecture d'index : seules les fiches du même bloc sont comparées
+            self.doublons = candidats(nom, prenom, date_naissance, exclure=self.instance.pk)
+            if self.doublons:
+                self.fields['confirmer_doublon'].widget = forms.CheckboxInput()
+                raise forms.ValidationError(
+                    ["Ce patient semble déjà enregistré :"] + [
+                        f"{p.nom} {p.prenom}, né(e) le {p.dateNaissance:%d/%m/%Y}"
+                        + (f", tél. {p.num_tel}" if p.num_tel else "")
+                        for p in self.doublons
+                    ]
+                )
+        return cleaned_data
+
+    def save(self, commit=True):
+        patient = super().save(commit=False)
+        # Nouveau fichier : rangé sous son empreinte (un seul exemplaire par contenu)
+        if 'dossier' in self.changed_data and self.cleaned_data.get('dossier'):
+            patient.dossier = enregistrer_dossier(self.cleaned_data['dossier'])
+        if commit:
+            patient.save()
+        return patient
+
+
+class ImportPatientsForm(forms.Form):
+    fichier = forms.FileField(
+        label="Fichier CSV",
+        help_text="Colonnes : nom, prenom, dateNaissance (AAAA-MM-JJ), sexe, num_tel (facultatif)",
+        widget=forms.ClearableFileInput(attrs={'accept': '.csv'})
+    )
+    taille_lot = forms.IntegerField(
+        label="Patients par transaction", min_value=1, max_value=10000, initial=2000
+    )
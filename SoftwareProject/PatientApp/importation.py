@@ -0,0 +1,111 @@
+"""
+Import en masse de patients depuis un fichier CSV (reprise d'une clinique).
+
+Colonnes attendues (en-tête obligatoire) :
+    nom, prenom      obligatoires
+    dateNaissance    AAAA-MM-JJ
+    sexe             'Homme' ou 'Femme'
+    num_tel          facultatif, numéro tunisien à 8 chiffres
+
+Le fichier est lu en flux, par lots : chaque lot est validé colonne par
+colonne (mêmes règles que le modèle : RegexValidator de num_tel, choix de
+sexe), puis inséré avec bulk_create dans sa propre transaction, avec ses
+termes de recherche. La mémoire ne dépend que de la taille d'un lot.
+"""
+import csv
+import datetime
+
+from django.core.validators import RegexValidator
+from django.db import transaction
+from django.utils import timezone
+
+from RendezVousApp.recherche import indexer_patients
+from SoftwareProject.outils import RapportImport, lots
+from .models import Patient
+from .phonetique import cle_doublon
+
+COLONNES = ('nom', 'prenom', 'dateNaissance', 'sexe')
+SEXES = {choix for choix, _ in Patient.SEXE_CHOICES}
+VALIDATEUR_TEL = next(v for v in Patient._meta.get_field('num_tel').validators if isinstance(v, RegexValidator))
+LONGUEUR_NOM = Patient._meta.get_field('nom').max_length
+TAILLE_LOT = 2000
+
+
+def _date(texte):
+    try:
+        return datetime.date.fromisoformat(texte)
+    except ValueError:
+        return None
+
+
+def _valider_lot(lot, rapport, aujourd_hui):
+    """
+    Valide un lot [(numéro de ligne, row)] colonne par colonne et retourne
+    les Patient à créer ; une ligne rejetée est notée avec sa première erreur.
+    """
+    numeros = [n for n, _ in lot]
+    noms = [(row.get('nom') or '').strip() for _, row in lot]
+    prenoms = [(row.get('prenom') or '').strip() for _, row in lot]
+    dates = [_date((row.get('dateNaissance') or '').strip()) for _, row in lot]
+    sexes = [(row.get('sexe') or '').strip().capitalize() for _, row in lot]
+    # Espaces tolérés dans le numéro ("22 123 456")
+    tels = [''.join((row.get('num_tel') or '').split()) for _, row in lot]
+
+    erreurs = {}
+    for colonne, message in [
+        ([not nom or not prenom for nom, prenom in zip(noms, prenoms)],
+         "Nom et prénom obligatoires."),
+        ([len(nom) > LONGUEUR_NOM or len(prenom) > LONGUEUR_NOM for nom, prenom in zip(noms, prenoms)],
+         f"Nom ou prénom trop long ({LONGUEUR_NOM} caractères au plus)."),
+        ([d is None for d in dates],
+         "Date de naissance invalide (AAAA-MM-JJ)."),
+        ([d is not None and d > aujourd_hui for d in dates],
+         "La date de naissance ne peut pas être dans le futur."),
+        ([s not in SEXES for s in sexes],
+         f"Sexe invalide (valeurs : {', '.join(sorted(SEXES))})."),
+        ([bool(t) and not VALIDATEUR_TEL.regex.match(t) for t in tels],
+         VALIDATEUR_TEL.message),
+    ]:
+        for numero, invalide in zip(numeros, colonne):
+            if invalide:
+                erreurs.setdefault(numero, message)
+
+    for numero, message in erreurs.items():
+        rapport.erreur(numero, message)
+    return [
+        # bulk_create n'appelle pas save() : clé de doublon calculée ici
+        Patient(nom=nom, prenom=prenom, dateNaissance=d, sexe=s, num_tel=t or None,
+                cle_doublon=cle_doublon(nom, prenom, d))
+        for numero, nom, prenom, d, s, t in zip(numeros, noms, prenoms, dates, sexes, tels)
+        if numero not in erreurs
+    ]
+
+
+def importer_patients(fichier, taille_lot=TAILLE_LOT, progression=None, rejets=None):
+    """
+    Importe les patients du fichier texte `fichier` (CSV) et retourne un
+    RapportImport. `progression(rapport)` est appelé après chaque lot ; les
+    lignes rejetées sont écrites au fil de l'eau dans `rejets` (CSV).
+    """
+    rapport = RapportImport(rejets)
+    aujourd_hui = timezone.localdate()
+    reader = csv.DictReader(fichier)
+    manquantes = [c for c in COLONNES if c not in (reader.fieldnames or [])]
+    if manquantes:
+        rapport.erreur(1, f"Colonnes manquantes : {', '.join(manquantes)}.")
+        return rapport
+
+    for lot in lots(enumerate(reader, start=2), taille_lot):
+        rapport.lignes += len(lot)
+        patients = _valider_lot(lot, rapport, aujourd_hui)
+        if patients:
+            with transaction.atomic():
+                crees = Patient.objects.bulk_create(patients)
+                # bulk_create ne déclenche pas les signaux de l'index de recherche
+                indexer_patients(crees)
+            rapport.crees += len(crees)
+        if progression:
+            progression(rapport)
+
+    rapport.erreurs.sort()
+    return rapport
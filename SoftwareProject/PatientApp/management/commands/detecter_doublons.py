@@ -0,0 +1,51 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from PatientApp.doublons import blocs_ignores, grappes_doublons, TAILLE_BLOC_MAX
+from PatientApp.phonetique import SEUIL_RESSEMBLANCE
+
+
+class Command(BaseCommand):
+    help = "Cherche les groupes de patients probablement en double (comparaison limitée aux blocs)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seuil', type=float, default=SEUIL_RESSEMBLANCE,
+                            help=f"Ressemblance minimale des noms, de 0 à 1 (défaut : {SEUIL_RESSEMBLANCE})")
+        parser.add_argument('--rapport', help="Fichier CSV où écrire les groupes trouvés")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+
+        def progression(blocs):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{blocs} blocs comparés")
+
+        try:
+            sortie = open(options['rapport'], 'w', encoding='utf-8', newline='') if options['rapport'] else None
+        except OSError as e:
+            raise CommandError(e)
+        writer = csv.writer(sortie) if sortie else None
+        if writer:
+            writer.writerow(['groupe', 'id', 'nom', 'prenom', 'dateNaissance', 'num_tel'])
+
+        groupes = patients = 0
+        try:
+            for groupes, grappe in enumerate(grappes_doublons(options['seuil'], progression=progression), start=1):
+                patients += len(grappe)
+                for pk, nom, prenom, date_naissance, num_tel, _ in grappe:
+                    if writer:
+                        writer.writerow([groupes, pk, nom, prenom, date_naissance, num_tel or ''])
+                    elif groupes <= 50:
+                        self.stdout.write(f"[{groupes}] {pk} {nom} {prenom} {date_naissance} {num_tel or ''}")
+        finally:
+            if sortie:
+                sortie.close()
+
+        for cle, nombre in blocs_ignores():
+            self.stderr.write(f"Bloc {cle!r} ignoré : {nombre} fiches (plus de {TAILLE_BLOC_MAX}).")
+        duree = time.perf_counter() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f"{groupes} groupes de doublons probables ({patients} patients) trouvés en {duree:.1f} s."
+        ))
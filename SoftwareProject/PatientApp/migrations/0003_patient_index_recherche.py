@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PatientApp', '0002_patient_num_tel'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['num_tel'], name='patient_num_tel_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['nom', 'prenom'], name='patient_nom_prenom_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PatientApp', '0003_patient_index_recherche'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['prenom', 'nom'], name='patient_prenom_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['dateNaissance'], name='patient_naissance_idx'),
+        ),
+    ]
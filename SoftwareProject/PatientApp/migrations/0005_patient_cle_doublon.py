@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:44
+
+import re
+import unicodedata
+from itertools import islice
+
+from django.db import migrations, models
+
+
+# Copie figée de PatientApp.phonetique.cle_doublon() au moment de cette
+# migration : une évolution de l'algorithme passera par une nouvelle migration
+# qui recalcule les clés, sans changer ce que celle-ci écrit.
+_SUBSTITUTIONS = [
+    (re.compile(r'ph'), 'f'),
+    (re.compile(r'(?:ch|sh|sch)'), 's'),
+    (re.compile(r'(?:kh|gh)'), 'k'),
+    (re.compile(r'(?:dh|th)'), 'd'),
+    (re.compile(r'(?:ou|w)'), 'u'),
+    (re.compile(r'[cq]'), 'k'),
+    (re.compile(r'z'), 's'),
+    (re.compile(r'v'), 'f'),
+    (re.compile(r'h'), ''),
+]
+_VOYELLES = re.compile(r'[aeiouy]')
+_DOUBLES = re.compile(r'(.)\1+')
+
+
+def _code_phonetique(texte):
+    texte = unicodedata.normalize('NFKD', texte or '')
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    mot = re.sub(r'[^a-z]+', '', texte.lower())
+    if not mot:
+        return ''
+    for motif, remplacement in _SUBSTITUTIONS:
+        mot = motif.sub(remplacement, mot)
+    initiale = 'a' if mot[:1] and _VOYELLES.match(mot) else ''
+    return (initiale + _DOUBLES.sub(r'\1', _VOYELLES.sub('', mot)))[:20]
+
+
+def cle_doublon(nom, prenom, date_naissance):
+    codes = sorted([_code_phonetique(nom), _code_phonetique(prenom)])
+    return f'{date_naissance}:{"-".join(codes)}'
+
+
+def calculer_cles(apps, schema_editor):
+    Patient = apps.get_model('PatientApp', 'Patient')
+    qn = schema_editor.connection.ops.quote_name
+    # UPDATE préparé exécuté par lots : bulk_update (CASE WHEN) est bien plus lent
+    sql = 'UPDATE %s SET %s = %%s WHERE %s = %%s' % (
+        qn(Patient._meta.db_table), qn('cle_doublon'), qn(Patient._meta.pk.column),
+    )
+    lignes = Patient.objects.values_list('pk', 'nom', 'prenom', 'dateNaissance').iterator(chunk_size=2000)
+    with schema_editor.connection.cursor() as cursor:
+        while lot := [(cle_doublon(nom, prenom, date), pk) for pk, nom, prenom, date in islice(lignes, 2000)]:
+            cursor.executemany(sql, lot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PatientApp', '0004_patient_index_tri'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='cle_doublon',
+            field=models.CharField(default='', editable=False, max_length=60),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['cle_doublon'], name='patient_cle_doublon_idx'),
+        ),
+        migrations.RunPython(calculer_cles, migrations.RunPython.noop),
+    ]
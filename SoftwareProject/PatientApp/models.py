@@ -1,5 +1,6 @@
 from django.db import models
 from django.core.validators import RegexValidator
+from .phonetique import cle_doublon
 
 class Patient(models.Model):
     SEXE_CHOICES = [
@@ -23,6 +24,36 @@ class Patient(models.Model):
         null=True    # permet NULL en base pour anciens patients
     )
     dossier = models.FileField(upload_to='dossiers_patients/')
+    # Clé de blocage des doublons (date de naissance + nom/prénom phonétiques),
+    # recalculée à chaque enregistrement
+    cle_doublon = models.CharField(max_length=60, editable=False, default='')
+
+    class Meta:
+        indexes = [
+            # Autocomplétion par début de numéro de téléphone
+            models.Index(fields=['num_tel'], name='patient_num_tel_idx'),
+            # Résultats triés par nom, prénom
+            models.Index(fields=['nom', 'prenom'], name='patient_nom_prenom_idx'),
+            # Colonnes triables de l'annuaire des patients
+            models.Index(fields=['prenom', 'nom'], name='patient_prenom_nom_idx'),
+            models.Index(fields=['dateNaissance'], name='patient_naissance_idx'),
+            # Détection des doublons : comparaison limitée au bloc
+            models.Index(fields=['cle_doublon'], name='patient_cle_doublon_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Nom lu en base : l'index de recherche n'est refait que s'il change
+        instance._nom_initial = (instance.__dict__.get('nom'), instance.__dict__.get('prenom'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.cle_doublon = cle_doublon(self.nom, self.prenom, self.dateNaissance)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'nom', 'prenom', 'dateNaissance'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'cle_doublon'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.nom} {self.prenom}"
@@ -0,0 +1,66 @@
+"""
+Clé de blocage pour la détection des doublons de patients.
+
+Deux fiches d'un même patient saisies avec des orthographes voisines
+(Mohamed / Mohammed, Ben Salah / Ben Saleh, Chérif / Sharif) ont la même clé :
+date de naissance + code phonétique du nom et du prénom (dans n'importe quel
+ordre). La clé est indexée : on ne compare une fiche qu'aux quelques fiches
+de son bloc, jamais à toute la table.
+"""
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+LONGUEUR_CODE = 20
+SEUIL_RESSEMBLANCE = 0.8
+
+# Graphies d'un même son (translittérations françaises de noms arabes surtout)
+_SUBSTITUTIONS = [
+    (re.compile(r'ph'), 'f'),
+    (re.compile(r'(?:ch|sh|sch)'), 's'),
+    (re.compile(r'(?:kh|gh)'), 'k'),
+    (re.compile(r'(?:dh|th)'), 'd'),
+    (re.compile(r'(?:ou|w)'), 'u'),
+    (re.compile(r'[cq]'), 'k'),
+    (re.compile(r'z'), 's'),
+    (re.compile(r'v'), 'f'),
+    (re.compile(r'h'), ''),
+]
+_VOYELLES = re.compile(r'[aeiouy]')
+_DOUBLES = re.compile(r'(.)\1+')
+
+
+def replier(texte):
+    """'Hélène-Ève' -> 'helene eve' (minuscules, sans accents, lettres seules)."""
+    texte = unicodedata.normalize('NFKD', texte or '')
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return ' '.join(re.sub(r'[^a-z]+', ' ', texte.lower()).split())
+
+
+def code_phonetique(texte):
+    """Squelette consonantique : 'Mohammed' et 'Mehmed' -> 'md'."""
+    mot = replier(texte).replace(' ', '')
+    if not mot:
+        return ''
+    for motif, remplacement in _SUBSTITUTIONS:
+        mot = motif.sub(remplacement, mot)
+    # Voyelle initiale conservée sous une forme unique (Amine / Emine / Imen)
+    initiale = 'a' if mot[:1] and _VOYELLES.match(mot) else ''
+    return (initiale + _DOUBLES.sub(r'\1', _VOYELLES.sub('', mot)))[:LONGUEUR_CODE]
+
+
+def cle_doublon(nom, prenom, date_naissance):
+    """Clé de blocage 'AAAA-MM-JJ:code1-code2' (codes triés : nom/prénom inversés tolérés)."""
+    codes = sorted([code_phonetique(nom), code_phonetique(prenom)])
+    return f'{date_naissance}:{"-".join(codes)}'
+
+
+def _forme_comparable(identite):
+    # Mots rangés par code phonétique : Chérif Inès / Inès Sharif -> 'ines cherif' / 'ines sharif'
+    mots = replier(' '.join(identite)).split()
+    return ' '.join(sorted(mots, key=lambda mot: (code_phonetique(mot), mot)))
+
+
+def ressemblance(identite_a, identite_b):
+    """Similarité (0 à 1) de deux (nom, prénom), ordre des mots indifférent."""
+    return SequenceMatcher(None, _forme_comparable(identite_a), _forme_comparable(identite_b)).ratio()
@@ -1,3 +1,332 @@
-from django.test import TestCase
+import datetime
+import hashlib
+import io
+import os
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from RendezVousApp.recherche import indexer_patients
+
+from .dossiers import DossierUploadHandler, plage_demandee
+from .doublons import candidats, grappes_doublons
+from .forms import PatientForm
+from .importation import importer_patients
+from .models import Patient
+from .phonetique import cle_doublon
+from .views import PATIENTS_PAR_PAGE
+
+
+class ListePatientsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        patients = Patient.objects.bulk_create([
+            Patient(nom=f'Nom{i:03d}', prenom=f'Prenom{(i * 7) % 60:03d}',
+                    dateNaissance=datetime.date(1950, 1, 1) + datetime.timedelta(days=i * 97),
+                    sexe='Femme', num_tel=f'2{i:07d}', dossier='dossiers_patients/test.pdf')
+            for i in range(60)
+        ])
+        # bulk_create ne déclenche pas les signaux qui tiennent l'index de recherche
+        indexer_patients(patients)
+
+    def page(self, **params):
+        response = self.client.get(reverse('liste_patients'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['page_obj']
+
+    def parcourir(self, **params):
+        noms, page = [], self.page(**params)
+        noms += [p.nom for p in page]
+        while page.has_next():
+            page = self.page(curseur=page.curseur_suivant, **params)
+            noms += [p.nom for p in page]
+        return noms
+
+    def test_parcours_complet_par_curseur(self):
+        noms = self.parcourir()
+        self.assertEqual(noms, sorted(noms))
+        self.assertEqual(len(noms), 60)
+        self.assertEqual(len(self.page()), PATIENTS_PAR_PAGE)
+
+    def test_tris(self):
+        attendu = list(Patient.objects.order_by('-dateNaissance', '-id').values_list('nom', flat=True))
+        self.assertEqual(self.parcourir(tri='-naissance'), attendu)
+        attendu = list(Patient.objects.order_by('prenom', 'nom', 'id').values_list('nom', flat=True))
+        self.assertEqual(self.parcourir(tri='prenom'), attendu)
+        # Tri inconnu : ordre par nom
+        self.assertEqual([p.nom for p in self.page(tri='dossier')][:2], ['Nom000', 'Nom001'])
+
+    def test_recherche_nom_et_telephone(self):
+        self.assertEqual([p.nom for p in self.page(search='nom012')], ['Nom012'])
+        self.assertEqual([p.nom for p in self.page(search='2000005')], [f'Nom{i:03d}' for i in range(50, 60)])
+
+    def test_une_requete_sans_dossier(self):
+        with CaptureQueriesContext(connection) as requetes:
+            self.page(tri='-nom', search='nom')
+        self.assertEqual(len(requetes), 1)
+        self.assertNotIn('dossier', requetes[0]['sql'])
+
+    def test_tris_lus_dans_les_index(self):
+        for tri, index in [('nom', 'patient_nom_prenom_idx'), ('-prenom', 'patient_prenom_nom_idx'),
+                           ('naissance', 'patient_naissance_idx')]:
+            page = self.page(tri=tri)
+            with CaptureQueriesContext(connection) as requetes:
+                self.page(tri=tri, curseur=page.curseur_suivant)
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + requetes[0]['sql'])
+                details = [ligne[-1] for ligne in cursor.fetchall()]
+            with self.subTest(tri=tri):
+                self.assertTrue(any(index in d for d in details), details)
+                self.assertFalse(any('TEMP B-TREE' in d for d in details), details)
+
+
+@override_settings(DOSSIERS_TAILLE_MAX=4 * 1024 * 1024)
+class DossierPatientTests(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        reglages = override_settings(MEDIA_ROOT=self.media.name)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.contenu = os.urandom(3 * 1024 * 1024 + 17)  # plusieurs blocs de 1 Mo
+        self.connecter('infirmiere')
+
+    def connecter(self, role):
+        session = self.client.session
+        session['employe'] = {'id': 1, 'nom': 'Jaziri', 'prenom': 'Hela', 'role': role,
+                              'service': 'Cardiologie', 'connecte_le': time.time()}
+        session.save()
+
+    def envoyer(self, nom, contenu):
+        return self.client.post(reverse('ajouter_patient'), {
+            'nom': nom, 'prenom': 'Amine', 'dateNaissance': '1990-01-01', 'sexe': 'Homme',
+            'num_tel': '22123456', 'dossier': SimpleUploadedFile('scan.PDF', contenu),
+        })
+
+    def fichiers_stockes(self):
+        return [os.path.join(d, f) for d, _, fichiers in os.walk(self.media.name) for f in fichiers]
+
+    def test_envoi_range_sous_empreinte_une_seule_fois(self):
+        self.assertRedirects(self.envoyer('Ben Salah', self.contenu), reverse('liste_patients'))
+        self.assertRedirects(self.envoyer('Gharbi', self.contenu), reverse('liste_patients'))
+        sha = hashlib.sha256(self.contenu).hexdigest()
+        noms = set(Patient.objects.values_list('dossier', flat=True))
+        self.assertEqual(noms, {f'dossiers_patients/{sha[:2]}/{sha}.pdf'})
+        self.assertEqual(len(self.fichiers_stockes()), 1)
+
+    def test_taille_maximale(self):
+        with mock.patch.object(DossierUploadHandler, 'receive_data_chunk', autospec=True,
+                               side_effect=DossierUploadHandler.receive_data_chunk) as reception:
+            response = self.envoyer('Ben Salah', self.contenu + os.urandom(4 * 1024 * 1024))
+        # Envoi arrêté au premier bloc au-delà de 4 Mo : le reste n'est pas lu
+        self.assertEqual(reception.call_count, 5)
+        self.assertEqual(response.status_code, 200)
+        erreurs = response.context['form'].errors['dossier']
+        self.assertEqual(len(erreurs), 1)
+        self.assertIn('taille maximale', erreurs[0])
+        self.assertFalse(Patient.objects.exists())
+        self.assertEqual(self.fichiers_stockes(), [])
+
+    def test_telechargement_complet_et_conditionnel(self):
+        self.envoyer('Ben Salah', self.contenu)
+        url = reverse('telecharger_dossier', args=[Patient.objects.get().pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.contenu)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['ETag'], f'"{hashlib.sha256(self.contenu).hexdigest()}"')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_plages(self):
+        self.envoyer('Ben Salah', self.contenu)
+        url = reverse('telecharger_dossier', args=[Patient.objects.get().pk])
+        taille = len(self.contenu)
+        response = self.client.get(url, HTTP_RANGE='bytes=1048570-1048580')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1048570-1048580/{taille}')
+        self.assertEqual(b''.join(response.streaming_content), self.contenu[1048570:1048581])
+        response = self.client.get(url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.contenu[-10:])
+        response = self.client.get(url, HTTP_RANGE=f'bytes={taille}-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, f'bytes */{taille}'))
+        # If-Range périmé : tout le fichier
+        response = self.client.get(url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"ancien"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_plage_demandee(self):
+        self.assertEqual(plage_demandee('bytes=5-', 10), (5, 9))
+        self.assertEqual(plage_demandee('bytes=2-50', 10), (2, 9))
+        self.assertEqual(plage_demandee('bytes=-50', 10), (0, 9))
+        self.assertIsNone(plage_demandee('bytes=0-1,4-5', 10))
+        self.assertIsNone(plage_demandee('bytes=5-2', 10))
+        self.assertIsNone(plage_demandee(None, 10))
+        with self.assertRaises(ValueError):
+            plage_demandee('bytes=-0', 10)
+
+    def test_serveur_frontal(self):
+        self.envoyer('Ben Salah', self.contenu)
+        patient = Patient.objects.get()
+        url = reverse('telecharger_dossier', args=[patient.pk])
+        with self.settings(DOSSIERS_ENVOI='x-accel-redirect'):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protege/' + patient.dossier.name)
+        self.assertEqual(response.content, b'')
+        with self.settings(DOSSIERS_ENVOI='x-sendfile'):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Sendfile'], patient.dossier.path)
+
+    def test_reserve_au_personnel_connecte(self):
+        self.envoyer('Ben Salah', self.contenu)
+        url = reverse('telecharger_dossier', args=[Patient.objects.get().pk])
+        self.client.logout()
+        response = self.client.get(url)
+        self.assertRedirects(response, f"{reverse('connexion_employe')}?next={url}", fetch_redirect_response=False)
+        # Un compte de l'administration sans session d'employé ne suffit pas
+        self.client.force_login(User.objects.create_user('accueil'))
+        response = self.client.get(url)
+        self.assertRedirects(response, f"{reverse('connexion_employe')}?next={url}", fetch_redirect_response=False)
+        self.connecter('medecin')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(reverse('telecharger_dossier', args=[9999])).status_code, 404)
+
+
+class ImportPatientsTests(TestCase):
+
+    CSV = (
+        "nom,prenom,dateNaissance,sexe,num_tel\n"
+        "Ben Salah,Hélène,1985-03-02,Femme,22 123 456\n"
+        "Gharbi,Sami,1990-13-01,Homme,\n"
+        "Trabelsi,Ali,1970-01-01,homme,98765432\n"
+        "Jaziri,Lina,2000-05-05,F,\n"
+        "Mansour,Amel,1999-09-09,Femme,12345678\n"
+        ",Ines,1999-09-09,Femme,\n"
+        "Chérif,Ève,2001-01-01,Femme,\n"
+    )
+
+    def test_import_par_lots_et_rapport(self):
+        appels = []
+        rapport = importer_patients(io.StringIO(self.CSV), taille_lot=2, progression=lambda r: appels.append(r.crees))
+        self.assertEqual((rapport.lignes, rapport.crees), (7, 3))
+        self.assertEqual(appels, [1, 2, 2, 3])
+        self.assertEqual([ligne for ligne, _ in rapport.erreurs], [3, 5, 6, 7])
+        self.assertIn('Date de naissance', rapport.erreurs[0][1])
+        self.assertIn('Sexe', rapport.erreurs[1][1])
+        self.assertIn('tunisien', rapport.erreurs[2][1])
+        self.assertIn('obligatoires', rapport.erreurs[3][1])
+        trabelsi = Patient.objects.get(nom='Trabelsi')
+        self.assertEqual((trabelsi.sexe, trabelsi.num_tel), ('Homme', '98765432'))
+        self.assertEqual(Patient.objects.get(nom='Ben Salah').num_tel, '22123456')
+
+    def test_patients_importes_recherchables(self):
+        importer_patients(io.StringIO(self.CSV))
+        response = self.client.get(reverse('liste_patients'), {'search': 'eve cherif'})
+        self.assertEqual([p.nom for p in response.context['page_obj']], ['Chérif'])
+
+    def test_colonnes_manquantes(self):
+        rapport = importer_patients(io.StringIO("nom,prenom\nA,B\n"))
+        self.assertEqual(rapport.crees, 0)
+        self.assertIn('dateNaissance', rapport.erreurs[0][1])
+
+    def test_commande(self):
+        with tempfile.TemporaryDirectory() as dossier:
+            chemin, rejets = os.path.join(dossier, 'patients.csv'), os.path.join(dossier, 'rejets.csv')
+            with open(chemin, 'w', encoding='utf-8') as f:
+                f.write(self.CSV)
+            sortie = io.StringIO()
+            call_command('importer_patients', chemin, '--taille-lot', '3', '--rapport', rejets, stdout=sortie)
+            with open(rejets, encoding='utf-8') as f:
+                self.assertEqual(len(f.readlines()), 5)
+        self.assertIn('3 patients importés sur 7 lignes', sortie.getvalue())
+
+    def test_import_depuis_l_admin(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@clinique.tn', 'secret'))
+        self.assertContains(self.client.get(reverse('admin:PatientApp_patient_changelist')),
+                            reverse('admin:PatientApp_patient_importer'))
+        response = self.client.post(reverse('admin:PatientApp_patient_importer'), {
+            'fichier': SimpleUploadedFile('patients.csv', self.CSV.encode('utf-8-sig')), 'taille_lot': 500,
+        })
+        self.assertEqual(response.context['rapport'].crees, 3)
+        self.assertContains(response, 'Sexe invalide')
+        self.assertEqual(Patient.objects.count(), 3)
+
+
+class DoublonsPatientTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        def creer(nom, prenom, naissance=datetime.date(1990, 1, 1), num_tel=None):
+            return Patient.objects.create(nom=nom, prenom=prenom, dateNaissance=naissance, sexe='Homme',
+                                          num_tel=num_tel, dossier='dossiers_patients/test.pdf')
+        cls.mohamed = creer('Ben Salah', 'Mohamed', num_tel='22123456')
+        cls.mohammed = creer('Ben Saleh', 'Mohammed')
+        cls.inverse = creer('Mohamed', 'Ben Salah')
+        cls.autre_date = creer('Ben Salah', 'Mohamed', datetime.date(1991, 1, 1))
+        cls.cherif = creer('Chérif', 'Ines', datetime.date(1985, 5, 5), '98765432')
+        cls.sharif = creer('Sharif', 'Inès', datetime.date(1985, 5, 5))
+        cls.seul = creer('Trabelsi', 'Ali')
+
+    def formulaire(self, confirmer=False, **donnees):
+        donnees = {'nom': 'Ben Salah', 'prenom': 'Mouhamed', 'dateNaissance': '1990-01-01',
+                   'sexe': 'Homme', 'num_tel': '', **donnees}
+        if confirmer:
+            donnees['confirmer_doublon'] = 'on'
+        return PatientForm(donnees, {'dossier': SimpleUploadedFile('scan.pdf', b'%PDF')})
+
+    def test_cle_de_blocage(self):
+        self.assertEqual(self.mohamed.cle_doublon, self.mohammed.cle_doublon)
+        self.assertEqual(self.mohamed.cle_doublon, self.inverse.cle_doublon)
+        self.assertNotEqual(self.mohamed.cle_doublon, self.autre_date.cle_doublon)
+        self.assertEqual(self.cherif.cle_doublon, self.sharif.cle_doublon)
+        self.seul.prenom = 'Mohamed'
+        self.seul.save(update_fields=['prenom'])
+        self.seul.refresh_from_db()
+        self.assertEqual(self.seul.cle_doublon, cle_doublon('Trabelsi', 'Mohamed', datetime.date(1990, 1, 1)))
+
+    def test_avertissement_avant_enregistrement(self):
+        with self.assertNumQueries(1):
+            form = self.formulaire()
+            self.assertFalse(form.is_valid())
+        self.assertIn('22123456', str(form.non_field_errors()))
+        self.assertEqual(set(form.doublons), {self.mohamed, self.mohammed, self.inverse})
+        self.assertIn('type="checkbox"', str(form['confirmer_doublon']))
+        self.assertTrue(self.formulaire(confirmer=True).is_valid())
+        self.assertTrue(self.formulaire(nom='Gharbi').is_valid())
+
+    def test_fiche_modifiee_non_comparee_a_elle_meme(self):
+        form = PatientForm({'nom': 'Trabelsi', 'prenom': 'Ali', 'dateNaissance': '1990-01-01', 'sexe': 'Homme'},
+                           instance=self.seul)
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_grappes_par_blocs(self):
+        with self.assertNumQueries(3):
+            grappes = list(grappes_doublons(taille_lot=1))
+        self.assertEqual(
+            sorted(sorted(ligne[0] for ligne in g) for g in grappes),
+            sorted([sorted([self.mohamed.pk, self.mohammed.pk, self.inverse.pk]),
+                    sorted([self.cherif.pk, self.sharif.pk])]),
+        )
+
+    def test_recherche_lue_dans_l_index(self):
+        with CaptureQueriesContext(connection) as requetes:
+            candidats('Ben Salah', 'Mohamed', datetime.date(1990, 1, 1))
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + requetes[0]['sql'])
+            details = [ligne[-1] for ligne in cursor.fetchall()]
+        self.assertTrue(any('INDEX patient_cle_doublon_idx' in d for d in details), details)
+
+    def test_commande_et_import(self):
+        importer_patients(io.StringIO("nom,prenom,dateNaissance,sexe\nTrabelsy,Aly,1990-01-01,Homme\n"))
+        sortie = io.StringIO()
+        call_command('detecter_doublons', stdout=sortie)
+        self.assertIn('3 groupes de doublons probables (7 patients)', sortie.getvalue())
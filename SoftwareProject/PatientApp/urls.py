@@ -4,4 +4,6 @@ from . import views
 urlpatterns = [
     path('ajouter/', views.ajouter_patient, name='ajouter_patient'),
     path('liste/', views.liste_patients, name='liste_patients'),
+    path('async/liste/', views.aliste_patients, name='liste_patients_async'),
+    path('<int:patient_id>/dossier/', views.telecharger_dossier, name='telecharger_dossier'),
 ]
@@ -1,10 +1,53 @@
-from django.shortcuts import render, redirect
+import mimetypes
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render, redirect
+from django.template.response import TemplateResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from .dossiers import DossierUploadHandler, etag_dossier, lire_plage, plage_demandee
 from .forms import PatientForm
 from .models import Patient
+from EmployeApp.authentification import role_requis
+from RendezVousApp.pagination import CurseurPaginator
+from RendezVousApp.recherche import filtrer_patients
+from SoftwareProject.exports import format_demande, reponse_export
+
+PATIENTS_PAR_PAGE = 25
+# Colonnes triables -> ordre du curseur (chacun servi par un index de Patient)
+TRIS = {
+    'nom': ('nom', 'prenom', 'id'),
+    'prenom': ('prenom', 'nom', 'id'),
+    'naissance': ('dateNaissance', 'id'),
+}
+# Colonnes affichées : le chemin du dossier n'est pas chargé
+COLONNES_LISTE = ('id', 'nom', 'prenom', 'dateNaissance', 'sexe', 'num_tel')
+COLONNES_EXPORT = [
+    ('id', 'ID'),
+    ('nom', 'Nom'),
+    ('prenom', 'Prénom'),
+    ('dateNaissance', 'Date de naissance'),
+    ('sexe', 'Sexe'),
+    ('num_tel', 'Téléphone'),
+]
 
+@csrf_exempt
 def ajouter_patient(request):
+    # Le gestionnaire d'envoi doit être choisi avant toute lecture de
+    # request.POST (y compris par le contrôle CSRF, refait juste après)
+    request.upload_handlers = [DossierUploadHandler(request)]
+    return _ajouter_patient(request)
+
+
+@csrf_protect
+def _ajouter_patient(request):
     if request.method == 'POST':
-        form = PatientForm(request.POST, request.FILES)
+        form = PatientForm(request.POST, request.FILES,
+                           dossier_trop_volumineux=getattr(request, 'dossier_trop_volumineux', False))
         if form.is_valid():
             form.save()
             return redirect('liste_patients')  # redirige vers la liste
@@ -12,6 +55,94 @@ def ajouter_patient(request):
         form = PatientForm()
     return render(request, 'Patient/ajouter_patient.html', {'form': form})
 
+def _patients_demandes(request):
+    """(patients filtrés, ordre du curseur, tri, recherche) de la liste."""
+    # Tri demandé (?tri=nom, ?tri=-naissance...), par nom par défaut
+    tri = request.GET.get('tri', 'nom')
+    if tri.lstrip('-') not in TRIS:
+        tri = 'nom'
+    ordre = TRIS[tri.lstrip('-')]
+    if tri.startswith('-'):
+        ordre = tuple('-' + champ for champ in ordre)
+
+    patients = Patient.objects.only(*COLONNES_LISTE)
+
+    # Recherche par nom/prénom (index de termes) ou début de téléphone
+    search = request.GET.get('search', '').strip()
+    if search:
+        patients = filtrer_patients(patients, search)
+    return patients, ordre, tri, search
+
+
 def liste_patients(request):
-    patients = Patient.objects.all()  # récupère tous les patients
-    return render(request, 'Patient/liste_patients.html', {'patients': patients})
+    patients, ordre, tri, search = _patients_demandes(request)
+
+    # ?export=csv|xlsx : toutes les lignes filtrées, dans l'ordre du tri
+    if format_demande(request):
+        return reponse_export(request, patients.order_by(*ordre), COLONNES_EXPORT, 'patients')
+
+    # Pagination par curseur, sans COUNT ni OFFSET
+    page_obj = CurseurPaginator(patients, PATIENTS_PAR_PAGE, ordre).page(request.GET.get('curseur'))
+    return render(request, 'Patient/liste_patients.html',
+                  {'patients': page_obj, 'page_obj': page_obj, 'search': search, 'tri': tri})
+
+
+async def aliste_patients(request):
+    """Version async de liste_patients() (ORM asynchrone), pour ASGI."""
+    patients, ordre, tri, search = _patients_demandes(request)
+    if format_demande(request):
+        return reponse_export(request, patients.order_by(*ordre), COLONNES_EXPORT, 'patients')
+    page_obj = await CurseurPaginator(patients, PATIENTS_PAR_PAGE, ordre).apage(request.GET.get('curseur'))
+    return TemplateResponse(request, 'Patient/liste_patients.html',
+                            {'patients': page_obj, 'page_obj': page_obj, 'search': search, 'tri': tri})
+
+
+@role_requis('medecin', 'infirmiere', 'administrateur')
+def telecharger_dossier(request, patient_id):
+    """Dossier du patient, en entier ou par plage (en-tête Range)."""
+    patient = get_object_or_404(Patient.objects.only('id', 'nom', 'prenom', 'dossier'), pk=patient_id)
+    nom = patient.dossier.name
+    if not nom or not default_storage.exists(nom):
+        raise Http404("Dossier introuvable.")
+    chemin = default_storage.path(nom)
+    infos = os.stat(chemin)
+    etag = etag_dossier(nom, infos.st_size, infos.st_mtime)
+
+    non_modifie = get_conditional_response(request, etag=etag)
+    if non_modifie is not None:
+        non_modifie['ETag'] = etag
+        return non_modifie
+
+    type_mime = mimetypes.guess_type(nom)[0] or 'application/octet-stream'
+    nom_affiche = f"dossier_{patient.nom}_{patient.prenom}{os.path.splitext(nom)[1]}"
+
+    # Serveur frontal configuré : il lit le fichier (et gère Range) lui-même
+    if settings.DOSSIERS_ENVOI:
+        response = HttpResponse(content_type=type_mime)
+        if settings.DOSSIERS_ENVOI == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = settings.DOSSIERS_ACCEL_PREFIXE + nom
+        else:
+            response['X-Sendfile'] = chemin
+    else:
+        taille = infos.st_size
+        # If-Range : plage servie seulement si le fichier n'a pas changé
+        plage = None
+        if request.headers.get('If-Range', etag) == etag:
+            try:
+                plage = plage_demandee(request.headers.get('Range'), taille)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{taille}'
+                return response
+        debut, fin = plage or (0, taille - 1)
+        response = StreamingHttpResponse(lire_plage(chemin, debut, fin - debut + 1), content_type=type_mime)
+        response['Content-Length'] = fin - debut + 1
+        if plage:
+            response.status_code = 206
+            response['Content-Range'] = f'bytes {debut}-{fin}/{taille}'
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Content-Disposition'] = content_disposition_header(False, nom_affiche)
+    response['Cache-Control'] = 'private'
+    return response
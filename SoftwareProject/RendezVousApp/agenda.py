@@ -0,0 +1,98 @@
+"""
+Agenda hebdomadaire d'un médecin (JSON compact pour les écrans d'accueil).
+
+La semaine ISO d'un médecin est lue en une requête (index
+rdv_medecin_date_heure_idx), sérialisée une fois, et le JSON est gardé dans
+le cache partagé sous la clé (médecin, semaine), versionnée (voir
+SoftwareProject/projections.py). Toute écriture d'un rendez-vous invalide sa
+semaine — et l'ancienne s'il a été déplacé — une fois la transaction validée :
+signaux pour save()/delete(), appels explicites pour les opérations de masse
+(séries, import, et clôture lancée par cron dans un autre processus).
+"""
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from EmployeApp.models import Employe
+from SoftwareProject import projections
+from .models import RendezVous
+
+PREFIXE = 'rdv:agenda:'
+# Filet de sécurité : l'invalidation est explicite, l'expiration ne sert que
+# si elle manque (écriture directe en base)
+DUREE_CACHE = 600  # secondes
+COLONNES = ['id', 'date', 'heure', 'statut', 'patient_id', 'patient']
+
+
+def semaine_iso(jour):
+    if isinstance(jour, str):
+        jour = datetime.date.fromisoformat(jour)
+    annee, semaine, _ = jour.isocalendar()
+    return annee, semaine
+
+
+def cle_agenda(medecin_id, annee, semaine):
+    return f'{PREFIXE}{medecin_id}:{annee}-W{semaine:02d}'
+
+
+def _requete_agenda(medecin_id, lundi):
+    return (
+        RendezVous.objects.filter(medecin_id=medecin_id, date_rdv__range=(lundi, lundi + datetime.timedelta(days=6)))
+        .order_by('date_rdv', 'heure_rdv')
+        .values_list('pk', 'date_rdv', 'heure_rdv', 'statut', 'patient_id', 'patient__nom', 'patient__prenom')
+    )
+
+
+def _json_agenda(medecin_id, annee, semaine, lundi, rdvs):
+    """JSON de la semaine : une ligne par RDV, colonnes décrites une seule fois."""
+    return json.dumps({
+        'medecin': medecin_id,
+        'semaine': f'{annee}-W{semaine:02d}',
+        'debut': lundi,
+        'colonnes': COLONNES,
+        'rdv': [
+            [pk, date_rdv, heure_rdv.strftime('%H:%M'), statut, patient_id, f'{nom} {prenom}']
+            for pk, date_rdv, heure_rdv, statut, patient_id, nom, prenom in rdvs
+        ],
+    }, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+def calculer_agenda(medecin_id, annee, semaine):
+    lundi = datetime.date.fromisocalendar(annee, semaine, 1)
+    return _json_agenda(medecin_id, annee, semaine, lundi, _requete_agenda(medecin_id, lundi))
+
+
+def agenda_semaine(medecin_id, annee, semaine):
+    """
+    JSON de la semaine depuis le cache, calculé s'il est absent.
+    Retourne None si le médecin n'existe pas (vérifié seulement hors cache).
+    """
+    def calculer():
+        if not Employe.objects.filter(pk=medecin_id, role='medecin').exists():
+            return None
+        return calculer_agenda(medecin_id, annee, semaine)
+
+    return projections.lire(cle_agenda(medecin_id, annee, semaine), calculer, DUREE_CACHE)
+
+
+async def aagenda_semaine(medecin_id, annee, semaine):
+    """Version asynchrone de agenda_semaine() (vue async)."""
+    async def calculer():
+        if not await Employe.objects.filter(pk=medecin_id, role='medecin').aexists():
+            return None
+        lundi = datetime.date.fromisocalendar(annee, semaine, 1)
+        rdvs = [rdv async for rdv in _requete_agenda(medecin_id, lundi)]
+        return _json_agenda(medecin_id, annee, semaine, lundi, rdvs)
+
+    return await projections.alire(cle_agenda(medecin_id, annee, semaine), calculer, DUREE_CACHE)
+
+
+def invalider_agenda(creneaux):
+    """
+    Invalide, après validation de la transaction, les semaines touchées.
+    `creneaux` : itérable de (medecin_id, date_rdv).
+    """
+    projections.invalider_apres_validation(
+        {cle_agenda(medecin_id, *semaine_iso(jour)) for medecin_id, jour in creneaux if medecin_id and jour}
+    )
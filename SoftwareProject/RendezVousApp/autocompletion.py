@@ -0,0 +1,34 @@
+"""
+Autocomplétion des patients et des médecins du formulaire de rendez-vous.
+
+Le formulaire n'embarque plus un <option> par patient : le champ affiche une
+zone de recherche qui interroge ces fonctions (via les vues JSON) et ne
+transmet que l'identifiant choisi, validé ensuite sur cette seule ligne.
+"""
+from EmployeApp.models import Employe
+from PatientApp.models import Patient
+from .recherche import filtrer_patients, filtrer_employes
+
+NB_RESULTATS = 10
+
+
+def libelle_patient(patient):
+    if patient.num_tel:
+        return f"{patient.nom} {patient.prenom} — {patient.num_tel}"
+    return f"{patient.nom} {patient.prenom}"
+
+
+def libelle_medecin(medecin):
+    return f"Dr {medecin.nom} {medecin.prenom} ({medecin.service})"
+
+
+def chercher_patients(q, limite=NB_RESULTATS):
+    """Premiers patients dont le nom, le prénom ou le téléphone commence par `q`."""
+    qs = filtrer_patients(Patient.objects.only('id', 'nom', 'prenom', 'num_tel'), q)
+    return [{'id': p.pk, 'libelle': libelle_patient(p)} for p in qs.order_by('nom', 'prenom')[:limite]]
+
+
+def chercher_medecins(q, limite=NB_RESULTATS):
+    """Premiers médecins dont le nom ou le prénom commence par `q`."""
+    qs = filtrer_employes(Employe.objects.filter(role='medecin').only('id', 'nom', 'prenom', 'service'), q)
+    return [{'id': m.pk, 'libelle': libelle_medecin(m)} for m in qs.order_by('nom', 'prenom')[:limite]]
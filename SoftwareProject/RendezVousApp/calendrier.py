@@ -0,0 +1,105 @@
+"""
+Flux iCalendar (RFC 5545) de l'agenda d'un médecin.
+
+Le flux est produit au fil de l'eau à partir d'un itérateur sur la base
+(valeurs brutes, sans instances de modèle) : la mémoire reste constante
+quelle que soit la longueur de l'historique. Les validateurs HTTP (ETag,
+Last-Modified) viennent d'un COUNT / MAX(modifie_le) lu dans l'index
+(medecin, modifie_le), sans générer le flux. Renommer le patient ou le
+médecin change le contenu du flux : les signaux remettent alors à jour le
+modifie_le des rendez-vous concernés (voir signals.py).
+"""
+import datetime
+
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .creneaux import DUREE_CRENEAU
+from .models import RendezVous
+
+TAILLE_LOT = 2000
+EVENEMENTS_PAR_PAQUET = 100
+STATUTS_ICS = {'prévu': 'CONFIRMED', 'terminé': 'CONFIRMED', 'annulé': 'CANCELLED'}
+
+
+def etat_agenda(medecin_id):
+    """(nombre de RDV, dernière modification) du médecin, en une requête."""
+    etat = RendezVous.objects.filter(medecin_id=medecin_id).aggregate(
+        nombre=Count('pk'), modifie=Max('modifie_le'),
+    )
+    return etat['nombre'], etat['modifie']
+
+
+def etag_agenda(medecin_id, nombre, modifie):
+    # Le nombre de RDV couvre les suppressions, que MAX(modifie_le) ne voit pas
+    return f'"agenda-{medecin_id}-{nombre}-{modifie.timestamp():.6f}"'
+
+
+def _texte(valeur):
+    """Échappement des valeurs TEXT (RFC 5545, 3.3.11)."""
+    return (str(valeur).replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def _plier(ligne):
+    """Coupe une ligne de contenu à 75 octets (RFC 5545, 3.1)."""
+    brut = ligne.encode('utf-8')
+    if len(brut) <= 75:
+        return ligne + '\r\n'
+    morceaux = []
+    while brut:
+        taille = 75 if not morceaux else 74
+        # Ne pas couper au milieu d'un caractère UTF-8
+        while taille < len(brut) and (brut[taille] & 0xC0) == 0x80:
+            taille -= 1
+        morceaux.append(brut[:taille].decode('utf-8'))
+        brut = brut[taille:]
+    return '\r\n '.join(morceaux) + '\r\n'
+
+
+def _utc(valeur):
+    return valeur.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _evenement(pk, date_rdv, heure_rdv, statut, modifie_le, nom, prenom, tz):
+    debut = timezone.make_aware(datetime.datetime.combine(date_rdv, heure_rdv), tz)
+    fin = debut + datetime.timedelta(minutes=DUREE_CRENEAU)
+    lignes = [
+        'BEGIN:VEVENT',
+        f'UID:rdv-{pk}@rendezvous',
+        f'DTSTAMP:{_utc(modifie_le)}',
+        f'LAST-MODIFIED:{_utc(modifie_le)}',
+        f'DTSTART:{_utc(debut)}',
+        f'DTEND:{_utc(fin)}',
+        f'SUMMARY:{_texte(f"RDV {prenom} {nom}")}',
+        f'STATUS:{STATUTS_ICS.get(statut, "CONFIRMED")}',
+        'END:VEVENT',
+    ]
+    return ''.join(_plier(ligne) for ligne in lignes)
+
+
+def flux_ics(medecin):
+    """Générateur du calendrier du médecin, un événement par rendez-vous."""
+    tz = timezone.get_current_timezone()
+    yield ''.join(_plier(ligne) for ligne in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Cabinet//Rendez-vous//FR',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_texte(f"Dr {medecin.prenom} {medecin.nom}")}',
+    ])
+    rdvs = (
+        RendezVous.objects.filter(medecin=medecin)
+        .order_by('date_rdv', 'heure_rdv')
+        .values_list('pk', 'date_rdv', 'heure_rdv', 'statut', 'modifie_le', 'patient__nom', 'patient__prenom')
+        .iterator(chunk_size=TAILLE_LOT)
+    )
+    # Événements regroupés par paquets : moins d'écritures réseau qu'un par un
+    paquet = []
+    for rdv in rdvs:
+        paquet.append(_evenement(*rdv, tz))
+        if len(paquet) == EVENEMENTS_PAR_PAQUET:
+            yield ''.join(paquet)
+            paquet = []
+    yield ''.join(paquet)
+    yield 'END:VCALENDAR\r\n'
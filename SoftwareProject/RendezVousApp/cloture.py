@@ -0,0 +1,93 @@
+"""
+Clôture automatique des rendez-vous passés.
+
+Les RDV 'prévu' dont la date est passée sont passés à 'terminé' par lots :
+chaque lot lit au plus `taille_lot` identifiants en reprenant après la clé
+(date_rdv, heure_rdv, id) du lot précédent (parcours de l'index
+rdv_statut_date_heure_idx, sans charger d'instances), puis les met à jour
+avec un UPDATE ... WHERE id IN (...) dans sa propre transaction courte. Le
+verrou d'écriture de SQLite n'est donc tenu que le temps d'un lot, et une
+pause facultative entre deux lots laisse passer les autres écritures.
+
+À planifier une fois par nuit, par exemple avec cron :
+    5 0 * * *  python manage.py cloturer_rdv
+"""
+import time
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .agenda import invalider_agenda
+from .compteurs import ajuster_compteurs
+from .models import RendezVous
+from .occupation import ajuster_occupation, cellule, recalculer_occupation
+
+TAILLE_LOT = 1000
+
+
+def rdv_a_cloturer(aujourd_hui=None):
+    """RDV encore 'prévu' dont la date est antérieure à aujourd'hui."""
+    aujourd_hui = aujourd_hui or timezone.localdate()
+    return RendezVous.objects.filter(statut='prévu', date_rdv__lt=aujourd_hui)
+
+
+def _apres(date_rdv, heure_rdv, pk):
+    """Clé (date_rdv, heure_rdv, id) strictement supérieure à celle donnée."""
+    return Q(date_rdv__gte=date_rdv) & (
+        Q(date_rdv__gt=date_rdv)
+        | Q(date_rdv=date_rdv, heure_rdv__gt=heure_rdv)
+        | Q(date_rdv=date_rdv, heure_rdv=heure_rdv, pk__gt=pk)
+    )
+
+
+def _clore(lignes):
+    """Passe un lot à 'terminé' ; retourne le nombre de lignes modifiées."""
+    with transaction.atomic():
+        # statut='prévu' de nouveau : une ligne modifiée entre-temps est ignorée.
+        # L'intervalle de dates borne la recherche dans l'index (statut, date_rdv, ...)
+        # que SQLite préfère à la clé primaire pour cette condition.
+        n = RendezVous.objects.filter(
+            statut='prévu',
+            date_rdv__range=(lignes[0][0], lignes[-1][0]),
+            pk__in=[pk for _, _, pk, _ in lignes],
+        ).update(statut='terminé', modifie_le=timezone.now())
+        if n:
+            ajuster_compteurs({'prévu': -n, 'terminé': n})
+            invalider_agenda((medecin_id, date_rdv) for date_rdv, _, _, medecin_id in lignes)
+        if n == len(lignes):
+            deltas = Counter()
+            for date_rdv, heure_rdv, _, medecin_id in lignes:
+                deltas[cellule(medecin_id, date_rdv, heure_rdv, 'prévu')] -= 1
+                deltas[cellule(medecin_id, date_rdv, heure_rdv, 'terminé')] += 1
+            ajuster_occupation(deltas)
+        elif n:
+            # Lignes modifiées entre la lecture et la mise à jour : jours recalculés
+            recalculer_occupation({(medecin_id, date_rdv) for date_rdv, _, _, medecin_id in lignes})
+    return n
+
+
+def cloturer_rdv_passes(taille_lot=TAILLE_LOT, dry_run=False, pause=0, aujourd_hui=None, progression=None):
+    """
+    Clôt les RDV passés et retourne le nombre de lignes concernées.
+    En `dry_run`, rien n'est écrit : on compte seulement les lignes.
+    `progression(total)` est appelé après chaque lot.
+    """
+    qs = rdv_a_cloturer(aujourd_hui).order_by('date_rdv', 'heure_rdv', 'pk')
+    total = 0
+    cle = None
+    while True:
+        lot = qs.filter(_apres(*cle)) if cle else qs
+        lignes = list(lot.values_list('date_rdv', 'heure_rdv', 'pk', 'medecin_id')[:taille_lot])
+        if not lignes:
+            break
+        cle = lignes[-1][:3]
+        total += len(lignes) if dry_run else _clore(lignes)
+        if progression:
+            progression(total)
+        if len(lignes) < taille_lot:
+            break
+        if pause and not dry_run:
+            time.sleep(pause)
+    return total
@@ -0,0 +1,73 @@
+"""
+Compteurs de rendez-vous par statut pour l'en-tête de l'historique.
+
+Ils sont tenus dans la table CompteurStatut (une ligne par statut), pas dans
+le cache : chaque écriture d'un rendez-vous y ajoute son delta par un
+INSERT ... ON CONFLICT DO UPDATE SET nombre = nombre + n, dans la transaction
+de cette écriture (atomic() des vues et des opérations de masse). Tous les
+processus (workers, commandes lancées par cron) lisent donc les mêmes valeurs,
+et une transaction annulée n'y laisse rien.
+
+Les signaux de signals.py couvrent save()/delete() ; les écritures qui
+contournent save() appellent ajuster_compteurs() (clôture, séries, import,
+annulation). La page d'historique lit les trois lignes par clé primaire, sans
+parcourir RendezVous. En cas de doute (écriture directe en base),
+recalculer_compteurs() les refait en une requête d'agrégation conditionnelle.
+"""
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from .models import CompteurStatut, RendezVous
+
+# statut -> alias d'agrégat (ASCII)
+STATUTS = {'prévu': 'prevu', 'annulé': 'annule', 'terminé': 'termine'}
+
+
+def _agregats():
+    return {alias: Count('pk', filter=Q(statut=statut)) for statut, alias in STATUTS.items()}
+
+
+def compter_statuts():
+    """Une seule requête : COUNT(*) FILTER (WHERE statut = ...) pour chaque statut."""
+    resultat = RendezVous.objects.aggregate(**_agregats())
+    return {statut: resultat[alias] for statut, alias in STATUTS.items()}
+
+
+def _compteurs(lignes):
+    return {statut: 0 for statut in STATUTS} | dict(lignes)
+
+
+def compteurs_statuts():
+    """{statut: nombre} lus dans CompteurStatut (trois lignes, par clé primaire)."""
+    return _compteurs(CompteurStatut.objects.values_list('statut', 'nombre'))
+
+
+async def acompteurs_statuts():
+    """Version asynchrone de compteurs_statuts() (vues async)."""
+    return _compteurs([ligne async for ligne in CompteurStatut.objects.values_list('statut', 'nombre')])
+
+
+def _requete_upsert():
+    qn = connection.ops.quote_name
+    table = qn(CompteurStatut._meta.db_table)
+    statut, nombre = qn('statut'), qn('nombre')
+    return 'INSERT INTO %s (%s, %s) VALUES (%%s, %%s) ON CONFLICT (%s) DO UPDATE SET %s = %s.%s + excluded.%s' % (
+        table, statut, nombre, statut, nombre, table, nombre, nombre,
+    )
+
+
+def ajuster_compteurs(deltas):
+    """Ajoute chaque delta de {statut: delta} à son compteur, dans la transaction en cours."""
+    valeurs = [(statut, delta) for statut, delta in deltas.items() if delta and statut in STATUTS]
+    if valeurs:
+        with connection.cursor() as cursor:
+            cursor.executemany(_requete_upsert(), valeurs)
+
+
+def recalculer_compteurs():
+    """Refait les compteurs depuis RendezVous (une requête d'agrégation)."""
+    with transaction.atomic():
+        CompteurStatut.objects.all().delete()
+        CompteurStatut.objects.bulk_create(
+            CompteurStatut(statut=statut, nombre=n) for statut, n in compter_statuts().items()
+        )
@@ -0,0 +1,97 @@
+"""
+Recherche des créneaux libres des médecins.
+
+Chaque journée est représentée par un entier dont le bit i vaut 1 si le
+créneau i (HEURE_OUVERTURE + i * DUREE_CRENEAU) est occupé. Tous les RDV de
+la période sont chargés en une seule requête, puis les créneaux libres sont
+calculés en mémoire, sans requête par créneau candidat.
+"""
+import datetime
+
+from django.utils import timezone
+
+from .models import RendezVous, HEURE_OUVERTURE, HEURE_FERMETURE, JOURS_FERMES
+
+DUREE_CRENEAU = 30  # minutes
+
+_OUVERTURE = HEURE_OUVERTURE.hour * 60 + HEURE_OUVERTURE.minute
+_FERMETURE = HEURE_FERMETURE.hour * 60 + HEURE_FERMETURE.minute
+
+# validate_heure accepte 18:00 inclus : dernier créneau possible
+NB_CRENEAUX = (_FERMETURE - _OUVERTURE) // DUREE_CRENEAU + 1
+JOURNEE_LIBRE = 0
+LIBELLES = [
+    '%02d:%02d' % divmod(_OUVERTURE + i * DUREE_CRENEAU, 60)
+    for i in range(NB_CRENEAUX)
+]
+
+
+def _minutes(heure):
+    return heure.hour * 60 + heure.minute
+
+
+def masque_rdv(heure):
+    """Bits des créneaux recouverts par un RDV de DUREE_CRENEAU minutes commençant à `heure`."""
+    debut = _minutes(heure) - _OUVERTURE
+    fin = debut + DUREE_CRENEAU
+    premier = max(debut // DUREE_CRENEAU, 0)
+    dernier = min((fin - 1) // DUREE_CRENEAU, NB_CRENEAUX - 1)
+    if dernier < premier:
+        return 0
+    return ((1 << (dernier - premier + 1)) - 1) << premier
+
+
+def jours_ouvres(debut, fin):
+    """Dates entre `debut` et `fin` inclus, hors jours de fermeture."""
+    jour = debut
+    while jour <= fin:
+        if jour.weekday() not in JOURS_FERMES:
+            yield jour
+        jour += datetime.timedelta(days=1)
+
+
+def creneaux_libres(medecin_ids, debut, fin, maintenant=None):
+    """
+    Retourne {medecin_id: {date: [libellés 'HH:MM' libres]}} pour la période.
+    Les jours passés sont ignorés ; pour aujourd'hui, seuls les créneaux à venir
+    sont proposés (même règle que RendezVous.clean).
+    """
+    maintenant = maintenant or timezone.localtime()
+    aujourd_hui = maintenant.date()
+    debut = max(debut, aujourd_hui)
+
+    occupation = {}
+    rdvs = (
+        RendezVous.objects
+        .filter(medecin_id__in=medecin_ids, date_rdv__range=(debut, fin))
+        .exclude(statut='annulé')
+        .values_list('medecin_id', 'date_rdv', 'heure_rdv')
+    )
+    for medecin_id, date_rdv, heure_rdv in rdvs:
+        cle = (medecin_id, date_rdv)
+        occupation[cle] = occupation.get(cle, JOURNEE_LIBRE) | masque_rdv(heure_rdv)
+
+    # Créneaux déjà passés aujourd'hui
+    deja_passe = 0
+    ecoule = _minutes(maintenant) - _OUVERTURE
+    if ecoule >= 0:
+        nb_passes = min(ecoule // DUREE_CRENEAU + 1, NB_CRENEAUX)
+        deja_passe = (1 << nb_passes) - 1
+
+    jours = list(jours_ouvres(debut, fin))
+    cache_libelles = {}
+    resultat = {}
+    for medecin_id in medecin_ids:
+        par_jour = {}
+        for jour in jours:
+            occupe = occupation.get((medecin_id, jour), JOURNEE_LIBRE)
+            if jour == aujourd_hui:
+                occupe |= deja_passe
+            libres = cache_libelles.get(occupe)
+            if libres is None:
+                libres = [LIBELLES[i] for i in range(NB_CRENEAUX) if not occupe >> i & 1]
+                cache_libelles[occupe] = libres
+            if libres:
+                par_jour[jour] = libres
+        resultat[medecin_id] = par_jour
+    return resultat
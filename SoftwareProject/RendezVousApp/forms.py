@@ -1,23 +1,80 @@
 from django import forms
+from django.urls import reverse
+from django.utils.html import format_html
 from .models import RendezVous
+from .series import occurrences, MAX_OCCURRENCES
+from .autocompletion import libelle_patient, libelle_medecin
 from PatientApp.models import Patient
 from EmployeApp.models import Employe
 
+
+class AutocompleteWidget(forms.Widget):
+    """
+    Zone de recherche + identifiant caché, à la place d'un <select> listant
+    toute la table. Seul le libellé de la valeur courante est lu en base.
+    """
+    input_type = 'autocomplete'
+
+    def __init__(self, url_name, libelle, attrs=None):
+        super().__init__(attrs)
+        self.url_name = url_name
+        self.libelle = libelle
+
+    def libelle_valeur(self, value):
+        # `choices` est fourni par ModelChoiceField (queryset du champ)
+        if value in (None, '') or not hasattr(self, 'choices'):
+            return ''
+        try:
+            obj = self.choices.queryset.filter(pk=value).first()
+        except (ValueError, TypeError):
+            return ''
+        return self.libelle(obj) if obj else ''
+
+    def id_for_label(self, id_):
+        # Le <label> pointe sur la zone de recherche visible
+        return f'{id_}_recherche' if id_ else id_
+
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = self.build_attrs(self.attrs, attrs)
+        id_ = attrs.get('id', f'id_{name}')
+        classes = attrs.get('class', '')
+        if attrs.get('aria-invalid'):
+            classes += ' is-invalid'
+        return format_html(
+            '<input type="hidden" name="{}" id="{}" value="{}">'
+            '<input type="search" id="{}_recherche" class="{}" data-autocomplete="{}" data-cible="{}"'
+            ' value="{}" placeholder="{}" autocomplete="off"{}>'
+            '<div class="autocomplete-resultats" id="{}_resultats"></div>',
+            name, id_, '' if value is None else value,
+            id_, classes, reverse(self.url_name), id_,
+            self.libelle_valeur(value), attrs.get('placeholder', ''),
+            format_html(' required') if attrs.get('required') else '',
+            id_,
+        )
+
+    def value_from_datadict(self, data, files, name):
+        return data.get(name)
+
 class RendezVousForm(forms.ModelForm):
-    # Liste déroulante pour les patients
+    # Patient choisi par autocomplétion (nom, prénom ou téléphone) ;
+    # seul l'identifiant envoyé est validé en base
     patient = forms.ModelChoiceField(
         queryset=Patient.objects.all(),
         label="Patient",
         empty_label="Sélectionner un patient",
-        widget=forms.Select(attrs={'class': 'form-select'})
+        widget=AutocompleteWidget('autocomplete_patients', libelle_patient, attrs={
+            'class': 'form-control-modern', 'placeholder': 'Nom, prénom ou téléphone',
+        })
     )
     
-    # Liste déroulante pour les médecins
+    # Médecin choisi par autocomplétion (nom ou prénom)
     medecin = forms.ModelChoiceField(
         queryset=Employe.objects.filter(role='medecin'),
         label="Médecin",
         empty_label="Sélectionner un médecin",
-        widget=forms.Select(attrs={'class': 'form-select'})
+        widget=AutocompleteWidget('autocomplete_medecins', libelle_medecin, attrs={
+            'class': 'form-control-modern', 'placeholder': 'Nom ou prénom du médecin',
+        })
     )
 
     class Meta:
@@ -35,3 +92,74 @@ class RendezVousForm(forms.ModelForm):
             'heure_rdv': 'Heure du rendez-vous',
             'statut': 'Statut du rendez-vous',
         }
+
+
+class ImportRendezVousForm(forms.Form):
+    fichier = forms.FileField(
+        label="Fichier CSV",
+        help_text="Colonnes : patient, medecin, date_rdv, heure_rdv, statut (facultatif)",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'})
+    )
+
+
+class SerieRendezVousForm(forms.Form):
+    patient = forms.ModelChoiceField(
+        queryset=Patient.objects.all(),
+        label="Patient",
+        empty_label="Sélectionner un patient",
+        widget=AutocompleteWidget('autocomplete_patients', libelle_patient, attrs={
+            'class': 'form-control', 'placeholder': 'Nom, prénom ou téléphone',
+        })
+    )
+    medecin = forms.ModelChoiceField(
+        queryset=Employe.objects.filter(role='medecin'),
+        label="Médecin",
+        empty_label="Sélectionner un médecin",
+        widget=AutocompleteWidget('autocomplete_medecins', libelle_medecin, attrs={
+            'class': 'form-control', 'placeholder': 'Nom ou prénom du médecin',
+        })
+    )
+    date_debut = forms.DateField(
+        label="Premier rendez-vous",
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    heure_rdv = forms.TimeField(
+        label="Heure du rendez-vous",
+        widget=forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'})
+    )
+    frequence = forms.ChoiceField(
+        label="Fréquence",
+        choices=[('hebdomadaire', 'Toutes les semaines'), ('bimensuelle', 'Toutes les deux semaines')],
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    nombre = forms.IntegerField(
+        label="Nombre de rendez-vous",
+        required=False, min_value=1, max_value=MAX_OCCURRENCES,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    date_fin = forms.DateField(
+        label="Ou jusqu'au",
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+    ignorer_rejets = forms.BooleanField(
+        label="Créer les autres rendez-vous si certaines dates sont impossibles",
+        required=False,
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        nombre = cleaned_data.get('nombre')
+        date_fin = cleaned_data.get('date_fin')
+        date_debut = cleaned_data.get('date_debut')
+        if nombre is None and date_fin is None:
+            raise forms.ValidationError("Indiquer un nombre de rendez-vous ou une date de fin.")
+        if date_fin and date_debut and date_fin < date_debut:
+            self.add_error('date_fin', "La date de fin doit suivre le premier rendez-vous.")
+        return cleaned_data
+
+    def dates(self):
+        return occurrences(
+            self.cleaned_data['date_debut'], self.cleaned_data['frequence'],
+            nombre=self.cleaned_data.get('nombre'), date_fin=self.cleaned_data.get('date_fin'),
+        )
@@ -0,0 +1,156 @@
+"""
+Banc de charge des vues de lecture : vues synchrones sous WSGI contre leurs
+variantes async (routes .../async/...) sous ASGI.
+
+Les deux gestionnaires de Django sont appelés directement dans le processus
+(sans serveur ni réseau), ce qui isole le coût de la pile de vues :
+    WSGI : WSGIHandler appelé par un pool de `--concurrence` threads,
+           sur la vue synchrone
+    ASGI : ASGIHandler appelé par `--concurrence` tâches asyncio,
+           sur la variante async de la même vue
+Chaque pile sert ainsi le code écrit pour elle (aucune adaptation
+sync_to_async / async_to_sync autour de la vue). Pour chaque paire d'URL,
+on mesure le débit (requêtes/s) et les latences p50/p99.
+"""
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.urls import reverse
+
+# (vue synchrone, variante async)
+URLS_DEFAUT = [
+    ('liste_rdv', 'liste_rdv_async'),
+    ('historique_rdv', 'historique_rdv_async'),
+    ('liste_patients', 'liste_patients_async'),
+    ('liste_employes', 'liste_employes_async'),
+    ('liste_materiels', 'liste_materiels_async'),
+]
+
+
+def _centile(latences, p):
+    latences = sorted(latences)
+    return latences[min(len(latences) - 1, int(len(latences) * p / 100))]
+
+
+def _environ(url):
+    morceaux = urlsplit(url)
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': morceaux.path,
+        'QUERY_STRING': morceaux.query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def _scope(url):
+    morceaux = urlsplit(url)
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': morceaux.path,
+        'raw_path': morceaux.path.encode(),
+        'query_string': morceaux.query.encode(),
+        'headers': [(b'host', b'localhost')],
+        'server': ('localhost', 80),
+        'client': ('127.0.0.1', 50000),
+    }
+
+
+def mesurer_wsgi(application, url, requetes, concurrence):
+    def une_requete(_):
+        statut = []
+        debut = time.perf_counter()
+        corps = application(_environ(url), lambda s, h, exc_info=None: statut.append(s))
+        for _morceau in corps:
+            pass
+        if hasattr(corps, 'close'):
+            corps.close()
+        assert statut[0].startswith('200'), f"{url} : {statut[0]}"
+        return time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(concurrence) as pool:
+        latences = list(pool.map(une_requete, range(requetes)))
+    return time.perf_counter() - debut, latences
+
+
+async def _mesurer_asgi(application, url, requetes, concurrence):
+    semaphore = asyncio.Semaphore(concurrence)
+
+    async def une_requete():
+        async with semaphore:
+            statut = []
+            messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                # Client toujours connecté : Django annule cette attente après la réponse
+                await asyncio.Event().wait()
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statut.append(message['status'])
+
+            debut = time.perf_counter()
+            await application(_scope(url), receive, send)
+            assert statut[0] == 200, f"{url} : {statut[0]}"
+            return time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    latences = await asyncio.gather(*(une_requete() for _ in range(requetes)))
+    return time.perf_counter() - debut, latences
+
+
+class Command(BaseCommand):
+    help = "Compare débit et latence p99 des vues de lecture synchrones sous WSGI et de leurs variantes async sous ASGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requetes', type=int, default=500, help="Requêtes par URL et par pile (défaut : 500)")
+        parser.add_argument('--concurrence', type=int, default=64, help="Requêtes simultanées (défaut : 64)")
+        parser.add_argument('--url', action='append', nargs=2, metavar=('WSGI', 'ASGI'),
+                            help="Chemin de la vue synchrone puis de sa variante async (répétable) ; "
+                                 "par défaut les listes principales")
+
+    def handle(self, *args, **options):
+        urls = options['url'] or [(reverse(nom), reverse(nom_async)) for nom, nom_async in URLS_DEFAUT]
+        requetes, concurrence = options['requetes'], options['concurrence']
+        wsgi, asgi = get_wsgi_application(), get_asgi_application()
+
+        self.stdout.write(f"{requetes} requêtes par URL, concurrence {concurrence}")
+        self.stdout.write(f"{'URL':<32}{'pile':<6}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}")
+        for url, url_async in urls:
+            # Requêtes de chauffe (caches, connexions) avant de mesurer les deux piles
+            mesurer_wsgi(wsgi, url, 1, 1)
+            asyncio.run(_mesurer_asgi(asgi, url_async, 1, 1))
+            for pile, chemin, mesure in (
+                ('WSGI', url, lambda: mesurer_wsgi(wsgi, url, requetes, concurrence)),
+                ('ASGI', url_async, lambda: asyncio.run(_mesurer_asgi(asgi, url_async, requetes, concurrence))),
+            ):
+                duree, latences = mesure()
+                connections.close_all()
+                self.stdout.write(
+                    f"{chemin:<32}{pile:<6}{requetes / duree:>9.0f}"
+                    f"{statistics.median(latences) * 1000:>9.1f}{_centile(latences, 99) * 1000:>9.1f}"
+                )
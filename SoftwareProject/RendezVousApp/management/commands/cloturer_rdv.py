@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from RendezVousApp.cloture import cloturer_rdv_passes, TAILLE_LOT
+
+
+class Command(BaseCommand):
+    help = "Passe à 'terminé' les rendez-vous 'prévu' dont la date est passée (à lancer chaque nuit)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT,
+                            help=f"Nombre de rendez-vous mis à jour par transaction (défaut : {TAILLE_LOT})")
+        parser.add_argument('--pause', type=float, default=0,
+                            help="Pause en secondes entre deux lots, pour laisser passer les autres écritures")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Affiche le nombre de rendez-vous concernés sans rien modifier")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        dry_run = options['dry_run']
+
+        def progression(total):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{total} rendez-vous traités")
+
+        total = cloturer_rdv_passes(options['taille_lot'], dry_run=dry_run,
+                                    pause=options['pause'], progression=progression)
+        duree = time.perf_counter() - debut
+        if dry_run:
+            self.stdout.write(f"{total} rendez-vous passés seraient clôturés (aucune modification).")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{total} rendez-vous clôturés en {duree:.1f} s."))
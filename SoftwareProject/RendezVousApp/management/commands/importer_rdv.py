@@ -0,0 +1,44 @@
+import contextlib
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from RendezVousApp.importation import importer_rdv, TAILLE_LOT
+
+
+class Command(BaseCommand):
+    help = "Importe des rendez-vous depuis un fichier CSV (patient, medecin, date_rdv, heure_rdv[, statut])."
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help="Chemin du fichier CSV (UTF-8)")
+        parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT,
+                            help=f"Nombre de lignes traitées par lot (défaut : {TAILLE_LOT})")
+        parser.add_argument('--rapport', help="Fichier CSV où écrire les lignes rejetées")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+
+        def progression(rapport):
+            self.stdout.write(f"{rapport.lignes} lignes lues, {rapport.crees} créées, {rapport.rejetees} rejetées")
+
+        # Lignes rejetées écrites au fil de l'import : la mémoire ne dépend pas de leur nombre
+        try:
+            with contextlib.ExitStack() as fichiers:
+                fichier = fichiers.enter_context(open(options['fichier'], encoding='utf-8-sig', newline=''))
+                rejets = None
+                if options['rapport']:
+                    rejets = fichiers.enter_context(open(options['rapport'], 'w', encoding='utf-8', newline=''))
+                rapport = importer_rdv(fichier, options['taille_lot'], progression, rejets)
+        except OSError as e:
+            raise CommandError(e)
+
+        if not options['rapport']:
+            for ligne, message in rapport.erreurs[:50]:
+                self.stderr.write(f"Ligne {ligne} : {message}")
+
+        duree = time.perf_counter() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f"{rapport.crees} rendez-vous importés sur {rapport.lignes} lignes "
+            f"({rapport.rejetees} rejetées) en {duree:.1f} s "
+            f"({rapport.lignes / duree if duree else 0:.0f} lignes/s)."
+        ))
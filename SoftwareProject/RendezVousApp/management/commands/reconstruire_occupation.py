@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from RendezVousApp.occupation import reconstruire_occupation, TAILLE_LOT
+
+
+class Command(BaseCommand):
+    help = "Recalcule entièrement les agrégats d'occupation des médecins depuis les rendez-vous."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT,
+                            help=f"Nombre de cellules insérées par requête (défaut : {TAILLE_LOT})")
+
+    def handle(self, *args, **options):
+        if options['taille_lot'] < 1:
+            raise CommandError("--taille-lot doit être au moins 1.")
+        debut = time.perf_counter()
+
+        def progression(total):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{total} cellules écrites")
+
+        total = reconstruire_occupation(options['taille_lot'], progression=progression)
+        duree = time.perf_counter() - debut
+        self.stdout.write(self.style.SUCCESS(f"{total} cellules d'occupation recalculées en {duree:.1f} s."))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EmployeApp', '0001_initial'),
+        ('PatientApp', '0002_patient_num_tel'),
+        ('RendezVousApp', '0006_remove_rendezvous_medecin_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='rendezvous',
+            constraint=models.UniqueConstraint(condition=models.Q(('statut', 'annulé'), _negated=True), fields=('medecin', 'date_rdv', 'heure_rdv'), name='rdv_unique_medecin_creneau'),
+        ),
+        migrations.AddConstraint(
+            model_name='rendezvous',
+            constraint=models.UniqueConstraint(condition=models.Q(('statut', 'annulé'), _negated=True), fields=('patient', 'date_rdv', 'heure_rdv'), name='rdv_unique_patient_creneau'),
+        ),
+    ]
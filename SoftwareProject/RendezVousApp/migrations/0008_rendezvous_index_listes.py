@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EmployeApp', '0001_initial'),
+        ('PatientApp', '0002_patient_num_tel'),
+        ('RendezVousApp', '0007_rendezvous_unique_creneau'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rendezvous',
+            index=models.Index(fields=['statut', 'date_rdv', 'heure_rdv'], name='rdv_statut_date_heure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rendezvous',
+            index=models.Index(condition=models.Q(('statut', 'prévu'), _negated=True), fields=['date_rdv', 'heure_rdv'], name='rdv_historique_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rendezvous',
+            index=models.Index(fields=['medecin', 'date_rdv', 'heure_rdv'], name='rdv_medecin_date_heure_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:05
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Copie figée de RendezVousApp.recherche.termes() au moment de cette
+# migration : une évolution de la normalisation ne doit pas changer ce
+# qu'elle écrit (ni la casser si la fonction est renommée ou déplacée).
+_SEPARATEURS = re.compile(r'[^0-9a-z]+')
+
+
+def termes(*textes):
+    normalises = []
+    for texte in textes:
+        texte = unicodedata.normalize('NFKD', texte or '')
+        texte = ''.join(c for c in texte if not unicodedata.combining(c))
+        normalises.append(_SEPARATEURS.sub(' ', texte.lower()).strip())
+    return {t for texte in normalises for t in texte.split()}
+
+
+def indexer_existants(apps, schema_editor):
+    Patient = apps.get_model('PatientApp', 'Patient')
+    Employe = apps.get_model('EmployeApp', 'Employe')
+    TermePatient = apps.get_model('RendezVousApp', 'TermePatient')
+    TermeEmploye = apps.get_model('RendezVousApp', 'TermeEmploye')
+    TermePatient.objects.bulk_create(
+        TermePatient(patient_id=pk, terme=t[:100])
+        for pk, nom, prenom in Patient.objects.values_list('pk', 'nom', 'prenom').iterator()
+        for t in termes(nom, prenom)
+    )
+    TermeEmploye.objects.bulk_create(
+        TermeEmploye(employe_id=pk, terme=t[:100])
+        for pk, nom, prenom in Employe.objects.values_list('pk', 'nom', 'prenom').iterator()
+        for t in termes(nom, prenom)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EmployeApp', '0001_initial'),
+        ('PatientApp', '0002_patient_num_tel'),
+        ('RendezVousApp', '0008_rendezvous_index_listes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermeEmploye',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('terme', models.CharField(max_length=100)),
+                ('employe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='termes_recherche', to='EmployeApp.employe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['terme', 'employe'], name='terme_employe_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TermePatient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('terme', models.CharField(max_length=100)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='termes_recherche', to='PatientApp.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['terme', 'patient'], name='terme_patient_idx')],
+            },
+        ),
+        migrations.RunPython(indexer_existants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EmployeApp', '0001_initial'),
+        ('PatientApp', '0002_patient_num_tel'),
+        ('RendezVousApp', '0009_termes_recherche'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rendezvous',
+            name='modifie_le',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='rendezvous',
+            index=models.Index(fields=['medecin', 'modifie_le'], name='rdv_medecin_modifie_idx'),
+        ),
+    ]
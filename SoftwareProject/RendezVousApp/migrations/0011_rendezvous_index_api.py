@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EmployeApp', '0001_initial'),
+        ('PatientApp', '0002_patient_num_tel'),
+        ('RendezVousApp', '0010_rendezvous_modifie_le'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rendezvous',
+            index=models.Index(fields=['date_rdv', 'heure_rdv'], name='rdv_date_heure_idx'),
+        ),
+    ]
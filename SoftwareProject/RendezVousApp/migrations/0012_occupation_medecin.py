@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:11
+
+from collections import Counter
+from itertools import islice
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def calculer_occupation(apps, schema_editor):
+    """Agrégats initiaux calculés depuis les rendez-vous existants (voir occupation._compter)."""
+    RendezVous = apps.get_model('RendezVousApp', 'RendezVous')
+    OccupationMedecin = apps.get_model('RendezVousApp', 'OccupationMedecin')
+    lignes = RendezVous.objects.order_by('medecin_id', 'date_rdv', 'heure_rdv').values_list(
+        'medecin_id', 'date_rdv', 'heure_rdv', 'statut').iterator(chunk_size=2000)
+
+    def cellules():
+        jour, compteur = None, Counter()
+        for medecin_id, date, heure, statut in lignes:
+            if (medecin_id, date) != jour:
+                yield from cellules_du_jour(jour, compteur)
+                jour, compteur = (medecin_id, date), Counter()
+            compteur[heure.hour, statut] += 1
+        yield from cellules_du_jour(jour, compteur)
+
+    def cellules_du_jour(jour, compteur):
+        for (heure, statut), nombre in compteur.items():
+            yield OccupationMedecin(medecin_id=jour[0], date=jour[1], heure=heure,
+                                    jour_semaine=jour[1].weekday(), statut=statut, nombre=nombre)
+
+    objets = cellules()
+    while lot := list(islice(objets, 2000)):
+        OccupationMedecin.objects.bulk_create(lot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EmployeApp', '0003_employe_index_annuaire'),
+        ('RendezVousApp', '0011_rendezvous_index_api'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupationMedecin',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('heure', models.PositiveSmallIntegerField()),
+                ('jour_semaine', models.PositiveSmallIntegerField()),
+                ('statut', models.CharField(choices=[('prévu', 'Prévu'), ('annulé', 'Annulé'), ('terminé', 'Terminé')], max_length=20)),
+                ('nombre', models.IntegerField(default=0)),
+                ('medecin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupations', to='EmployeApp.employe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'medecin', 'statut', 'jour_semaine', 'heure', 'nombre'], name='occupation_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('medecin', 'date', 'heure', 'statut'), name='occupation_cellule_unique')],
+            },
+        ),
+        migrations.RunPython(calculer_occupation, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:32
+
+from django.db import migrations, models
+
+
+def compter_statuts(apps, schema_editor):
+    """Compteurs initiaux : une requête GROUP BY statut sur les rendez-vous existants."""
+    RendezVous = apps.get_model('RendezVousApp', 'RendezVous')
+    CompteurStatut = apps.get_model('RendezVousApp', 'CompteurStatut')
+    CompteurStatut.objects.bulk_create(
+        CompteurStatut(statut=statut, nombre=n)
+        for statut, n in RendezVous.objects.values('statut').annotate(n=models.Count('pk')).order_by()
+        .values_list('statut', 'n')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('RendezVousApp', '0012_occupation_medecin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurStatut',
+            fields=[
+                ('statut', models.CharField(choices=[('prévu', 'Prévu'), ('annulé', 'Annulé'), ('terminé', 'Terminé')], max_length=20, primary_key=True, serialize=False)),
+                ('nombre', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(compter_statuts, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,12 @@ from django.core.exceptions import ValidationError
 import datetime
 from PatientApp.models import Patient
 from EmployeApp.models import Employe
+
+# Horaires d'ouverture du cabinet (utilisés par les validateurs et la recherche de créneaux)
+HEURE_OUVERTURE = datetime.time(8, 0)
+HEURE_FERMETURE = datetime.time(18, 0)
+JOURS_FERMES = (5, 6)  # samedi, dimanche
+
 # Fonctions validateurs
 
 def validate_date_future(value):
@@ -13,12 +19,12 @@ def validate_date_future(value):
     
        # 2 Interdire samedi (5) et dimanche (6)
     # weekday() : lundi=0 ... dimanche=6
-    if value.weekday() in [5, 6]:
+    if value.weekday() in JOURS_FERMES:
         raise ValidationError("Les rendez-vous ne sont pas autorisés le samedi et le dimanche.")
 
 def validate_heure(value):
     """Valide que l'heure est dans la plage 08:00 - 18:00"""
-    if value < datetime.time(8, 0) or value > datetime.time(18, 0):
+    if value < HEURE_OUVERTURE or value > HEURE_FERMETURE:
         raise ValidationError("L'heure du rendez-vous doit être entre 08:00 et 18:00.")
 
 def validate_patient_id(value):
@@ -32,6 +38,9 @@ def validate_medecin_id(value):
         raise ValidationError("L'ID du médecin doit être un entier positif.")
 
 
+CRENEAU_CONSTRAINTS = ('rdv_unique_medecin_creneau', 'rdv_unique_patient_creneau')
+
+
 class RendezVous(models.Model):
     
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='rendezvous',default=1)
@@ -47,6 +56,65 @@ class RendezVous(models.Model):
         ],
         default='prévu'
     )
+    # Date de dernière modification : sert de validateur HTTP aux flux d'agenda
+    modifie_le = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Liste des RDV prévus : statut = 'prévu' ORDER BY date_rdv, heure_rdv
+            models.Index(fields=['statut', 'date_rdv', 'heure_rdv'], name='rdv_statut_date_heure_idx'),
+            # Historique : statut != 'prévu' ORDER BY date_rdv DESC, heure_rdv DESC
+            # (index partiel parcouru dans l'ordre, sans tri temporaire)
+            models.Index(
+                fields=['date_rdv', 'heure_rdv'],
+                condition=~models.Q(statut='prévu'),
+                name='rdv_historique_date_idx',
+            ),
+            # Historique d'un médecin : medecin = X ORDER BY date_rdv DESC, heure_rdv DESC
+            models.Index(fields=['medecin', 'date_rdv', 'heure_rdv'], name='rdv_medecin_date_heure_idx'),
+            # API : tous statuts confondus ORDER BY date_rdv DESC, heure_rdv DESC
+            models.Index(fields=['date_rdv', 'heure_rdv'], name='rdv_date_heure_idx'),
+            # Flux iCalendar : COUNT / MAX(modifie_le) d'un médecin lus dans l'index seul
+            models.Index(fields=['medecin', 'modifie_le'], name='rdv_medecin_modifie_idx'),
+        ]
+        constraints = [
+            # Un médecin / un patient ne peut avoir qu'un RDV actif par créneau
+            models.UniqueConstraint(
+                fields=['medecin', 'date_rdv', 'heure_rdv'],
+                condition=~models.Q(statut='annulé'),
+                name='rdv_unique_medecin_creneau',
+            ),
+            models.UniqueConstraint(
+                fields=['patient', 'date_rdv', 'heure_rdv'],
+                condition=~models.Q(statut='annulé'),
+                name='rdv_unique_patient_creneau',
+            ),
+        ]
+
+    def get_constraints(self):
+        """
+        Les contraintes de créneau sont vérifiées en une seule requête par
+        validate_rdv et garanties par la base : inutile de les revalider
+        (deux requêtes de plus) pendant le full_clean du formulaire.
+        """
+        return [
+            (model_class, [c for c in constraints if c.name not in CRENEAU_CONSTRAINTS])
+            for model_class, constraints in super().get_constraints()
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Statut tel que lu en base : permet aux signaux de détecter un changement
+        instance._statut_initial = instance.__dict__.get('statut')
+        # Médecin et date lus en base : semaine d'agenda à invalider si le RDV est déplacé
+        instance._agenda_initial = (instance.__dict__.get('medecin_id'), instance.__dict__.get('date_rdv'))
+        # Cellule d'occupation (médecin, date, heure, statut) à décrémenter si elle change
+        instance._occupation_initial = tuple(
+            instance.__dict__.get(champ) for champ in ('medecin_id', 'date_rdv', 'heure_rdv', 'statut')
+        )
+        return instance
+
     def clean(self):
         """Validation globale sur l'objet entier"""
         if self.date_rdv and self.heure_rdv:  # <-- vérifier qu'ils ne sont pas None
@@ -60,3 +128,51 @@ class RendezVous(models.Model):
 
     def __str__(self):
         return f"Rdv {self.id}: Patient {self.nom} {self.prenom} avec Médecin {self.nom} {self.prenom} le {self.date_rdv} à {self.heure_rdv} ({self.statut})"
+
+
+# Agrégats d'occupation des médecins (voir occupation.py, maintenus par signals.py)
+
+class OccupationMedecin(models.Model):
+    """Nombre de rendez-vous d'un médecin pour une date, une heure et un statut."""
+    medecin = models.ForeignKey(Employe, on_delete=models.CASCADE, related_name='occupations')
+    date = models.DateField()
+    heure = models.PositiveSmallIntegerField()
+    # Recopié de la date (lundi=0) : la carte jour × heure se groupe sans calcul de date
+    jour_semaine = models.PositiveSmallIntegerField()
+    statut = models.CharField(max_length=20, choices=RendezVous._meta.get_field('statut').choices)
+    nombre = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Cible du INSERT ... ON CONFLICT des mises à jour incrémentales
+            models.UniqueConstraint(fields=['medecin', 'date', 'heure', 'statut'], name='occupation_cellule_unique'),
+        ]
+        indexes = [
+            # Tableau de bord : intervalle de dates, agrégats lus dans l'index seul
+            models.Index(fields=['date', 'medecin', 'statut', 'jour_semaine', 'heure', 'nombre'],
+                         name='occupation_date_idx'),
+        ]
+
+# Compteurs par statut de l'historique (voir compteurs.py, maintenus par signals.py)
+
+class CompteurStatut(models.Model):
+    statut = models.CharField(max_length=20, primary_key=True, choices=RendezVous._meta.get_field('statut').choices)
+    nombre = models.IntegerField(default=0)
+
+
+# Index de recherche par nom (voir recherche.py, maintenu par signals.py)
+
+class TermePatient(models.Model):
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='termes_recherche')
+    terme = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [models.Index(fields=['terme', 'patient'], name='terme_patient_idx')]
+
+
+class TermeEmploye(models.Model):
+    employe = models.ForeignKey(Employe, on_delete=models.CASCADE, related_name='termes_recherche')
+    terme = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [models.Index(fields=['terme', 'employe'], name='terme_employe_idx')]
@@ -0,0 +1,223 @@
+"""
+Agrégats d'occupation des médecins pour le tableau de bord de la direction.
+
+OccupationMedecin compte les rendez-vous par (médecin, date, heure, statut).
+Les signaux de signals.py l'ajustent au moment où le rendez-vous est écrit,
+dans sa transaction s'il y en a une (création, changement de statut ou de
+créneau, annulation, suppression), par un INSERT ... ON CONFLICT DO UPDATE SET nombre = nombre + n :
+une seule requête par cellule, sans lecture préalable. Les opérations de
+masse appellent ajuster_occupation() (clôture, séries, import) avec leurs
+propres deltas.
+
+Le tableau de bord ne lit que cette table, par intervalle de dates dans
+l'index occupation_date_idx qui la couvre. Ses résultats sont gardés dans
+le cache partagé par mois (SoftwareProject.projections : clés versionnées,
+durée finie) : toute écriture invalide, après validation, les mois qu'elle
+touche, et seuls ceux-là sont relus. Un mois calculé pendant l'écriture est
+rangé sous l'ancienne version et ne masque pas l'invalidation. En cas de doute (écriture directe en base,
+données restaurées), la commande reconstruire_occupation recalcule la table
+entièrement depuis RendezVous.
+"""
+import datetime
+from collections import Counter
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from SoftwareProject import projections
+from .models import OccupationMedecin, RendezVous
+
+TAILLE_LOT = 2000
+PREFIXE = 'rdv:occupation:'
+CHAMPS = ('medecin', 'date', 'heure', 'jour_semaine', 'statut', 'nombre')
+_DATE = RendezVous._meta.get_field('date_rdv')
+_HEURE = RendezVous._meta.get_field('heure_rdv')
+
+
+def cellule(medecin_id, date_rdv, heure_rdv, statut):
+    """Clé (medecin_id, date, heure, statut) d'un rendez-vous."""
+    # Valeurs éventuellement encore en texte (create(date_rdv='2025-01-06', ...))
+    date_rdv = _DATE.to_python(date_rdv)
+    heure_rdv = _HEURE.to_python(heure_rdv)
+    return (medecin_id, date_rdv, heure_rdv.hour, statut)
+
+
+def _requete_upsert():
+    qn = connection.ops.quote_name
+    table = qn(OccupationMedecin._meta.db_table)
+    colonnes = [OccupationMedecin._meta.get_field(c).column for c in CHAMPS]
+    unique = [OccupationMedecin._meta.get_field(c).column for c in ('medecin', 'date', 'heure', 'statut')]
+    nombre = qn('nombre')
+    return 'INSERT INTO %s (%s) VALUES (%s) ON CONFLICT (%s) DO UPDATE SET %s = %s.%s + excluded.%s' % (
+        table,
+        ', '.join(qn(c) for c in colonnes),
+        ', '.join(['%s'] * len(colonnes)),
+        ', '.join(qn(c) for c in unique),
+        nombre, table, nombre, nombre,
+    )
+
+
+def _ecrire(cellules):
+    """INSERT ... ON CONFLICT des cellules [(medecin_id, date, heure, statut, delta)]."""
+    ops = connection.ops
+    valeurs = [
+        (medecin_id, ops.adapt_datefield_value(date), heure, date.weekday(), statut, delta)
+        for medecin_id, date, heure, statut, delta in cellules if delta
+    ]
+    if valeurs:
+        with connection.cursor() as cursor:
+            cursor.executemany(_requete_upsert(), valeurs)
+
+
+def ajuster_occupation(deltas):
+    """Ajoute chaque delta de {cellule: delta} à sa cellule (créée si besoin)."""
+    _ecrire((*cle, delta) for cle, delta in deltas.items())
+    invalider_mois(date for _, date, *_ in deltas)
+
+
+def _compter(qs):
+    """
+    Cellules (medecin_id, date, heure, statut, nombre) des rendez-vous de `qs`.
+    Les lignes sont lues dans l'ordre de l'index (médecin, date, heure) et
+    comptées en Python jour par jour : ni GROUP BY trié en table temporaire,
+    ni fonction d'extraction de l'heure appelée pour chaque ligne.
+    """
+    lignes = qs.order_by('medecin_id', 'date_rdv', 'heure_rdv').values_list(
+        'medecin_id', 'date_rdv', 'heure_rdv', 'statut')
+    jour, compteur = None, Counter()
+    for medecin_id, date, heure, statut in lignes.iterator(chunk_size=TAILLE_LOT):
+        if (medecin_id, date) != jour:
+            yield from ((*jour, h, s, n) for (h, s), n in compteur.items())
+            jour, compteur = (medecin_id, date), Counter()
+        compteur[heure.hour, statut] += 1
+    if jour:
+        yield from ((*jour, h, s, n) for (h, s), n in compteur.items())
+
+
+def recalculer_occupation(jours):
+    """Recalcule les cellules des médecins et dates de `jours` [(medecin_id, date)]."""
+    medecins = {m for m, _ in jours}
+    dates = {d for _, d in jours}
+    if not medecins:
+        return
+    with transaction.atomic():
+        OccupationMedecin.objects.filter(medecin_id__in=medecins, date__in=dates).delete()
+        _ecrire(_compter(RendezVous.objects.filter(medecin_id__in=medecins, date_rdv__in=dates)))
+        invalider_mois(dates)
+
+
+def reconstruire_occupation(taille_lot=TAILLE_LOT, progression=None):
+    """
+    Vide la table et la recalcule depuis RendezVous (un seul parcours de
+    l'index, lu par paquets) ; retourne le nombre de cellules.
+    `progression(total)` est appelé après chaque lot écrit.
+    """
+    if taille_lot < 1:
+        # islice(..., 0) ne rendrait rien : la table serait vidée sans être recalculée
+        raise ValueError("La taille de lot doit être au moins 1.")
+    total = 0
+    with transaction.atomic():
+        avant = annees_disponibles()
+        OccupationMedecin.objects.all().delete()
+        cellules = _compter(RendezVous.objects.all())
+        while lot := list(islice(cellules, taille_lot)):
+            _ecrire(lot)
+            total += len(lot)
+            if progression:
+                progression(total)
+        apres = annees_disponibles()
+        annees = [a for bornes in (avant, apres) if bornes for a in bornes]
+        if annees:
+            invalider_mois(datetime.date(annee, mois, 1)
+                           for annee in range(min(annees), max(annees) + 1) for mois in range(1, 13))
+    return total
+
+
+# Lectures du tableau de bord (résultats gardés en cache, mois par mois)
+
+def _cle_mois(annee, mois):
+    return f'{PREFIXE}{annee}-{mois:02d}'
+
+
+def _debut_mois(annee, mois):
+    return datetime.date(annee + (mois - 1) // 12, (mois - 1) % 12 + 1, 1)
+
+
+def annees_disponibles():
+    """(première, dernière) année ayant des rendez-vous, ou None."""
+    # Deux lectures aux extrémités de l'index (MIN et MAX ensemble parcourraient la table)
+    dates = OccupationMedecin.objects.values_list('date', flat=True)
+    debut = dates.order_by('date').first()
+    if debut is None:
+        return None
+    return debut.year, dates.order_by('-date').first().year
+
+
+def _calculer_mois(annee, premier, dernier):
+    """
+    {mois: {'charges': [(medecin_id, statut, n)], 'carte': [(jour, heure, n)]}}
+    des mois premier..dernier, en deux requêtes groupées par date (le mois
+    est déduit en Python : pas de fonction d'extraction appelée par ligne).
+    """
+    qs = OccupationMedecin.objects.filter(
+        date__gte=_debut_mois(annee, premier), date__lt=_debut_mois(annee, dernier + 1))
+    resultats = {mois: {'charges': Counter(), 'carte': Counter()} for mois in range(premier, dernier + 1)}
+    for date, medecin_id, statut, nombre in qs.values('date', 'medecin_id', 'statut').annotate(
+            n=Sum('nombre')).order_by().values_list('date', 'medecin_id', 'statut', 'n'):
+        resultats[date.month]['charges'][medecin_id, statut] += nombre
+    for date, heure, nombre in qs.exclude(statut='annulé').values('date', 'heure').annotate(
+            n=Sum('nombre')).order_by().values_list('date', 'heure', 'n'):
+        resultats[date.month]['carte'][date.weekday(), heure] += nombre
+    return {
+        mois: {cle: [(*k, n) for k, n in compteur.items() if n] for cle, compteur in donnees.items()}
+        for mois, donnees in resultats.items()
+    }
+
+
+def occupation_annee(annee):
+    """
+    {mois: {'charges', 'carte'}} des douze mois de l'année. Les mois absents
+    du cache (jamais lus, ou modifiés depuis) sont recalculés ensemble.
+    """
+    cles = {_cle_mois(annee, mois): mois for mois in range(1, 13)}
+
+    def calculer(manquantes):
+        manquants = sorted(cles[cle] for cle in manquantes)
+        calcules = _calculer_mois(annee, manquants[0], manquants[-1])
+        return {_cle_mois(annee, mois): v for mois, v in calcules.items()}
+
+    return {cles[cle]: valeur for cle, valeur in projections.lire_plusieurs(list(cles), calculer).items()}
+
+
+def charge_par_medecin(annee_mois):
+    """
+    {medecin_id: {'mois': [rendez-vous non annulés de janvier à décembre],
+    'total', 'annules', 'taux_annulation'}} depuis occupation_annee().
+    """
+    charges = {}
+    for mois, donnees in annee_mois.items():
+        for medecin_id, statut, nombre in donnees['charges']:
+            charge = charges.setdefault(medecin_id, {'mois': [0] * 12, 'total': 0, 'annules': 0})
+            charge['total'] += nombre
+            if statut == 'annulé':
+                charge['annules'] += nombre
+            else:
+                charge['mois'][mois - 1] += nombre
+    for charge in charges.values():
+        charge['taux_annulation'] = 100 * charge['annules'] / charge['total'] if charge['total'] else 0
+    return charges
+
+
+def carte_occupation(annee_mois):
+    """{(jour de la semaine, heure): rendez-vous non annulés} depuis occupation_annee()."""
+    carte = Counter()
+    for donnees in annee_mois.values():
+        for jour, heure, nombre in donnees['carte']:
+            carte[jour, heure] += nombre
+    return dict(carte)
+
+
+def invalider_mois(dates):
+    """Invalide les mois des dates données (après validation de la transaction)."""
+    projections.invalider_apres_validation({_cle_mois(date.year, date.month) for date in dates})
@@ -0,0 +1,232 @@
+"""
+Pagination par curseur (keyset) pour les historiques de rendez-vous.
+
+Au lieu de COUNT(*) + OFFSET, chaque page reprend après la clé
+(date_rdv, heure_rdv, id) de la dernière ligne affichée : la page N coûte
+autant que la page 1, quelle que soit la taille de l'historique, et les liens
+restent stables quand des RDV sont ajoutés entre deux clics.
+"""
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.paginator import InvalidPage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404
+
+SUIVANT = 's'
+PRECEDENT = 'p'
+DUREE_CACHE_TOTAL = 300  # secondes
+
+
+def encoder_curseur(sens, valeurs):
+    brut = json.dumps([sens, valeurs], cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(brut.encode()).decode().rstrip('=')
+
+
+def decoder_curseur(curseur):
+    """Retourne (sens, valeurs) ou (SUIVANT, None) si le curseur est absent ou invalide."""
+    if not curseur:
+        return SUIVANT, None
+    try:
+        brut = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4))
+        sens, valeurs = json.loads(brut)
+    except (ValueError, TypeError):
+        return SUIVANT, None
+    if sens not in (SUIVANT, PRECEDENT) or not (valeurs is None or isinstance(valeurs, list)):
+        return SUIVANT, None
+    return sens, valeurs
+
+
+class CurseurPage:
+    """Page de résultats ; mêmes attributs que django.core.paginator.Page pour les templates."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def curseur_suivant(self):
+        if self._has_next and self.object_list:
+            return self.paginator.curseur(SUIVANT, self.object_list[-1])
+        return None
+
+    @property
+    def curseur_precedent(self):
+        if self._has_previous and self.object_list:
+            return self.paginator.curseur(PRECEDENT, self.object_list[0])
+        return None
+
+    @property
+    def curseur_dernier(self):
+        return encoder_curseur(PRECEDENT, None)
+
+
+class CurseurPaginator:
+    """
+    Pagine `queryset` selon `ordering` (tous les champs dans le même sens, le
+    dernier devant être unique, typiquement '-id').
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-date_rdv', '-heure_rdv', '-id')):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.descendant = self.ordering[0].startswith('-')
+        self.champs = [o.lstrip('-') for o in self.ordering]
+
+    def _valeurs(self, obj):
+        if isinstance(obj, dict):  # lignes issues de .values()
+            return [obj[c] for c in self.champs]
+        return [getattr(obj, self.queryset.model._meta.get_field(c).attname) for c in self.champs]
+
+    def curseur(self, sens, obj):
+        return encoder_curseur(sens, self._valeurs(obj))
+
+    def _convertir(self, valeurs):
+        meta = self.queryset.model._meta
+        return [meta.get_field(c).to_python(v) for c, v in zip(self.champs, valeurs)]
+
+    def _apres(self, valeurs, vers_la_fin):
+        """Condition « strictement après `valeurs` » dans le sens demandé."""
+        strict = 'lt' if self.descendant == vers_la_fin else 'gt'
+        # Borne sur le premier champ : permet la lecture de l'index par intervalle
+        condition = Q(**{f'{self.champs[0]}__{strict}e': valeurs[0]})
+        ou = Q()
+        for i, champ in enumerate(self.champs):
+            egalites = {c: v for c, v in zip(self.champs[:i], valeurs[:i])}
+            ou |= Q(**egalites, **{f'{champ}__{strict}': valeurs[i]})
+        return condition & ou
+
+    def _requete(self, curseur):
+        """(queryset à lire, sens, valeurs du curseur) pour la page demandée."""
+        sens, valeurs = decoder_curseur(curseur)
+        if valeurs is not None:
+            try:
+                valeurs = self._convertir(valeurs)
+            except Exception:
+                sens, valeurs = SUIVANT, None
+            if valeurs is not None and len(valeurs) != len(self.champs):
+                sens, valeurs = SUIVANT, None
+
+        qs = self.queryset
+        if sens == SUIVANT:
+            if valeurs is not None:
+                qs = qs.filter(self._apres(valeurs, vers_la_fin=True))
+            return qs.order_by(*self.ordering)[:self.per_page + 1], sens, valeurs
+
+        # Page précédente (ou dernière page si aucune valeur) : on lit à l'envers
+        inverse = [o[1:] if o.startswith('-') else '-' + o for o in self.ordering]
+        if valeurs is not None:
+            qs = qs.filter(self._apres(valeurs, vers_la_fin=False))
+        return qs.order_by(*inverse)[:self.per_page + 1], sens, valeurs
+
+    def _page(self, lignes, sens, valeurs):
+        plus = len(lignes) > self.per_page
+        lignes = lignes[:self.per_page]
+        if sens == SUIVANT:
+            return CurseurPage(lignes, self, plus, valeurs is not None)
+        return CurseurPage(lignes[::-1], self, valeurs is not None, plus)
+
+    def page(self, curseur=None):
+        qs, sens, valeurs = self._requete(curseur)
+        return self._page(list(qs), sens, valeurs)
+
+    async def apage(self, curseur=None):
+        """Version asynchrone de page() (ORM asynchrone)."""
+        qs, sens, valeurs = self._requete(curseur)
+        return self._page([ligne async for ligne in qs], sens, valeurs)
+
+    @property
+    def count(self):
+        """
+        Total estimé : un COUNT(*) mis en cache quelques minutes par requête,
+        pour afficher un ordre de grandeur sans compter à chaque page.
+        """
+        sql, params = self.queryset.order_by().query.sql_with_params()
+        cle = 'pagination:total:' + hashlib.md5(f'{sql}{params}'.encode()).hexdigest()
+        total = cache.get(cle)
+        if total is None:
+            total = self.queryset.count()
+            cache.set(cle, total, DUREE_CACHE_TOTAL)
+        return total
+
+
+class PaginationCurseurMixin:
+    """À placer avant ListView pour remplacer Paginator par CurseurPaginator."""
+
+    curseur_kwarg = 'curseur'
+    ordre_curseur = ('-date_rdv', '-heure_rdv', '-id')
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CurseurPaginator(queryset, page_size, self.ordre_curseur)
+        page = paginator.page(self.request.GET.get(self.curseur_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    async def apaginate_queryset(self, queryset, page_size):
+        paginator = CurseurPaginator(queryset, page_size, self.ordre_curseur)
+        page = await paginator.apage(self.request.GET.get(self.curseur_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class ListeAsyncMixin:
+    """
+    À placer avant ListView (et avant PaginationCurseurMixin) pour servir la
+    liste depuis une vue async : la page est lue avec l'ORM asynchrone avant
+    le rendu, le gabarit étant rendu ensuite par le gestionnaire
+    (TemplateResponse) hors de la boucle d'événements.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        page_size = self.get_paginate_by(self.object_list)
+        self._pagination = await self.apaginate_queryset(self.object_list, page_size) if page_size else None
+        return self.render_to_response(self.get_context_data())
+
+    def paginate_queryset(self, queryset, page_size):
+        return self._pagination
+
+    async def apaginate_queryset(self, queryset, page_size):
+        # Pagination par curseur si un mixin suivant la fournit
+        paginer = getattr(super(), 'apaginate_queryset', None)
+        if paginer:
+            return await paginer(queryset, page_size)
+
+        # Sinon, mêmes règles que MultipleObjectMixin.paginate_queryset
+        paginator = self.get_paginator(queryset, page_size, allow_empty_first_page=self.get_allow_empty())
+        paginator.count = await queryset.acount()
+        numero = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        try:
+            numero = int(numero)
+        except ValueError:
+            if numero != 'last':
+                raise Http404("La page demandée n'existe pas.")
+            numero = paginator.num_pages
+        try:
+            page = paginator.page(numero)
+        except InvalidPage:
+            raise Http404("La page demandée n'existe pas.")
+        page.object_list = [obj async for obj in page.object_list]
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,106 @@
+"""
+Recherche par nom dans les listes de rendez-vous.
+
+Les noms et prénoms des patients et des employés sont découpés en termes
+normalisés (minuscules, sans accents) stockés dans TermePatient / TermeEmploye
+et tenus à jour par les signaux de signals.py. Chaque mot saisi doit être le
+début d'un terme de la même personne, dans n'importe quel ordre : la
+recherche devient une suite de lectures d'index par intervalle au lieu d'un
+OR de LIKE '%...%' sur les jointures.
+"""
+import re
+import unicodedata
+
+from django.db.models import Q
+
+from .models import TermePatient, TermeEmploye
+
+_SEPARATEURS = re.compile(r'[^0-9a-z]+')
+
+
+def normaliser(texte):
+    """'Hélène-Ève' -> 'helene eve' (minuscules, sans accents)."""
+    texte = unicodedata.normalize('NFKD', texte or '')
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return _SEPARATEURS.sub(' ', texte.lower()).strip()
+
+
+def termes(*textes):
+    """Ensemble des termes indexés pour une personne (nom, prénom...)."""
+    return {t for texte in textes for t in normaliser(texte).split()}
+
+
+def _reindexer(modele, cle, personnes):
+    ids = [p.pk for p in personnes]
+    modele.objects.filter(**{f'{cle}__in': ids}).delete()
+    modele.objects.bulk_create(
+        modele(**{cle: p.pk, 'terme': terme[:100]})
+        for p in personnes
+        for terme in termes(p.nom, p.prenom)
+    )
+
+
+def indexer_patients(patients):
+    """(Ré)indexe les noms d'une liste de patients (aussi après un bulk_create)."""
+    _reindexer(TermePatient, 'patient_id', patients)
+
+
+def indexer_employes(employes):
+    """(Ré)indexe les noms d'une liste d'employés."""
+    _reindexer(TermeEmploye, 'employe_id', employes)
+
+
+def _prefixe(champ, mot):
+    """Condition `champ` commence par `mot`, sous forme d'intervalle indexable."""
+    suivant = mot[:-1] + chr(ord(mot[-1]) + 1)
+    return Q(**{f'{champ}__gte': mot, f'{champ}__lt': suivant})
+
+
+def _ids_correspondants(modele, cle, mots):
+    """Sous-requête des `cle` dont les termes commencent par chacun des `mots`."""
+    ids = None
+    for mot in mots:
+        qs = modele.objects.filter(_prefixe('terme', mot))
+        if ids is not None:
+            qs = qs.filter(**{f'{cle}__in': ids})
+        ids = qs.values(cle)
+    return ids
+
+
+def filtrer_par_nom(qs, search, patient=True, medecin=True):
+    """
+    Restreint un queryset de RendezVous aux patients et/ou médecins dont le
+    nom et le prénom correspondent à `search`.
+    """
+    mots = normaliser(search).split()
+    if not mots:
+        return qs
+
+    condition = Q()
+    if patient:
+        condition |= Q(patient_id__in=_ids_correspondants(TermePatient, 'patient_id', mots))
+    if medecin:
+        condition |= Q(medecin_id__in=_ids_correspondants(TermeEmploye, 'employe_id', mots))
+    return qs.filter(condition)
+
+
+def filtrer_patients(qs, search):
+    """
+    Restreint un queryset de Patient à ceux dont le nom correspond à `search`,
+    ou dont le numéro de téléphone commence par `search` s'il n'a que des chiffres.
+    """
+    chiffres = ''.join((search or '').split())
+    if chiffres.isdigit():
+        return qs.filter(_prefixe('num_tel', chiffres))
+    mots = normaliser(search).split()
+    if not mots:
+        return qs
+    return qs.filter(pk__in=_ids_correspondants(TermePatient, 'patient_id', mots))
+
+
+def filtrer_employes(qs, search):
+    """Restreint un queryset d'Employe à ceux dont le nom correspond à `search`."""
+    mots = normaliser(search).split()
+    if not mots:
+        return qs
+    return qs.filter(pk__in=_ids_correspondants(TermeEmploye, 'employe_id', mots))
@@ -0,0 +1,120 @@
+"""
+Séries de rendez-vous récurrents (patients chroniques).
+
+Une série part d'un créneau (date, heure) et se répète toutes les semaines
+ou toutes les deux semaines, pour un nombre d'occurrences ou jusqu'à une date
+de fin. Les occurrences sont vérifiées avec les mêmes validateurs que le
+formulaire, les conflits sont recherchés en une seule requête pour toute la
+série, puis les rendez-vous sont créés en un seul bulk_create dans une
+transaction.
+"""
+import datetime
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .agenda import invalider_agenda
+from .compteurs import ajuster_compteurs
+from .models import RendezVous, validate_date_future, validate_heure
+from .occupation import ajuster_occupation, cellule
+
+# fréquence -> intervalle en jours
+FREQUENCES = {
+    'hebdomadaire': 7,
+    'bimensuelle': 14,
+}
+MAX_OCCURRENCES = 104  # deux ans de rendez-vous hebdomadaires
+
+
+def occurrences(date_debut, frequence, nombre=None, date_fin=None):
+    """Dates de la série : `nombre` occurrences ou jusqu'à `date_fin` incluse."""
+    if nombre is None and date_fin is None:
+        raise ValueError("Indiquer un nombre d'occurrences ou une date de fin.")
+    pas = datetime.timedelta(days=FREQUENCES[frequence])
+    dates = []
+    jour = date_debut
+    while len(dates) < MAX_OCCURRENCES:
+        if nombre is not None and len(dates) >= nombre:
+            break
+        if date_fin is not None and jour > date_fin:
+            break
+        dates.append(jour)
+        jour += pas
+    return dates
+
+
+def _motif(date_rdv, heure_rdv):
+    """Message du premier validateur qui refuse l'occurrence, sinon None."""
+    for validateur, valeur in ((validate_date_future, date_rdv), (validate_heure, heure_rdv)):
+        try:
+            validateur(valeur)
+        except ValidationError as e:
+            return ' '.join(e.messages)
+    return None
+
+
+def planifier_serie(patient, medecin, heure_rdv, dates):
+    """
+    Sépare les dates en (acceptées, rejetées) sans rien écrire.
+    `rejetées` est une liste de (date, motif). Une seule requête pour les conflits.
+    """
+    valides, rejets = [], []
+    for date_rdv in dates:
+        motif = _motif(date_rdv, heure_rdv)
+        if motif:
+            rejets.append((date_rdv, motif))
+        else:
+            valides.append(date_rdv)
+    if not valides:
+        return valides, rejets
+
+    conflits = {}
+    for date_rdv, medecin_id in (
+        RendezVous.objects.exclude(statut='annulé')
+        .filter(Q(medecin=medecin) | Q(patient=patient), date_rdv__in=valides, heure_rdv=heure_rdv)
+        .values_list('date_rdv', 'medecin_id')
+    ):
+        # Le conflit avec le médecin est prioritaire pour le message
+        if medecin_id == medecin.pk or date_rdv not in conflits:
+            conflits[date_rdv] = (
+                "Le médecin a déjà un rendez-vous à cette date et heure."
+                if medecin_id == medecin.pk
+                else "Le patient a déjà un rendez-vous à cette date et heure."
+            )
+
+    acceptees = []
+    for date_rdv in valides:
+        if date_rdv in conflits:
+            rejets.append((date_rdv, conflits[date_rdv]))
+        else:
+            acceptees.append(date_rdv)
+    rejets.sort()
+    return acceptees, rejets
+
+
+def creer_serie(patient, medecin, heure_rdv, dates, ignorer_rejets=False):
+    """
+    Crée la série de façon atomique et retourne (rendez-vous créés, rejets).
+    Si une occurrence est refusée et que `ignorer_rejets` est faux, rien n'est
+    créé et une ValidationError liste les dates refusées.
+    """
+    try:
+        with transaction.atomic():
+            acceptees, rejets = planifier_serie(patient, medecin, heure_rdv, dates)
+            if rejets and not ignorer_rejets:
+                raise ValidationError([f"{d:%d/%m/%Y} : {motif}" for d, motif in rejets])
+            if not acceptees:
+                raise ValidationError("Aucune occurrence de la série ne peut être créée.")
+            crees = RendezVous.objects.bulk_create([
+                RendezVous(patient=patient, medecin=medecin, date_rdv=d, heure_rdv=heure_rdv, statut='prévu')
+                for d in acceptees
+            ])
+            # bulk_create ne déclenche pas post_save : compteurs, agenda et occupation mis à jour ici
+            ajuster_compteurs({'prévu': len(crees)})
+            invalider_agenda((medecin.pk, d) for d in acceptees)
+            ajuster_occupation({cellule(medecin.pk, d, heure_rdv, 'prévu'): 1 for d in acceptees})
+    except IntegrityError:
+        # Un créneau a été pris entre la vérification et l'insertion
+        raise ValidationError("❌ Un créneau de la série vient d'être réservé. Veuillez réessayer.")
+    return crees, rejets
@@ -0,0 +1,132 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from PatientApp.models import Patient
+from EmployeApp.models import Employe
+from .models import RendezVous
+from .recherche import indexer_patients, indexer_employes
+from .compteurs import ajuster_compteurs, recalculer_compteurs
+from .agenda import invalider_agenda
+from .occupation import ajuster_occupation, cellule
+
+CHAMPS_NOM = {'nom', 'prenom'}
+
+
+def _champs_nom(update_fields):
+    return update_fields is None or bool(CHAMPS_NOM & set(update_fields))
+
+
+def _nom_modifie(instance, created, update_fields):
+    """Vrai si le nom ou le prénom enregistré diffère de celui lu en base."""
+    if not _champs_nom(update_fields):
+        return False
+    initial = getattr(instance, '_nom_initial', None)
+    instance._nom_initial = (instance.nom, instance.prenom)
+    return created or initial != instance._nom_initial
+
+
+@receiver(pre_save, sender=Patient)
+@receiver(pre_save, sender=Employe)
+def lire_nom_initial(sender, instance, update_fields=None, **kwargs):
+    initial = getattr(instance, '_nom_initial', None)
+    if instance.pk is not None and (initial is None or None in initial) and _champs_nom(update_fields):
+        # Instance construite hors de la base ou lue avec only() : nom relu
+        instance._nom_initial = sender.objects.filter(pk=instance.pk).values_list('nom', 'prenom').first()
+
+
+# La suppression est gérée par le CASCADE des clés étrangères des termes
+@receiver(post_save, sender=Patient)
+def indexer_patient(sender, instance, created=False, update_fields=None, **kwargs):
+    if _nom_modifie(instance, created, update_fields):
+        indexer_patients([instance])
+        if not created:
+            # Le nom du patient figure dans l'agenda des médecins
+            invalider_agenda(instance.rendezvous.values_list('medecin_id', 'date_rdv').distinct())
+            # ... et dans le SUMMARY du flux iCalendar : ses RDV changent de
+            # modifie_le, donc l'ETag / Last-Modified des flux qui les contiennent
+            instance.rendezvous.update(modifie_le=timezone.now())
+
+
+@receiver(post_save, sender=Employe)
+def indexer_employe(sender, instance, created=False, update_fields=None, **kwargs):
+    if _nom_modifie(instance, created, update_fields):
+        indexer_employes([instance])
+        if not created:
+            # Nom du médecin dans X-WR-CALNAME de son flux iCalendar
+            instance.rendezvous_medecin.update(modifie_le=timezone.now())
+
+
+# Compteurs par statut de l'historique : ajustés juste après l'écriture du
+# rendez-vous, dans la transaction de l'appelant s'il y en a une (save() seul
+# n'en ouvre pas : enregistrer_rdv() l'entoure de transaction.atomic())
+@receiver(post_save, sender=RendezVous)
+def compter_rdv(sender, instance, created, **kwargs):
+    ancien = None if created else getattr(instance, '_statut_initial', None)
+    nouveau = instance.statut
+    instance._statut_initial = nouveau
+    if created:
+        ajuster_compteurs({nouveau: 1})
+    elif ancien is None:
+        # Statut précédent inconnu (ligne disparue entre-temps) : compteurs refaits
+        recalculer_compteurs()
+    elif ancien != nouveau:
+        ajuster_compteurs({ancien: -1, nouveau: 1})
+
+
+@receiver(post_delete, sender=RendezVous)
+def decompter_rdv(sender, instance, **kwargs):
+    statut = getattr(instance, '_statut_initial', None) or instance.statut
+    ajuster_compteurs({statut: -1})
+
+
+# Agenda hebdomadaire en cache : semaine actuelle et, si le RDV a été déplacé, l'ancienne
+@receiver(post_save, sender=RendezVous)
+@receiver(post_delete, sender=RendezVous)
+def invalider_agenda_rdv(sender, instance, **kwargs):
+    creneaux = [(instance.medecin_id, instance.date_rdv)]
+    if getattr(instance, '_agenda_initial', None):
+        creneaux.append(instance._agenda_initial)
+    instance._agenda_initial = (instance.medecin_id, instance.date_rdv)
+    invalider_agenda(creneaux)
+
+
+# Agrégats d'occupation : écrits avec le rendez-vous, pas après la transaction
+CHAMPS_OCCUPATION = ('medecin_id', 'date_rdv', 'heure_rdv', 'statut')
+
+
+def _valeurs_occupation(instance):
+    return tuple(getattr(instance, champ) for champ in CHAMPS_OCCUPATION)
+
+
+@receiver(pre_save, sender=RendezVous)
+def lire_occupation_initiale(sender, instance, **kwargs):
+    initial = getattr(instance, '_occupation_initial', None)
+    if instance.pk is not None and (initial is None or None in initial):
+        # Instance construite hors de la base ou lue avec only() : cellule relue
+        instance._occupation_initial = RendezVous.objects.filter(pk=instance.pk).values_list(
+            *CHAMPS_OCCUPATION).first()
+        if instance._occupation_initial:
+            # Statut relu avec : compteur à décrémenter s'il change
+            instance._statut_initial = instance._occupation_initial[-1]
+
+
+@receiver(post_save, sender=RendezVous)
+def occuper_creneau(sender, instance, created, **kwargs):
+    deltas = Counter({cellule(*_valeurs_occupation(instance)): 1})
+    initial = None if created else getattr(instance, '_occupation_initial', None)
+    if initial:
+        deltas[cellule(*initial)] -= 1  # delta nul si la cellule n'a pas changé
+    instance._occupation_initial = _valeurs_occupation(instance)
+    ajuster_occupation(deltas)
+
+
+@receiver(post_delete, sender=RendezVous)
+def liberer_creneau(sender, instance, **kwargs):
+    initial = getattr(instance, '_occupation_initial', None)
+    if not initial or None in initial:
+        initial = _valeurs_occupation(instance)
+    ajuster_occupation({cellule(*initial): -1})
@@ -1,3 +1,1009 @@
-from django.test import TestCase
+import datetime
+import io
+import threading
+import time
+from collections import Counter
+from unittest import mock
+from asgiref.sync import sync_to_async
 
-# Create your tests here.
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.core.exceptions import ValidationError
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from EmployeApp.models import Employe
+from PatientApp.models import Patient
+from SoftwareProject.outils import RapportImport
+from .forms import RendezVousForm
+from .models import OccupationMedecin, RendezVous
+from .autocompletion import NB_RESULTATS, chercher_patients
+from .calendrier import _plier
+from .cloture import cloturer_rdv_passes
+from .compteurs import compter_statuts, compteurs_statuts
+from .importation import importer_rdv
+from .occupation import _calculer_mois, carte_occupation, charge_par_medecin, occupation_annee, reconstruire_occupation
+from .pagination import CurseurPaginator
+from .recherche import filtrer_par_nom
+from .series import creer_serie, occurrences
+from .views import enregistrer_rdv
+
+
+def prochain_jour_ouvre(jours=7):
+    """Date future (lundi-vendredi) utilisable pour un rendez-vous."""
+    jour = timezone.localdate() + datetime.timedelta(days=jours)
+    while jour.weekday() in [5, 6]:
+        jour += datetime.timedelta(days=1)
+    return jour
+
+
+def creer_patient(nom='Ben Salah', prenom='Amine'):
+    return Patient.objects.create(
+        nom=nom, prenom=prenom, dateNaissance=datetime.date(1990, 1, 1),
+        sexe='Homme', num_tel='22123456', dossier='dossiers_patients/test.pdf',
+    )
+
+
+def creer_medecin(nom='Trabelsi', prenom='Sami', login=None, service='Cardiologie'):
+    login = login or f'{nom}.{prenom}'.lower()
+    return Employe.objects.create(
+        nom=nom, prenom=prenom, role='medecin', login=login,
+        mot_de_passe='secret', email=f'{login}@clinique.tn', telephone='71000000',
+        date_embauche=datetime.date(2020, 1, 1), service=service,
+    )
+
+
+class ConflitRendezVousTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = creer_patient()
+        cls.autre_patient = creer_patient('Jaziri', 'Lina')
+        cls.medecin = creer_medecin()
+        cls.date = prochain_jour_ouvre()
+        cls.heure = datetime.time(10, 0)
+
+    def form_data(self, patient=None, medecin=None):
+        return {
+            'patient': (patient or self.patient).pk,
+            'medecin': (medecin or self.medecin).pk,
+            'date_rdv': self.date.isoformat(),
+            'heure_rdv': '10:00',
+            'statut': 'prévu',
+        }
+
+    def test_conflit_medecin_une_seule_requete(self):
+        RendezVous.objects.create(patient=self.autre_patient, medecin=self.medecin,
+                                  date_rdv=self.date, heure_rdv=self.heure)
+        form = RendezVousForm(data=self.form_data())
+        self.assertTrue(form.is_valid(), form.errors)
+        with CaptureQueriesContext(connection) as requetes:
+            with self.assertRaises(ValidationError) as ctx:
+                enregistrer_rdv(form)
+        selects = [q for q in requetes.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+        self.assertEqual(len(ctx.exception.messages), 1)
+        self.assertIn('médecin', ctx.exception.messages[0])
+
+    def test_vue_creation_affiche_les_conflits(self):
+        RendezVous.objects.create(patient=self.patient, medecin=self.medecin,
+                                  date_rdv=self.date, heure_rdv=self.heure)
+        response = self.client.post(reverse('ajouter_rdv'), self.form_data())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['form'].non_field_errors()), 3)
+        self.assertEqual(RendezVous.objects.count(), 1)
+
+    def test_contrainte_base_de_donnees(self):
+        RendezVous.objects.create(patient=self.patient, medecin=self.medecin,
+                                  date_rdv=self.date, heure_rdv=self.heure)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RendezVous.objects.create(patient=self.autre_patient, medecin=self.medecin,
+                                      date_rdv=self.date, heure_rdv=self.heure)
+
+    def test_creneau_annule_reutilisable(self):
+        RendezVous.objects.create(patient=self.patient, medecin=self.medecin,
+                                  date_rdv=self.date, heure_rdv=self.heure, statut='annulé')
+        response = self.client.post(reverse('ajouter_rdv'), self.form_data())
+        self.assertRedirects(response, reverse('liste_rdv'), fetch_redirect_response=False)
+        self.assertEqual(RendezVous.objects.exclude(statut='annulé').count(), 1)
+
+
+class ReservationConcurrenteTests(TransactionTestCase):
+    """Plusieurs réceptionnistes réservent le même créneau en même temps."""
+
+    NB_THREADS = 12
+
+    def test_aucune_double_reservation(self):
+        medecin = creer_medecin()
+        patients = [creer_patient(f'Patient{i}', 'Test') for i in range(self.NB_THREADS)]
+        date_rdv = prochain_jour_ouvre()
+        barriere = threading.Barrier(self.NB_THREADS)
+        resultats = []
+
+        def reserver(patient):
+            try:
+                form = RendezVousForm(data={
+                    'patient': patient.pk, 'medecin': medecin.pk,
+                    'date_rdv': date_rdv.isoformat(), 'heure_rdv': '09:30',
+                    'statut': 'prévu',
+                })
+                valide = form.is_valid()
+                barriere.wait()
+                if valide:
+                    enregistrer_rdv(form)
+                    resultats.append('ok')
+            except (ValidationError, OperationalError):
+                resultats.append('refusé')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reserver, args=(p,)) for p in patients]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(resultats), self.NB_THREADS)
+        actifs = RendezVous.objects.filter(
+            medecin=medecin, date_rdv=date_rdv, heure_rdv=datetime.time(9, 30),
+        ).exclude(statut='annulé').count()
+        self.assertEqual(actifs, resultats.count('ok'))
+        self.assertLessEqual(actifs, 1)
+
+
+class AnnulationConcurrenteTests(TransactionTestCase):
+    """Plusieurs employés annulent le même rendez-vous en même temps."""
+
+    NB_THREADS = 8
+
+    def test_compteurs_ajustes_une_seule_fois(self):
+        rdv = RendezVous.objects.create(patient=creer_patient(), medecin=creer_medecin(),
+                                        date_rdv=prochain_jour_ouvre(), heure_rdv=datetime.time(9, 0))
+        barriere = threading.Barrier(self.NB_THREADS)
+
+        def annuler():
+            try:
+                client = self.client_class()
+                barriere.wait()
+                client.get(reverse('annuler_rdv', args=[rdv.pk]))
+            except OperationalError:
+                pass
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=annuler) for _ in range(self.NB_THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(RendezVous.objects.get().statut, 'annulé')
+        self.assertEqual(compteurs_statuts(), {'prévu': 0, 'annulé': 1, 'terminé': 0})
+        self.assertEqual(set(OccupationMedecin.objects.exclude(nombre=0).values_list('statut', 'nombre')),
+                         {('annulé', 1)})
+
+
+class CreneauxLibresTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = creer_patient()
+        cls.medecins = [creer_medecin(f'Medecin{i}', 'Test') for i in range(50)]
+        cls.lundi = prochain_jour_ouvre()
+        while cls.lundi.weekday() != 0:
+            cls.lundi += datetime.timedelta(days=1)
+
+    def test_creneaux_occupes_et_annules(self):
+        medecin = self.medecins[0]
+        RendezVous.objects.create(patient=self.patient, medecin=medecin,
+                                  date_rdv=self.lundi, heure_rdv=datetime.time(8, 0))
+        RendezVous.objects.create(patient=self.patient, medecin=medecin,
+                                  date_rdv=self.lundi, heure_rdv=datetime.time(9, 0), statut='annulé')
+        response = self.client.get(reverse('api_creneaux_libres'), {
+            'medecin': medecin.pk, 'debut': self.lundi.isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        heures = response.json()['medecins'][0]['creneaux'][self.lundi.isoformat()]
+        self.assertNotIn('08:00', heures)
+        self.assertIn('09:00', heures)
+        self.assertEqual(heures[-1], '18:00')
+
+    def test_weekends_exclus(self):
+        dimanche = self.lundi + datetime.timedelta(days=6)
+        response = self.client.get(reverse('api_creneaux_libres'), {
+            'medecin': self.medecins[0].pk, 'debut': self.lundi.isoformat(), 'fin': dimanche.isoformat(),
+        })
+        self.assertEqual(len(response.json()['medecins'][0]['creneaux']), 5)
+
+    def test_mois_cinquante_medecins_en_deux_requetes(self):
+        fin = self.lundi + datetime.timedelta(days=30)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('api_creneaux_libres'), {
+                'medecin': [m.pk for m in self.medecins],
+                'debut': self.lundi.isoformat(), 'fin': fin.isoformat(),
+            })
+        self.assertEqual(len(response.json()['medecins']), 50)
+
+    def test_parametres_invalides(self):
+        response = self.client.get(reverse('api_creneaux_libres'), {'medecin': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PlanRequetesTests(TestCase):
+    """
+    EXPLAIN QUERY PLAN sur les requêtes réellement exécutées par les vues de
+    liste : aucune ne doit retomber sur un parcours complet de la table des RDV
+    ni sur un tri temporaire (USE TEMP B-TREE).
+    """
+
+    TABLE = RendezVous._meta.db_table
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.medecin = creer_medecin()
+        patient = creer_patient()
+        jour = prochain_jour_ouvre()
+        for i, statut in enumerate(['prévu', 'terminé', 'annulé'] * 12):
+            RendezVous.objects.create(patient=patient, medecin=cls.medecin, date_rdv=jour,
+                                      heure_rdv=datetime.time(8 + i % 10, 0), statut=statut)
+            jour += datetime.timedelta(days=1)
+
+    def plans(self, url, params=None):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        plans = {}
+        with connection.cursor() as cursor:
+            for requete in requetes.captured_queries:
+                sql = requete['sql']
+                if not sql.startswith('SELECT') or self.TABLE not in sql:
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plans[sql] = [ligne[-1] for ligne in cursor.fetchall()]
+        self.assertTrue(plans)
+        return plans
+
+    def assertPlansIndexes(self, url, params=None):
+        for sql, details in self.plans(url, params).items():
+            for detail in details:
+                self.assertNotIn('TEMP B-TREE', detail, f'{sql}\n{details}')
+                if self.TABLE in detail:
+                    self.assertIn('INDEX', detail, f'{sql}\n{details}')
+
+    def test_liste_rdv(self):
+        self.assertPlansIndexes(reverse('liste_rdv'))
+        self.assertPlansIndexes(reverse('liste_rdv'), {'page': 2})
+
+    def test_historique_rdv(self):
+        self.assertPlansIndexes(reverse('historique_rdv'))
+        self.assertPlansIndexes(reverse('historique_rdv'), {'statut': 'terminé'})
+        suivant = self.client.get(reverse('historique_rdv')).context['page_obj'].curseur_suivant
+        self.assertPlansIndexes(reverse('historique_rdv'), {'curseur': suivant})
+        self.assertPlansIndexes(reverse('historique_rdv'), {'statut': 'annulé', 'curseur': suivant})
+
+    def test_historique_medecin(self):
+        url = reverse('historique_medecin', args=[self.medecin.pk])
+        self.assertPlansIndexes(url)
+        self.assertPlansIndexes(url, {'statut': 'terminé'})
+        suivant = self.client.get(url).context['page_obj'].curseur_suivant
+        self.assertPlansIndexes(url, {'curseur': suivant})
+
+    def test_api_rendezvous(self):
+        session = self.client.session
+        session['employe'] = {'id': self.medecin.pk, 'nom': 'Trabelsi', 'prenom': 'Sami',
+                              'role': 'medecin', 'service': 'Cardiologie', 'connecte_le': time.time()}
+        session.save()
+        url = reverse('api_rendezvous')
+        self.assertPlansIndexes(url, {'limite': 5})
+        self.assertPlansIndexes(url, {'limite': 5, 'medecin': self.medecin.pk})
+        suivant = self.client.get(url, {'limite': 5}).json()['suivant']
+        self.assertPlansIndexes(suivant)
+
+
+class RechercheNomTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.helene = creer_patient('Ben Salah', 'Hélène')
+        cls.eve = creer_patient('Chérif', 'Ève')
+        cls.medecin = creer_medecin('Ménard', 'Léo')
+        jour = prochain_jour_ouvre()
+        for i, patient in enumerate([cls.helene, cls.eve]):
+            RendezVous.objects.create(patient=patient, medecin=cls.medecin, date_rdv=jour,
+                                      heure_rdv=datetime.time(9 + i, 0))
+
+    def patients_trouves(self, search, url='liste_rdv', args=None):
+        response = self.client.get(reverse(url, args=args), {'search': search})
+        return {rdv.patient for rdv in response.context['rdvs' if url == 'liste_rdv' else 'rendezvous']}
+
+    def test_accents_et_ordre_libre(self):
+        self.assertEqual(self.patients_trouves('helene'), {self.helene})
+        self.assertEqual(self.patients_trouves('salah HÉL'), {self.helene})
+        self.assertEqual(self.patients_trouves('Ève Cherif'), {self.eve})
+        self.assertEqual(self.patients_trouves('eve salah'), set())
+
+    def test_recherche_medecin(self):
+        self.assertEqual(self.patients_trouves('leo menard'), {self.helene, self.eve})
+        args = [self.medecin.pk]
+        RendezVous.objects.update(statut='terminé')
+        self.assertEqual(self.patients_trouves('menard', 'historique_medecin', args), set())
+        self.assertEqual(self.patients_trouves('ben', 'historique_medecin', args), {self.helene})
+
+    def test_index_maintenu_par_les_signaux(self):
+        self.helene.nom = 'Gharbi'
+        self.helene.save()
+        self.assertEqual(self.patients_trouves('gharbi'), {self.helene})
+        self.assertEqual(self.patients_trouves('salah'), set())
+
+    def test_plan_recherche_indexe(self):
+        sql, params = filtrer_par_nom(RendezVous.objects.all(), 'ben hel').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            details = [ligne[-1] for ligne in cursor.fetchall()]
+        self.assertTrue(any('INDEX terme_patient_idx' in d for d in details), details)
+        self.assertTrue(any('INDEX terme_employe_idx' in d for d in details), details)
+        self.assertFalse(any(d.startswith('SCAN') for d in details), details)
+
+
+class PaginationCurseurTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        medecin = creer_medecin()
+        patient = creer_patient()
+        jour = prochain_jour_ouvre()
+        # Plusieurs RDV (annulés) à la même date/heure pour vérifier le départage par id
+        for i in range(13):
+            RendezVous.objects.create(patient=patient, medecin=medecin, date_rdv=jour + datetime.timedelta(days=i // 3),
+                                      heure_rdv=datetime.time(9, 0), statut='annulé')
+        cls.attendu = list(RendezVous.objects.order_by('-date_rdv', '-heure_rdv', '-id').values_list('id', flat=True))
+
+    def test_parcours_avant_et_arriere(self):
+        paginator = CurseurPaginator(RendezVous.objects.all(), 5)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].curseur_suivant))
+        self.assertEqual([r.id for p in pages for r in p], self.attendu)
+        self.assertEqual([len(p) for p in pages], [5, 5, 3])
+        self.assertFalse(pages[0].has_previous())
+
+        retour = paginator.page(pages[2].curseur_precedent)
+        self.assertEqual([r.id for r in retour], [r.id for r in pages[1]])
+        self.assertTrue(retour.has_next())
+
+        dernier = paginator.page(pages[0].curseur_dernier)
+        self.assertEqual([r.id for r in dernier], self.attendu[-5:])
+        self.assertFalse(dernier.has_next())
+
+    def test_curseur_invalide_revient_en_premiere_page(self):
+        page = CurseurPaginator(RendezVous.objects.all(), 5).page('pas-un-curseur')
+        self.assertEqual([r.id for r in page], self.attendu[:5])
+
+    def test_page_profonde_sans_offset_ni_count(self):
+        response = self.client.get(reverse('historique_rdv'))
+        suivant = response.context['page_obj'].curseur_suivant
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('historique_rdv'), {'curseur': suivant})
+        self.assertEqual([r.id for r in response.context['rdvs']], self.attendu[5:10])
+        pages = [q['sql'] for q in requetes.captured_queries if 'LIMIT' in q['sql']]
+        self.assertTrue(pages)
+        self.assertFalse(any('OFFSET' in sql for sql in pages))
+
+
+class CompteursStatutTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.medecin = creer_medecin()
+        cls.patient = creer_patient()
+        jour = prochain_jour_ouvre()
+        for i, statut in enumerate(['prévu', 'prévu', 'terminé', 'annulé']):
+            RendezVous.objects.create(patient=cls.patient, medecin=cls.medecin, date_rdv=jour,
+                                      heure_rdv=datetime.time(8 + i, 0), statut=statut)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_une_seule_requete_sans_parcours(self):
+        with CaptureQueriesContext(connection) as requetes:
+            compteurs = compteurs_statuts()
+        self.assertEqual(compteurs, {'prévu': 2, 'annulé': 1, 'terminé': 1})
+        self.assertEqual(len(requetes), 1)
+        self.assertNotIn(RendezVous._meta.db_table, requetes[0]['sql'])
+
+    def test_annulation(self):
+        rdv = RendezVous.objects.filter(statut='prévu').first()
+        self.client.get(reverse('annuler_rdv', args=[rdv.pk]))
+        self.assertEqual(compteurs_statuts(), {'prévu': 1, 'annulé': 2, 'terminé': 1})
+        # Instance construite hors de la base : statut précédent relu avant l'enregistrement
+        RendezVous(pk=rdv.pk, patient=self.patient, medecin=self.medecin, date_rdv=rdv.date_rdv,
+                   heure_rdv=rdv.heure_rdv, statut='terminé').save()
+        self.assertEqual(compteurs_statuts(), {'prévu': 1, 'annulé': 1, 'terminé': 2})
+
+    def test_creation_et_suppression(self):
+        rdv = RendezVous.objects.create(patient=creer_patient('Autre', 'Patient'), medecin=self.medecin,
+                                        date_rdv=prochain_jour_ouvre(), heure_rdv=datetime.time(15, 0))
+        self.assertEqual(compteurs_statuts()['prévu'], 3)
+        rdv.delete()
+        self.assertEqual(compteurs_statuts(), compter_statuts())
+
+    def test_transaction_annulee(self):
+        # Écrits dans la transaction du rendez-vous : rien ne reste après un rollback
+        with self.assertRaises(ValueError), transaction.atomic():
+            RendezVous.objects.filter(statut='prévu').first().delete()
+            raise ValueError
+        self.assertEqual(compteurs_statuts(), compter_statuts())
+
+    def test_entete_historique(self):
+        response = self.client.get(reverse('historique_rdv'))
+        self.assertEqual(response.context['total_count'], 2)
+        self.assertEqual(response.context['terminated_count'], 1)
+        self.assertEqual(response.context['cancelled_count'], 1)
+
+
+class ImportCsvTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patients = [creer_patient(f'Import{i}', 'Test') for i in range(3)]
+        cls.medecin = creer_medecin(login='dr.import')
+        cls.jour = prochain_jour_ouvre()
+        RendezVous.objects.create(patient=cls.patients[2], medecin=cls.medecin,
+                                  date_rdv=cls.jour, heure_rdv=datetime.time(11, 0))
+
+    def csv(self, *lignes):
+        return io.StringIO('\n'.join(['patient,medecin,date_rdv,heure_rdv,statut', *lignes]) + '\n')
+
+    def test_import_et_rapport_d_erreurs(self):
+        p0, p1, p2 = (p.pk for p in self.patients)
+        jour = self.jour.isoformat()
+        rapport = importer_rdv(self.csv(
+            f'{p0},dr.import,{jour},09:00,',
+            f'{p1},{self.medecin.pk},{jour},09:00,',       # conflit médecin dans le fichier
+            f'{p1},dr.import,{jour},11:00,',                # conflit médecin en base
+            f'{p1},dr.import,{jour},10:00,annulé',          # annulé : pas de conflit
+            f'{p1},dr.import,{jour},10:00,',
+            f'999,dr.import,{jour},12:00,',                 # patient inconnu
+            f'{p2},inconnu,{jour},12:00,',                  # médecin inconnu
+            f'{p2},dr.import,{jour},19:00,',                # hors horaires
+            f'{p2},dr.import,pas-une-date,12:00,',
+        ), taille_lot=4)
+        self.assertEqual(rapport.lignes, 9)
+        self.assertEqual(rapport.crees, 3)
+        self.assertEqual([ligne for ligne, _ in rapport.erreurs], [3, 4, 7, 8, 9, 10])
+        self.assertEqual(RendezVous.objects.count(), 4)
+        self.assertEqual(compteurs_statuts(), compter_statuts())
+
+    def test_rejets_ecrits_au_fil_de_l_eau(self):
+        p0 = self.patients[0].pk
+        rejets = io.StringIO()
+        rapport = importer_rdv(self.csv(*(f'{p0},inconnu,{self.jour},09:00,' for _ in range(5))),
+                               taille_lot=2, rejets=rejets)
+        self.assertEqual(rapport.rejetees, 5)
+        lignes = rejets.getvalue().splitlines()
+        self.assertEqual(lignes[0], 'ligne,erreur')
+        self.assertEqual([l.split(',')[0] for l in lignes[1:]], ['2', '3', '4', '5', '6'])
+        # En mémoire : seulement les premières
+        rapport = RapportImport(gardees=2)
+        for n in range(1000):
+            rapport.erreur(n, 'Format invalide.')
+        self.assertEqual((rapport.rejetees, rapport.erreurs), (1000, [(0, 'Format invalide.'), (1, 'Format invalide.')]))
+
+    def test_colonnes_manquantes(self):
+        rapport = importer_rdv(io.StringIO('patient,date_rdv\n1,2030-01-01\n'))
+        self.assertEqual(rapport.crees, 0)
+        self.assertIn('medecin', rapport.erreurs[0][1])
+
+    def test_vue_upload(self):
+        contenu = f'patient,medecin,date_rdv,heure_rdv\n{self.patients[0].pk},dr.import,{self.jour},14:00\n'
+        fichier = SimpleUploadedFile('rdv.csv', contenu.encode('utf-8'), content_type='text/csv')
+        response = self.client.post(reverse('importer_rdv'), {'fichier': fichier})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['rapport'].crees, 1)
+
+
+class SerieRendezVousTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = creer_patient()
+        cls.autre_patient = creer_patient('Gharbi', 'Lina')
+        cls.medecin = creer_medecin()
+        cls.jour = prochain_jour_ouvre()
+        cls.heure = datetime.time(9, 0)
+
+    def test_occurrences(self):
+        dates = occurrences(self.jour, 'bimensuelle', nombre=3)
+        self.assertEqual(dates, [self.jour + datetime.timedelta(days=14 * i) for i in range(3)])
+        fin = self.jour + datetime.timedelta(days=21)
+        self.assertEqual(len(occurrences(self.jour, 'hebdomadaire', date_fin=fin)), 4)
+
+    def test_serie_creee_en_une_requete_de_verification(self):
+        dates = occurrences(self.jour, 'hebdomadaire', nombre=12)
+        with CaptureQueriesContext(connection) as requetes:
+            crees, rejets = creer_serie(self.patient, self.medecin, self.heure, dates)
+        selects = [q for q in requetes.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+        self.assertEqual((len(crees), rejets), (12, []))
+        self.assertEqual(RendezVous.objects.filter(patient=self.patient).count(), 12)
+
+    def test_conflit_annule_toute_la_serie(self):
+        dates = occurrences(self.jour, 'hebdomadaire', nombre=4)
+        RendezVous.objects.create(patient=self.autre_patient, medecin=self.medecin,
+                                  date_rdv=dates[2], heure_rdv=self.heure)
+        with self.assertRaises(ValidationError) as ctx:
+            creer_serie(self.patient, self.medecin, self.heure, dates)
+        self.assertIn('médecin', ctx.exception.messages[0])
+        self.assertFalse(RendezVous.objects.filter(patient=self.patient).exists())
+
+    def test_rejets_ignores(self):
+        samedi = self.jour + datetime.timedelta(days=(5 - self.jour.weekday()) % 7)
+        dates = [self.jour, samedi, self.jour + datetime.timedelta(days=7)]
+        RendezVous.objects.create(patient=self.patient, medecin=creer_medecin('Autre', 'Dr'),
+                                  date_rdv=dates[2], heure_rdv=self.heure)
+        crees, rejets = creer_serie(self.patient, self.medecin, self.heure, dates, ignorer_rejets=True)
+        self.assertEqual([r.date_rdv for r in crees], [self.jour])
+        self.assertEqual([d for d, _ in rejets], [samedi, dates[2]])
+        self.assertIn('patient', rejets[1][1])
+
+    def test_vue_serie(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('ajouter_serie_rdv'), {
+                'patient': self.patient.pk, 'medecin': self.medecin.pk,
+                'date_debut': self.jour.isoformat(), 'heure_rdv': '10:00',
+                'frequence': 'hebdomadaire', 'nombre': 5,
+            })
+        self.assertRedirects(response, reverse('liste_rdv'))
+        self.assertEqual(compteurs_statuts()['prévu'], 5)
+
+    def test_vue_sans_nombre_ni_fin(self):
+        response = self.client.post(reverse('ajouter_serie_rdv'), {
+            'patient': self.patient.pk, 'medecin': self.medecin.pk,
+            'date_debut': self.jour.isoformat(), 'heure_rdv': '10:00', 'frequence': 'hebdomadaire',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(RendezVous.objects.exists())
+
+
+class ClotureRendezVousTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.medecin = creer_medecin()
+        cls.patient = creer_patient()
+        aujourd_hui = timezone.localdate()
+        # 7 RDV passés 'prévu', 1 passé annulé, 1 à venir
+        for i in range(7):
+            RendezVous.objects.create(patient=cls.patient, medecin=cls.medecin,
+                                      date_rdv=aujourd_hui - datetime.timedelta(days=1 + i // 3),
+                                      heure_rdv=datetime.time(8 + i % 3, 0))
+        RendezVous.objects.create(patient=cls.patient, medecin=cls.medecin, statut='annulé',
+                                  date_rdv=aujourd_hui - datetime.timedelta(days=1), heure_rdv=datetime.time(8, 0))
+        RendezVous.objects.create(patient=cls.patient, medecin=cls.medecin,
+                                  date_rdv=prochain_jour_ouvre(), heure_rdv=datetime.time(8, 0))
+
+    def test_dry_run(self):
+        self.assertEqual(cloturer_rdv_passes(taille_lot=3, dry_run=True), 7)
+        self.assertEqual(RendezVous.objects.filter(statut='terminé').count(), 0)
+
+    def test_cloture_par_lots(self):
+        lots = []
+        with self.captureOnCommitCallbacks(execute=True):
+            total = cloturer_rdv_passes(taille_lot=3, progression=lots.append)
+        self.assertEqual(total, 7)
+        self.assertEqual(lots, [3, 6, 7])
+        self.assertEqual(compteurs_statuts(), {'prévu': 1, 'terminé': 7, 'annulé': 1})
+        self.assertEqual(compteurs_statuts(), compter_statuts())
+        self.assertEqual(cloturer_rdv_passes(), 0)
+
+    def test_lots_lus_par_l_index(self):
+        with CaptureQueriesContext(connection) as requetes:
+            cloturer_rdv_passes(taille_lot=3, dry_run=True)
+        with connection.cursor() as cursor:
+            for requete in requetes.captured_queries:
+                cursor.execute('EXPLAIN QUERY PLAN ' + requete['sql'])
+                details = [ligne[-1] for ligne in cursor.fetchall()]
+                self.assertIn('rdv_statut_date_heure_idx', ' '.join(details))
+                self.assertNotIn('TEMP B-TREE', ' '.join(details))
+
+    def test_commande(self):
+        sortie = io.StringIO()
+        call_command('cloturer_rdv', '--dry-run', stdout=sortie)
+        self.assertIn('7 rendez-vous', sortie.getvalue())
+        call_command('cloturer_rdv', stdout=sortie)
+        self.assertEqual(RendezVous.objects.filter(statut='prévu').count(), 1)
+
+
+class AgendaIcsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.medecin = creer_medecin()
+        cls.patient = creer_patient('Ben Salah', 'Amine')
+        cls.jour = prochain_jour_ouvre()
+        cls.rdv = RendezVous.objects.create(patient=cls.patient, medecin=cls.medecin,
+                                            date_rdv=cls.jour, heure_rdv=datetime.time(9, 30))
+        RendezVous.objects.create(patient=cls.patient, medecin=cls.medecin, statut='annulé',
+                                  date_rdv=cls.jour, heure_rdv=datetime.time(10, 0))
+        cls.url = reverse('agenda_ics', args=[cls.medecin.pk])
+
+    def test_flux(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        contenu = b''.join(response.streaming_content).decode()
+        self.assertTrue(contenu.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(contenu.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(contenu.count('BEGIN:VEVENT'), 2)
+        self.assertIn(f'DTSTART:{self.jour:%Y%m%d}T093000Z', contenu)
+        self.assertIn('SUMMARY:RDV Amine Ben Salah', contenu)
+        self.assertIn('STATUS:CANCELLED', contenu)
+        self.assertTrue(all(len(l.encode()) <= 75 for l in contenu.split('\r\n')))
+
+    def test_get_conditionnel(self):
+        response = self.client.get(self.url)
+        etag, modifie = response['ETag'], response['Last-Modified']
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(requetes), 1)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=modifie)
+        self.assertEqual(response.status_code, 304)
+
+        # Un changement de statut ou une suppression change l'ETag
+        self.rdv.statut = 'terminé'
+        self.rdv.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get(self.url)['ETag']
+        RendezVous.objects.filter(statut='annulé').delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_renommage_change_le_validateur(self):
+        for fiche, attendu in [(self.patient, 'SUMMARY:RDV Amine Jaziri'), (self.medecin, 'Dr Sami Gharbi')]:
+            etag = self.client.get(self.url)['ETag']
+            fiche.nom = attendu.split()[-1]
+            fiche.save()
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            with self.subTest(fiche=fiche):
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(attendu, b''.join(response.streaming_content).decode())
+
+    def test_enregistrement_sans_renommage(self):
+        etag = self.client.get(self.url)['ETag']
+        patient = Patient.objects.get(pk=self.patient.pk)
+        patient.num_tel = '98123456'
+        patient.save()
+        medecin = Employe.objects.only('id', 'telephone').get(pk=self.medecin.pk)
+        medecin.telephone = '71999999'
+        medecin.save()
+        # Nom inchangé : ni index de recherche refait, ni RDV marqués modifiés
+        Patient(pk=self.patient.pk, nom='Ben Salah', prenom='Amine', dateNaissance=datetime.date(1990, 1, 1),
+                sexe='Homme', num_tel='98123456', dossier='dossiers_patients/test.pdf').save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_validateur_lu_dans_l_index(self):
+        with CaptureQueriesContext(connection) as requetes:
+            self.client.get(self.url, HTTP_IF_NONE_MATCH='"x"')
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + requetes.captured_queries[0]['sql'])
+            details = ' '.join(ligne[-1] for ligne in cursor.fetchall())
+        self.assertIn('COVERING INDEX rdv_medecin_modifie_idx', details)
+
+    def test_pliage_utf8(self):
+        ligne = 'SUMMARY:' + 'é' * 60
+        plie = _plier(ligne)
+        self.assertTrue(all(len(l.encode()) <= 75 for l in plie.split('\r\n')))
+        self.assertEqual(plie.replace('\r\n ', '').rstrip('\r\n'), ligne)
+
+    def test_medecin_inconnu(self):
+        self.assertEqual(self.client.get(reverse('agenda_ics', args=[9999])).status_code, 404)
+
+
+class AgendaSemaineTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.medecin = creer_medecin()
+        cls.patient = creer_patient()
+        cls.jour = prochain_jour_ouvre()
+        cls.rdv = RendezVous.objects.create(patient=cls.patient, medecin=cls.medecin,
+                                            date_rdv=cls.jour, heure_rdv=datetime.time(9, 0))
+        cls.url = reverse('api_agenda_semaine', args=[cls.medecin.pk])
+
+    def setUp(self):
+        cache.clear()
+        annee, semaine, _ = self.jour.isocalendar()
+        self.semaine = f'{annee}-W{semaine:02d}'
+
+    def agenda(self, semaine=None):
+        response = self.client.get(self.url, {'semaine': semaine or self.semaine})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_semaine_en_une_requete_puis_en_cache(self):
+        with CaptureQueriesContext(connection) as requetes:
+            donnees = self.agenda()
+        # vérification du médecin + lecture de la semaine
+        self.assertEqual(len(requetes), 2)
+        self.assertEqual(donnees['colonnes'][:3], ['id', 'date', 'heure'])
+        self.assertEqual(donnees['rdv'], [[self.rdv.pk, self.jour.isoformat(), '09:00', 'prévu',
+                                           self.patient.pk, 'Ben Salah Amine']])
+        with self.assertNumQueries(0):
+            self.agenda()
+
+    def test_invalidation_creation_et_annulation(self):
+        self.agenda()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('ajouter_rdv'), {
+                'patient': self.patient.pk, 'medecin': self.medecin.pk,
+                'date_rdv': self.jour.isoformat(), 'heure_rdv': '10:00', 'statut': 'prévu',
+            })
+        self.assertEqual(len(self.agenda()['rdv']), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('annuler_rdv', args=[self.rdv.pk]))
+        self.assertEqual(self.agenda()['rdv'][0][3], 'annulé')
+
+    def test_deplacement_invalide_les_deux_semaines(self):
+        autre_jour = self.jour + datetime.timedelta(days=7)
+        autre_semaine = '{}-W{:02d}'.format(*autre_jour.isocalendar()[:2])
+        self.agenda()
+        self.assertEqual(self.agenda(autre_semaine)['rdv'], [])
+        rdv = RendezVous.objects.get(pk=self.rdv.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            rdv.date_rdv = autre_jour
+            rdv.save()
+        self.assertEqual(self.agenda()['rdv'], [])
+        self.assertEqual(len(self.agenda(autre_semaine)['rdv']), 1)
+
+    def test_invalidation_operations_de_masse(self):
+        self.agenda()
+        with self.captureOnCommitCallbacks(execute=True):
+            creer_serie(self.patient, self.medecin, datetime.time(11, 0), [self.jour])
+        self.assertEqual(len(self.agenda()['rdv']), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            RendezVous.objects.get(pk=self.rdv.pk).delete()
+        self.assertEqual(len(self.agenda()['rdv']), 1)
+
+    def test_invalidation_par_la_cloture(self):
+        passe = timezone.localdate() - datetime.timedelta(days=7)
+        semaine = '{}-W{:02d}'.format(*passe.isocalendar()[:2])
+        RendezVous.objects.create(patient=self.patient, medecin=self.medecin,
+                                  date_rdv=passe, heure_rdv=datetime.time(9, 0))
+        self.assertEqual(self.agenda(semaine)['rdv'][0][3], 'prévu')
+        with self.captureOnCommitCallbacks(execute=True):
+            cloturer_rdv_passes()
+        self.assertEqual(self.agenda(semaine)['rdv'][0][3], 'terminé')
+
+    def test_nom_patient_modifie(self):
+        self.agenda()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.patient.nom = 'Jaziri'
+            self.patient.save()
+        self.assertEqual(self.agenda()['rdv'][0][5], 'Jaziri Amine')
+
+    def test_parametres_invalides(self):
+        self.assertEqual(self.client.get(self.url, {'semaine': '2026-W60'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'semaine': 'demain'}).status_code, 400)
+        url = reverse('api_agenda_semaine', args=[9999])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    async def test_variante_async(self):
+        url = reverse('api_agenda_semaine_async', args=[self.medecin.pk])
+        response = await self.async_client.get(url, {'semaine': self.semaine})
+        self.assertEqual(response.json()['rdv'][0][0], self.rdv.pk)
+        # même contenu que la vue synchrone, lu dans le même cache
+        self.assertEqual(response.content, (await sync_to_async(self.client.get)(self.url, {'semaine': self.semaine})).content)
+        self.assertEqual((await self.async_client.get(url, {'semaine': 'demain'})).status_code, 400)
+        url = reverse('api_agenda_semaine_async', args=[9999])
+        self.assertEqual((await self.async_client.get(url)).status_code, 404)
+
+
+class AutocompletionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patients = [creer_patient(f'Nom{i:02d}', 'Amine') for i in range(NB_RESULTATS + 5)]
+        cls.helene = creer_patient('Ben Salah', 'Hélène')
+        Patient.objects.filter(pk=cls.helene.pk).update(num_tel='98765432')
+        cls.medecin = creer_medecin('Ménard', 'Léo')
+        creer_medecin('Ménard', 'Zoé')
+
+    def resultats(self, url, q):
+        response = self.client.get(reverse(url), {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['resultats']
+
+    def test_patients_par_nom_et_telephone(self):
+        self.assertEqual(self.resultats('autocomplete_patients', 'hel'),
+                         [{'id': self.helene.pk, 'libelle': 'Ben Salah Hélène — 98765432'}])
+        self.assertEqual([r['id'] for r in self.resultats('autocomplete_patients', '9876')], [self.helene.pk])
+        self.assertEqual(self.resultats('autocomplete_patients', '3'), [])
+        self.assertEqual(self.resultats('autocomplete_patients', ''), [])
+
+    def test_nombre_de_resultats_limite(self):
+        with self.assertNumQueries(1):
+            resultats = self.resultats('autocomplete_patients', 'nom')
+        self.assertEqual([r['id'] for r in resultats], [p.pk for p in self.patients[:NB_RESULTATS]])
+
+    def test_medecins(self):
+        resultats = self.resultats('autocomplete_medecins', 'menard le')
+        self.assertEqual(resultats, [{'id': self.medecin.pk, 'libelle': 'Dr Ménard Léo (Cardiologie)'}])
+        self.assertEqual(self.resultats('autocomplete_medecins', 'nom01'), [])
+
+    def test_formulaire_sans_liste_complete(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('ajouter_rdv'))
+        self.assertNotContains(response, '<option value="%d"' % self.patients[0].pk)
+        self.assertContains(response, reverse('autocomplete_patients'))
+
+    def test_modification_affiche_le_libelle(self):
+        rdv = RendezVous.objects.create(patient=self.helene, medecin=self.medecin,
+                                        date_rdv=prochain_jour_ouvre(), heure_rdv=datetime.time(9, 0))
+        response = self.client.get(reverse('update_rdv', args=[rdv.pk]))
+        self.assertContains(response, 'value="Ben Salah Hélène — 98765432"')
+        self.assertContains(response, f'name="patient" id="id_patient" value="{self.helene.pk}"')
+
+    def test_identifiant_valide_en_base(self):
+        donnees = {'date_rdv': prochain_jour_ouvre().isoformat(), 'heure_rdv': '09:00', 'statut': 'prévu'}
+        form = RendezVousForm({**donnees, 'patient': self.helene.pk, 'medecin': self.medecin.pk})
+        self.assertTrue(form.is_valid(), form.errors)
+        # Identifiant inconnu : refusé par la lecture de cette seule ligne
+        form = RendezVousForm({**donnees, 'patient': self.helene.pk, 'medecin': 9999})
+        self.assertIn('medecin', form.errors)
+
+    def test_plan_recherche_telephone_indexe(self):
+        with CaptureQueriesContext(connection) as requetes:
+            chercher_patients('9876')
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + requetes.captured_queries[0]['sql'])
+            details = [ligne[-1] for ligne in cursor.fetchall()]
+        self.assertTrue(any('INDEX patient_num_tel_idx' in d for d in details), details)
+
+
+class OccupationMedecinTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.medecin = creer_medecin()
+        cls.autre_medecin = creer_medecin('Gharbi', 'Lina', service='Pédiatrie')
+        cls.patient = creer_patient()
+        cls.jour = prochain_jour_ouvre()
+        cls.rdv = RendezVous.objects.create(patient=cls.patient, medecin=cls.medecin,
+                                            date_rdv=cls.jour, heure_rdv=datetime.time(9, 0))
+        RendezVous.objects.create(patient=cls.patient, medecin=cls.medecin,
+                                  date_rdv=cls.jour, heure_rdv=datetime.time(9, 30), statut='terminé')
+
+    def setUp(self):
+        cache.clear()
+
+    def occupation(self):
+        return {
+            (o.medecin_id, o.date, o.heure, o.statut): o.nombre
+            for o in OccupationMedecin.objects.exclude(nombre=0)
+        }
+
+    def attendu(self):
+        return dict(Counter(
+            (r.medecin_id, r.date_rdv, r.heure_rdv.hour, r.statut) for r in RendezVous.objects.all()
+        ))
+
+    def test_creation_annulation_deplacement_suppression(self):
+        self.assertEqual(self.occupation(), {(self.medecin.pk, self.jour, 9, 'prévu'): 1,
+                                             (self.medecin.pk, self.jour, 9, 'terminé'): 1})
+        self.client.get(reverse('annuler_rdv', args=[self.rdv.pk]))
+        self.assertEqual(self.occupation(), self.attendu())
+        self.assertEqual(self.occupation()[(self.medecin.pk, self.jour, 9, 'annulé')], 1)
+        # Déplacement vers un autre médecin et une autre heure
+        rdv = RendezVous.objects.get(pk=self.rdv.pk)
+        rdv.medecin, rdv.heure_rdv = self.autre_medecin, datetime.time(14, 0)
+        rdv.save()
+        self.assertEqual(self.occupation(), self.attendu())
+        # Instance construite sans lecture préalable : ancienne cellule relue en base
+        RendezVous(pk=rdv.pk, patient=self.patient, medecin=self.medecin, date_rdv=self.jour,
+                   heure_rdv='11:00', statut='prévu').save()
+        self.assertEqual(self.occupation(), self.attendu())
+        # Enregistrement sans changement de cellule : aucune écriture dans les agrégats
+        rdv = RendezVous.objects.get(pk=rdv.pk)
+        with CaptureQueriesContext(connection) as requetes:
+            rdv.save()
+        self.assertNotIn(OccupationMedecin._meta.db_table, ' '.join(q['sql'] for q in requetes))
+        rdv.delete()
+        self.assertEqual(self.occupation(), self.attendu())
+
+    def test_operations_de_masse(self):
+        creer_serie(self.patient, self.medecin, datetime.time(10, 0),
+                    occurrences(self.jour, 'hebdomadaire', nombre=3))
+        rapport = importer_rdv(io.StringIO(
+            'patient,medecin,date_rdv,heure_rdv,statut\n'
+            f'{self.patient.pk},{self.autre_medecin.pk},{self.jour},15:00,\n'
+            f'{self.patient.pk},{self.autre_medecin.pk},{self.jour},15:30,annulé\n'
+        ))
+        self.assertEqual(rapport.crees, 2)
+        hier = timezone.localdate() - datetime.timedelta(days=1)
+        for heure in (8, 9):
+            RendezVous.objects.create(patient=self.patient, medecin=self.autre_medecin,
+                                      date_rdv=hier, heure_rdv=datetime.time(heure, 0))
+        self.assertEqual(cloturer_rdv_passes(), 2)
+        self.assertEqual(self.occupation(), self.attendu())
+        self.assertEqual(self.occupation()[(self.autre_medecin.pk, hier, 8, 'terminé')], 1)
+
+    def test_reconstruction(self):
+        OccupationMedecin.objects.all().delete()
+        RendezVous.objects.filter(pk=self.rdv.pk).update(statut='annulé')
+        sortie = io.StringIO()
+        call_command('reconstruire_occupation', stdout=sortie)
+        self.assertIn("2 cellules d'occupation", sortie.getvalue())
+        self.assertEqual(self.occupation(), self.attendu())
+
+    def test_reconstruction_taille_lot_invalide(self):
+        attendu = self.occupation()
+        for taille in (0, -1):
+            with self.subTest(taille=taille):
+                with self.assertRaises(CommandError):
+                    call_command('reconstruire_occupation', taille_lot=taille)
+                with self.assertRaises(ValueError):
+                    reconstruire_occupation(taille)
+        self.assertEqual(self.occupation(), attendu)
+
+    def test_lectures_du_tableau_de_bord(self):
+        annee = self.jour.year
+        with self.assertNumQueries(2):
+            annee_mois = occupation_annee(annee)
+        self.assertEqual(charge_par_medecin(annee_mois)[self.medecin.pk]['mois'][self.jour.month - 1], 2)
+        # Mois en cache ; l'annulation ne retire que le mois du rendez-vous
+        with self.assertNumQueries(0):
+            occupation_annee(annee)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('annuler_rdv', args=[self.rdv.pk]))
+        with CaptureQueriesContext(connection) as requetes:
+            annee_mois = occupation_annee(annee)
+        debut_mois = self.jour.replace(day=1).isoformat()
+        self.assertEqual(len(requetes), 2)
+        self.assertTrue(all(debut_mois in q['sql'] for q in requetes.captured_queries))
+        charge = charge_par_medecin(annee_mois)[self.medecin.pk]
+        self.assertEqual(charge['mois'][self.jour.month - 1], 1)
+        self.assertEqual((charge['total'], charge['annules'], charge['taux_annulation']), (2, 1, 50))
+        self.assertEqual(carte_occupation(annee_mois), {(self.jour.weekday(), 9): 1})
+        self.assertEqual(charge_par_medecin(occupation_annee(annee + 1)), {})
+
+    def test_calcul_concurrent_n_ecrase_pas_l_invalidation(self):
+        annee = self.jour.year
+        calculer = _calculer_mois
+
+        def calculer_puis_annuler(*args):
+            resultat = calculer(*args)  # lu avant l'annulation
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.get(reverse('annuler_rdv', args=[self.rdv.pk]))
+            return resultat
+
+        with mock.patch('RendezVousApp.occupation._calculer_mois', calculer_puis_annuler):
+            occupation_annee(annee)
+        # Le résultat périmé est rangé sous l'ancienne version : le mois est relu
+        self.assertEqual(charge_par_medecin(occupation_annee(annee))[self.medecin.pk]['annules'], 1)
+
+    def test_vue_lit_seulement_les_agregats(self):
+        url = reverse('tableau_occupation')
+        self.assertRedirects(self.client.get(url), f"{reverse('connexion_employe')}?next={url}")
+        session = self.client.session
+        session['employe'] = {'id': self.medecin.pk, 'nom': 'Admin', 'prenom': 'Test',
+                              'role': 'administrateur', 'service': 'Direction', 'connecte_le': time.time()}
+        session.save()
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(url, {'annee': self.jour.year})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['nom'] for c in response.context['charges']], ['Trabelsi Sami'])
+        sql = [q['sql'] for q in requetes.captured_queries if OccupationMedecin._meta.db_table in q['sql']]
+        self.assertEqual(len(sql), 4)  # bornes des années + mois de l'année
+        self.assertFalse(any(RendezVous._meta.db_table + '"' in q['sql'] for q in requetes.captured_queries))
+        # Intervalle de dates lu dans l'index couvrant, sans accès à la table
+        with connection.cursor() as cursor:
+            for requete in sql:
+                cursor.execute('EXPLAIN QUERY PLAN ' + requete)
+                details = ' '.join(ligne[-1] for ligne in cursor.fetchall())
+                self.assertIn('USING COVERING INDEX occupation_date_idx', details)
+        self.assertEqual(self.client.get(url, {'annee': 'x'}).status_code, 200)
@@ -4,10 +4,24 @@ from . import views
 urlpatterns = [
     path('liste/', views.RendezVousListView.as_view(), name='liste_rdv'),
     path('ajouter/', views.RendezVousCreateView.as_view(), name='ajouter_rdv'),
+    path('ajouter-serie/', views.ajouter_serie_rdv, name='ajouter_serie_rdv'),
     path('modifier/<int:pk>/', views.RendezVousUpdateView.as_view(), name='update_rdv'),
     path('annuler/<int:rdv_id>/', views.annuler_rdv, name='annuler_rdv'),
     path('historique/', views.RendezVousHistoriqueListView.as_view(), name='historique_rdv'),
     path('historiqueMedecin/<int:medecin_id>/', views.historique_medecin, name='historique_medecin'),
+    path('medecin/<int:medecin_id>/agenda.ics', views.agenda_ics, name='agenda_ics'),
+    path('api/agenda/<int:medecin_id>/', views.api_agenda_semaine, name='api_agenda_semaine'),
+    path('api/creneaux/', views.api_creneaux_libres, name='api_creneaux_libres'),
+    path('api/autocomplete/patients/', views.api_autocomplete_patients, name='autocomplete_patients'),
+    path('api/autocomplete/medecins/', views.api_autocomplete_medecins, name='autocomplete_medecins'),
+    path('importer/', views.importer_rdv_csv, name='importer_rdv'),
+    path('occupation/', views.tableau_occupation, name='tableau_occupation'),
+
+    # Variantes async des vues de lecture (ORM asynchrone), pour un déploiement ASGI
+    path('async/liste/', views.RendezVousListAsyncView.as_view(), name='liste_rdv_async'),
+    path('async/historique/', views.RendezVousHistoriqueAsyncView.as_view(), name='historique_rdv_async'),
+    path('async/historiqueMedecin/<int:medecin_id>/', views.ahistorique_medecin, name='historique_medecin_async'),
+    path('async/api/agenda/<int:medecin_id>/', views.aapi_agenda_semaine, name='api_agenda_semaine_async'),
 
 
 ]
@@ -1,16 +1,37 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.views.generic import ListView, CreateView, UpdateView
 from django.urls import reverse_lazy
 from django.contrib import messages
 from EmployeApp.models import Employe
 from .models import RendezVous
-from .forms import RendezVousForm
-from django.shortcuts import get_object_or_404,redirect
+from .forms import RendezVousForm, ImportRendezVousForm, SerieRendezVousForm
+from django.shortcuts import get_object_or_404, aget_object_or_404, redirect
+from django.template.response import TemplateResponse
 from django.core.exceptions import ValidationError
 from django.shortcuts import render
 from django.core.paginator import Paginator
 from django.db.models import Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import condition
 from .models import RendezVous, Employe
+from .creneaux import creneaux_libres, DUREE_CRENEAU
+from .recherche import filtrer_par_nom
+from .pagination import CurseurPaginator, PaginationCurseurMixin, ListeAsyncMixin
+from .compteurs import ajuster_compteurs, compteurs_statuts, acompteurs_statuts
+from .importation import importer_rdv
+from .series import creer_serie
+from .calendrier import etat_agenda, etag_agenda, flux_ics
+from .agenda import agenda_semaine, aagenda_semaine, invalider_agenda, semaine_iso
+from .autocompletion import chercher_patients, chercher_medecins
+from .occupation import annees_disponibles, occupation_annee, charge_par_medecin, carte_occupation
+from .occupation import ajuster_occupation, cellule
+from .models import HEURE_OUVERTURE, HEURE_FERMETURE, JOURS_FERMES
+from EmployeApp import annuaire
+from EmployeApp.authentification import role_requis
+from SoftwareProject.exports import format_demande, reponse_export
+import datetime
+import io
+from django.utils import timezone
 
 
 
@@ -26,89 +47,81 @@ class RendezVousListView(ListView):
     paginate_by = 5
 
     def get_queryset(self):
-        qs = super().get_queryset().filter(statut='prévu').order_by('date_rdv', 'heure_rdv')
-
+        qs = (
+            super().get_queryset()
+            .select_related('patient', 'medecin')  # noms affichés sur chaque ligne
+            .filter(statut='prévu')
+            .order_by('date_rdv', 'heure_rdv')
+        )
+
+        # Recherche par nom/prénom du patient ou du médecin (index de termes)
         search = self.request.GET.get('search')
-
         if search:
-            search = search.strip()
-            terms = search.split()
-
-            if len(terms) == 1:
-                qs = qs.filter(
-                    Q(medecin_id__nom__icontains=terms[0]) |
-                    Q(medecin_id__prenom__icontains=terms[0]) |
-                    Q(patient_id__nom__icontains=terms[0]) |
-                    Q(patient_id__prenom__icontains=terms[0])
-                )
+            qs = filtrer_par_nom(qs, search)
 
-            elif len(terms) >= 2:
-                first = terms[0]
-                second = terms[1]
+        return qs
 
-                qs = qs.filter(
-                    Q(medecin_id__nom__icontains=first, medecin_id__prenom__icontains=second) |
-                    Q(medecin_id__nom__icontains=second, medecin_id__prenom__icontains=first) |
-                    Q(patient_id__nom__icontains=first, patient_id__prenom__icontains=second) |
-                    Q(patient_id__nom__icontains=second, patient_id__prenom__icontains=first)
-                )
 
-        return qs
+class RendezVousListAsyncView(ListeAsyncMixin, RendezVousListView):
+    """Même liste servie par une vue async (ORM asynchrone), pour ASGI."""
 
 
 
 #Liste des RDV historique
+
+COLONNES_EXPORT_HISTORIQUE = [
+    ('date_rdv', 'Date'),
+    ('heure_rdv', 'Heure'),
+    ('statut', 'Statut'),
+    ('patient__nom', 'Nom du patient'),
+    ('patient__prenom', 'Prénom du patient'),
+    ('medecin__nom', 'Nom du médecin'),
+    ('medecin__prenom', 'Prénom du médecin'),
+]
 # views.py
-class RendezVousHistoriqueListView(ListView):
+class RendezVousHistoriqueListView(PaginationCurseurMixin, ListView):
     model = RendezVous
     template_name = 'RDV/historique_rdv.html'
     context_object_name = 'rdvs'
     paginate_by = 5
 
     def get_queryset(self):
-        # D'abord, filtrer les RDV terminés ou annulés
-        qs = super().get_queryset().filter(statut__in=['annulé', 'terminé']).order_by('-date_rdv', '-heure_rdv')
+        # D'abord, filtrer les RDV terminés ou annulés (statut != 'prévu' : même
+        # condition que l'index partiel rdv_historique_date_idx)
+        qs = (
+            super().get_queryset()
+            .select_related('patient', 'medecin')  # noms affichés sur chaque ligne
+            .exclude(statut='prévu')
+            .order_by('-date_rdv', '-heure_rdv')
+        )
         
         # Ajouter le filtre par statut
         statut_filter = self.request.GET.get('statut')
         if statut_filter:
             qs = qs.filter(statut=statut_filter)
         
-        # Recherche par nom/prenom
+        # Recherche par nom/prenom (index de termes, sans accents, ordre libre)
         search = self.request.GET.get('search')
         if search:
-            search = search.strip()
-            terms = search.split()
-
-            if len(terms) == 1:
-                qs = qs.filter(
-                    Q(medecin_nom__icontains=terms[0]) |
-                    Q(medecin__prenom__icontains=terms[0]) |
-                    Q(patient__nom__icontains=terms[0]) |
-                    Q(patient__prenom__icontains=terms[0])
-                )
-            elif len(terms) >= 2:
-                first = terms[0]
-                second = terms[1]
-                qs = qs.filter(
-                    Q(medecin__nom__icontains=first, medecin__prenom__icontains=second) |
-                    Q(medecin__nom__icontains=second, medecin__prenom__icontains=first) |
-                    Q(patient__nom__icontains=first, patient__prenom__icontains=second) |
-                    Q(patient__nom__icontains=second, patient__prenom__icontains=first)
-                )
+            qs = filtrer_par_nom(qs, search)
         
         return qs
 
+    def get(self, request, *args, **kwargs):
+        # ?export=csv|xlsx : toutes les lignes filtrées, en flux
+        if format_demande(request):
+            return reponse_export(request, self.get_queryset(), COLONNES_EXPORT_HISTORIQUE, 'historique_rdv')
+        # Compteurs par statut : table CompteurStatut tenue à jour par les signaux
+        self.compteurs = compteurs_statuts()
+        return super().get(request, *args, **kwargs)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Récupérer le queryset de base (sans pagination)
-        base_qs = RendezVous.objects.filter(statut__in=['annulé', 'terminé'])
-        
-        # Calculer les compteurs totaux
-        context['total_count'] = base_qs.count()
-        context['terminated_count'] = base_qs.filter(statut='terminé').count()
-        context['cancelled_count'] = base_qs.filter(statut='annulé').count()
+        compteurs = self.compteurs
+        context['terminated_count'] = compteurs['terminé']
+        context['cancelled_count'] = compteurs['annulé']
+        context['total_count'] = compteurs['terminé'] + compteurs['annulé']
         
         # Ajouter la recherche courante
         context['search_query'] = self.request.GET.get('search', '')
@@ -116,6 +129,16 @@ class RendezVousHistoriqueListView(ListView):
         
         return context
 
+
+class RendezVousHistoriqueAsyncView(ListeAsyncMixin, RendezVousHistoriqueListView):
+    """Même historique servi par une vue async (ORM asynchrone), pour ASGI."""
+
+    async def get(self, request, *args, **kwargs):
+        if format_demande(request):
+            return reponse_export(request, self.get_queryset(), COLONNES_EXPORT_HISTORIQUE, 'historique_rdv')
+        self.compteurs = await acompteurs_statuts()
+        return await super().get(request, *args, **kwargs)
+
 def validate_rdv(form, instance=None):
     """
     Vérifie les conflits pour un rendez-vous.
@@ -128,12 +151,21 @@ def validate_rdv(form, instance=None):
     heure_rdv = form.cleaned_data['heure_rdv']
 
     qs = RendezVous.objects.all().exclude(statut='annulé')
-    if instance:
+    if instance and instance.pk:
         qs = qs.exclude(pk=instance.pk)
 
-    conflict_medecin = qs.filter(medecin=medecin, date_rdv=date_rdv, heure_rdv=heure_rdv).exists()
-    conflict_patient = qs.filter(patient=patient, date_rdv=date_rdv, heure_rdv=heure_rdv).exists()
-    conflict_rdv = qs.filter(patient=patient, medecin=medecin, date_rdv=date_rdv, heure_rdv=heure_rdv).exists()
+    # Une seule requête : tous les RDV du créneau pour ce médecin ou ce patient
+    conflits = qs.filter(
+        Q(medecin=medecin) | Q(patient=patient),
+        date_rdv=date_rdv,
+        heure_rdv=heure_rdv,
+    ).values_list('medecin_id', 'patient_id')
+
+    conflict_medecin = conflict_patient = conflict_rdv = False
+    for medecin_id, patient_id in conflits:
+        conflict_medecin |= medecin_id == medecin.pk
+        conflict_patient |= patient_id == patient.pk
+        conflict_rdv |= medecin_id == medecin.pk and patient_id == patient.pk
 
     errors = []
     if conflict_medecin:
@@ -147,6 +179,23 @@ def validate_rdv(form, instance=None):
         raise ValidationError(errors)
 
 
+def enregistrer_rdv(form, instance=None):
+    """
+    Vérifie les conflits puis enregistre le rendez-vous dans une transaction.
+    Si un autre enregistrement a pris le créneau entre la vérification et
+    l'insertion, la contrainte unique de la base lève une IntegrityError,
+    convertie ici en ValidationError avec les mêmes messages.
+    """
+    try:
+        with transaction.atomic():
+            validate_rdv(form, instance=instance)
+            return form.save()
+    except IntegrityError:
+        # Le créneau vient d'être pris : on relit pour donner le message exact
+        validate_rdv(form, instance=instance)
+        raise ValidationError("❌ Ce créneau vient d'être réservé. Veuillez en choisir un autre.")
+
+
 class RendezVousCreateView(CreateView):
     model = RendezVous
     form_class = RendezVousForm
@@ -155,16 +204,17 @@ class RendezVousCreateView(CreateView):
 
 
     def form_valid(self, form):
-        # Validation des conflits
+        # Définir le statut par défaut
+        form.instance.statut = 'prévu'
+
+        # Validation des conflits + enregistrement atomique
         try:
-            validate_rdv(form)
+            self.object = enregistrer_rdv(form)
         except ValidationError as e:
             form.add_error(None, e)  # None = erreur non liée à un champ spécifique
             return self.form_invalid(form)
 
-        # Définir le statut par défaut
-        form.instance.statut = 'prévu'
-        return super().form_valid(form)
+        return redirect(self.get_success_url())
 
 
 
@@ -190,83 +240,323 @@ class RendezVousUpdateView(UpdateView):#automatiquement faire un update
 
     def form_valid(self, form):
         try:
-            validate_rdv(form, instance=self.object)
+            self.object = enregistrer_rdv(form, instance=self.object)
         except ValidationError as e:
             form.add_error(None, e)
             return self.form_invalid(form)
 
-        return super().form_valid(form)
+        return redirect(self.get_success_url())
+
+def ajouter_serie_rdv(request):
+    """Création d'une série de rendez-vous récurrents en une seule transaction."""
+    if request.method == 'POST':
+        form = SerieRendezVousForm(request.POST)
+        if form.is_valid():
+            try:
+                crees, rejets = creer_serie(
+                    form.cleaned_data['patient'],
+                    form.cleaned_data['medecin'],
+                    form.cleaned_data['heure_rdv'],
+                    form.dates(),
+                    ignorer_rejets=form.cleaned_data['ignorer_rejets'],
+                )
+            except ValidationError as e:
+                form.add_error(None, e)
+            else:
+                messages.success(request, f"✅ {len(crees)} rendez-vous créés.")
+                for date_rdv, motif in rejets:
+                    messages.warning(request, f"⚠️ {date_rdv:%d/%m/%Y} ignoré : {motif}")
+                return redirect('liste_rdv')
+    else:
+        form = SerieRendezVousForm()
+    return render(request, 'RDV/ajouter_serie_rdv.html', {'form': form})
+
 
 def annuler_rdv(request, rdv_id):
-    rdv = get_object_or_404(RendezVous, id=rdv_id)
-    if rdv.statut not in ['annulé', 'terminé']:
-        rdv.statut = 'annulé'
-        rdv.save()
+    """
+    Annulation par un UPDATE conditionnel sur le statut : de deux annulations
+    simultanées, une seule modifie la ligne et ajuste compteurs, occupation et
+    agenda, dans la même transaction que le changement de statut.
+    """
+    with transaction.atomic():
+        # 'prévu' est le seul statut annulable (ni 'annulé' ni 'terminé')
+        annule = RendezVous.objects.filter(pk=rdv_id, statut='prévu').update(
+            statut='annulé', modifie_le=timezone.now())
+        if annule == 1:
+            # Ligne verrouillée par l'UPDATE : relue telle qu'elle vient d'être écrite
+            medecin_id, date_rdv, heure_rdv = RendezVous.objects.filter(pk=rdv_id).values_list(
+                'medecin_id', 'date_rdv', 'heure_rdv').get()
+            ajuster_compteurs({'prévu': -1, 'annulé': 1})
+            ajuster_occupation({
+                cellule(medecin_id, date_rdv, heure_rdv, 'prévu'): -1,
+                cellule(medecin_id, date_rdv, heure_rdv, 'annulé'): 1,
+            })
+            invalider_agenda([(medecin_id, date_rdv)])
+    if annule:
         messages.success(request, "✅ Le rendez-vous a été annulé avec succès.")
     else:
+        get_object_or_404(RendezVous.objects.only('pk'), id=rdv_id)
         messages.warning(request, "⚠️ Impossible d'annuler ce rendez-vous.")
     return redirect('liste_rdv')
 
 
 from django.shortcuts import render, get_object_or_404
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db.models import Q
 from .models import RendezVous, Employe
 
-def historique_medecin(request, medecin_id):
-    # Récupérer le médecin
-    medecin = get_object_or_404(Employe, id=medecin_id, role='medecin')
-    
+def _paginateur_historique_medecin(request, medecin):
     # Récupérer tous les rendez-vous du médecin (sauf 'prévu')
-    rendezvous_list = RendezVous.objects.filter(
+    rendezvous_list = RendezVous.objects.select_related('patient').filter(
         medecin_id=medecin
     ).exclude(
         statut='prévu'
     ).order_by('-date_rdv', '-heure_rdv')
     
-    # Recherche
+    # Recherche sur le nom/prénom du patient
     search = request.GET.get('search')
     if search:
-        search = search.strip()
-        terms = search.split()
-        
-        if len(terms) == 1:
-            rendezvous_list = rendezvous_list.filter(
-                Q(patient_id__nom__icontains=terms[0]) |
-                Q(patient_id__prenom__icontains=terms[0])
-            )
-        elif len(terms) >= 2:
-            first = terms[0]
-            second = terms[1]
-            rendezvous_list = rendezvous_list.filter(
-                Q(patient_id__nom__icontains=first, patient_id__prenom__icontains=second) |
-                Q(patient_id__nom__icontains=second, patient_id__prenom__icontains=first)
-            )
+        rendezvous_list = filtrer_par_nom(rendezvous_list, search, medecin=False)
     
     # Filtre par statut
     statut = request.GET.get('statut')
     if statut:
         rendezvous_list = rendezvous_list.filter(statut=statut)
     
-    # Pagination - 5 éléments par page
-    paginator = Paginator(rendezvous_list, 5)
-    page_number = request.GET.get('page')
-    
-    try:
-        page_obj = paginator.page(page_number)
-    except PageNotAnInteger:
-        # Si page n'est pas un entier, afficher la première page
-        page_obj = paginator.page(1)
-    except EmptyPage:
-        # Si page est hors limites, afficher la dernière page
-        page_obj = paginator.page(paginator.num_pages)
-    
-    context = {
+    # Pagination par curseur - 5 éléments par page, sans COUNT ni OFFSET
+    return CurseurPaginator(rendezvous_list, 5)
+
+
+def _contexte_historique_medecin(medecin, paginator, page_obj):
+    return {
         'medecin': medecin,
         'rendezvous': page_obj,  # L'objet page, pas la liste complète
         'page_obj': page_obj,    # Pour la pagination
         'paginator': paginator,  # Pour la pagination
-        'is_paginated': paginator.num_pages > 1,  # Vérifier si pagination nécessaire
+        'is_paginated': page_obj.has_other_pages(),  # Vérifier si pagination nécessaire
     }
-    
-    return render(request, 'RDV/historique_medecin.html', context)
+
+
+def historique_medecin(request, medecin_id):
+    # Récupérer le médecin
+    medecin = get_object_or_404(Employe, id=medecin_id, role='medecin')
+    paginator = _paginateur_historique_medecin(request, medecin)
+    page_obj = paginator.page(request.GET.get('curseur'))
+    return render(request, 'RDV/historique_medecin.html', _contexte_historique_medecin(medecin, paginator, page_obj))
+
+
+async def ahistorique_medecin(request, medecin_id):
+    """Version async de historique_medecin() (ORM asynchrone), pour ASGI."""
+    medecin = await aget_object_or_404(Employe, id=medecin_id, role='medecin')
+    paginator = _paginateur_historique_medecin(request, medecin)
+    page_obj = await paginator.apage(request.GET.get('curseur'))
+    # Rendu différé (hors de la boucle d'événements)
+    return TemplateResponse(request, 'RDV/historique_medecin.html',
+                            _contexte_historique_medecin(medecin, paginator, page_obj))
+
+
+# Flux iCalendar par médecin (interrogé régulièrement par les agendas)
+def _etat_agenda(request, medecin_id):
+    # Une seule requête pour ETag et Last-Modified
+    if not hasattr(request, '_etat_agenda'):
+        request._etat_agenda = etat_agenda(medecin_id)
+    return request._etat_agenda
+
+
+def _etag_agenda(request, medecin_id):
+    nombre, modifie = _etat_agenda(request, medecin_id)
+    return etag_agenda(medecin_id, nombre, modifie) if modifie else None
+
+
+def _derniere_modification_agenda(request, medecin_id):
+    return _etat_agenda(request, medecin_id)[1]
+
+
+@condition(etag_func=_etag_agenda, last_modified_func=_derniere_modification_agenda)
+def agenda_ics(request, medecin_id):
+    medecin = get_object_or_404(Employe, id=medecin_id, role='medecin')
+    response = StreamingHttpResponse(flux_ics(medecin), content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = f'inline; filename="agenda-{medecin_id}.ics"'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# Recherche de créneaux libres (JSON)
+MAX_JOURS_RECHERCHE = 92
+
+
+def _parse_date(valeur):
+    try:
+        return datetime.date.fromisoformat(valeur)
+    except (TypeError, ValueError):
+        return None
+
+
+def api_creneaux_libres(request):
+    """
+    GET ?medecin=<id>[&medecin=<id>...]&debut=AAAA-MM-JJ[&fin=AAAA-MM-JJ]
+    Retourne les créneaux libres de chaque médecin sur la période.
+    """
+    try:
+        medecin_ids = [int(v) for v in request.GET.getlist('medecin')]
+    except ValueError:
+        return JsonResponse({'erreur': "Identifiant de médecin invalide."}, status=400)
+    debut = _parse_date(request.GET.get('debut'))
+    fin = _parse_date(request.GET.get('fin')) if request.GET.get('fin') else debut
+
+    if not medecin_ids or debut is None or fin is None:
+        return JsonResponse({'erreur': "Paramètres requis : medecin, debut (AAAA-MM-JJ)."}, status=400)
+    if fin < debut or (fin - debut).days > MAX_JOURS_RECHERCHE:
+        return JsonResponse(
+            {'erreur': f"La période doit couvrir entre 1 et {MAX_JOURS_RECHERCHE} jours."},
+            status=400,
+        )
+
+    medecins = list(
+        Employe.objects.filter(pk__in=medecin_ids, role='medecin')
+        .order_by('nom', 'prenom')
+        .values('id', 'nom', 'prenom')
+    )
+    if not medecins:
+        return JsonResponse({'erreur': "Médecin introuvable."}, status=404)
+
+    libres = creneaux_libres([m['id'] for m in medecins], debut, fin)
+    return JsonResponse({
+        'debut': debut.isoformat(),
+        'fin': fin.isoformat(),
+        'duree_creneau': DUREE_CRENEAU,
+        'medecins': [
+            {
+                'id': m['id'],
+                'nom': m['nom'],
+                'prenom': m['prenom'],
+                'creneaux': {jour.isoformat(): heures for jour, heures in libres[m['id']].items()},
+            }
+            for m in medecins
+        ],
+    })
+
+
+# Agenda de la semaine d'un médecin (JSON en cache)
+def _parse_semaine(valeur):
+    """'AAAA-Wss' -> (annee, semaine) ou None."""
+    try:
+        annee, semaine = valeur.upper().split('-W')
+        lundi = datetime.date.fromisocalendar(int(annee), int(semaine), 1)
+    except (AttributeError, ValueError):
+        return None
+    return lundi.isocalendar()[:2]
+
+
+def _semaine_demandee(request):
+    semaine = request.GET.get('semaine')
+    return _parse_semaine(semaine) if semaine else semaine_iso(timezone.localdate())
+
+
+def _reponse_agenda(annee_semaine, contenu):
+    if annee_semaine is None:
+        return JsonResponse({'erreur': "Paramètre semaine invalide (format AAAA-Wss)."}, status=400)
+    if contenu is None:
+        return JsonResponse({'erreur': "Médecin introuvable."}, status=404)
+    return HttpResponse(contenu, content_type='application/json')
+
+
+def api_agenda_semaine(request, medecin_id):
+    """
+    GET ?semaine=AAAA-Wss (semaine courante par défaut)
+    Retourne tous les rendez-vous du médecin sur la semaine ISO.
+    """
+    annee_semaine = _semaine_demandee(request)
+    contenu = agenda_semaine(medecin_id, *annee_semaine) if annee_semaine else None
+    return _reponse_agenda(annee_semaine, contenu)
+
+
+async def aapi_agenda_semaine(request, medecin_id):
+    """Version async de api_agenda_semaine(), pour ASGI."""
+    annee_semaine = _semaine_demandee(request)
+    contenu = await aagenda_semaine(medecin_id, *annee_semaine) if annee_semaine else None
+    return _reponse_agenda(annee_semaine, contenu)
+
+
+# Autocomplétion du formulaire de rendez-vous
+def api_autocomplete_patients(request):
+    """GET ?q=... : premiers patients par nom, prénom ou début de téléphone."""
+    q = request.GET.get('q', '').strip()
+    return JsonResponse({'resultats': chercher_patients(q) if q else []})
+
+
+def api_autocomplete_medecins(request):
+    """GET ?q=... : premiers médecins par nom ou prénom."""
+    q = request.GET.get('q', '').strip()
+    return JsonResponse({'resultats': chercher_medecins(q) if q else []})
+
+
+# Import CSV de rendez-vous
+MAX_ERREURS_AFFICHEES = 200
+
+
+def importer_rdv_csv(request):
+    rapport = None
+    if request.method == 'POST':
+        form = ImportRendezVousForm(request.POST, request.FILES)
+        if form.is_valid():
+            fichier = io.TextIOWrapper(form.cleaned_data['fichier'].file, encoding='utf-8-sig', newline='')
+            try:
+                rapport = importer_rdv(fichier)
+            except UnicodeDecodeError:
+                form.add_error('fichier', "Le fichier doit être encodé en UTF-8.")
+            else:
+                messages.success(request, f"✅ {rapport.crees} rendez-vous importés sur {rapport.lignes} lignes.")
+    else:
+        form = ImportRendezVousForm()
+    return render(request, 'RDV/importer_rdv.html', {
+        'form': form,
+        'rapport': rapport,
+        'erreurs': rapport.erreurs[:MAX_ERREURS_AFFICHEES] if rapport else [],
+        'erreurs_masquees': rapport.rejetees - len(rapport.erreurs[:MAX_ERREURS_AFFICHEES]) if rapport else 0,
+    })
+
+
+# Tableau de bord de la direction : lu uniquement dans les agrégats d'occupation
+JOURS = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
+MOIS = ['Janv.', 'Févr.', 'Mars', 'Avr.', 'Mai', 'Juin', 'Juil.', 'Août', 'Sept.', 'Oct.', 'Nov.', 'Déc.']
+
+
+@role_requis('administrateur')
+def tableau_occupation(request):
+    aujourd_hui = timezone.localdate()
+    bornes = annees_disponibles() or (aujourd_hui.year, aujourd_hui.year)
+    annees = range(min(bornes[0], aujourd_hui.year), max(bornes[1], aujourd_hui.year) + 1)
+    try:
+        annee = int(request.GET.get('annee', aujourd_hui.year))
+    except (TypeError, ValueError):
+        annee = aujourd_hui.year
+    if annee not in annees:
+        annee = aujourd_hui.year
+
+    # Noms lus dans la projection des médecins en cache
+    noms = {m['id']: m for m in annuaire.medecins()}
+    charges = []
+    annee_mois = occupation_annee(annee)
+    for medecin_id, charge in charge_par_medecin(annee_mois).items():
+        medecin = noms.get(medecin_id, {'nom': f'Médecin n°{medecin_id}', 'prenom': '', 'service': ''})
+        charges.append({**charge, 'nom': f"{medecin['nom']} {medecin['prenom']}".strip(),
+                        'service': medecin['service']})
+    charges.sort(key=lambda c: c['nom'])
+
+    occupation = carte_occupation(annee_mois)
+    heures = sorted(set(range(HEURE_OUVERTURE.hour, HEURE_FERMETURE.hour + 1)) | {h for _, h in occupation})
+    jours = sorted(set(range(7)) - set(JOURS_FERMES) | {j for j, _ in occupation})
+    # Opacité de chaque case proportionnelle à la plus chargée
+    maximum = max(occupation.values(), default=0) or 1
+    carte = [
+        (JOURS[jour], [(occupation.get((jour, h), 0), occupation.get((jour, h), 0) / maximum) for h in heures])
+        for jour in jours
+    ]
+    return render(request, 'RDV/tableau_occupation.html', {
+        'annee': annee,
+        'annees': annees,
+        'mois': MOIS,
+        'charges': charges,
+        'heures': heures,
+        'carte': carte,
+    })
@@ -0,0 +1,222 @@
+"""
+API JSON en lecture seule (v1) : rendez-vous, patients, employés, matériels.
+
+    GET /api/v1/<ressource>/            liste paginée par curseur
+    GET /api/v1/<ressource>/<id>/       un seul objet
+
+Paramètres communs :
+    fields=a,b,c   champs renvoyés (tous par défaut)
+    limite=N       taille de page (50 par défaut, 500 au plus)
+    curseur=...    page suivante / précédente (liens fournis dans la réponse)
+et les filtres des pages HTML correspondantes (search, statut, type, etat...).
+Comme sur l'inventaire, la liste des matériels exclut les hors service tant
+qu'aucun filtre etat= n'est donné.
+
+Réservée aux employés connectés (role_requis) ; la ressource employés aux
+administrateurs, sans login ni email (comme l'export de la liste).
+
+Les lignes viennent directement de .values() (aucune instance de modèle) et
+chaque réponse porte un ETag : un client qui renvoie If-None-Match reçoit un
+304 sans corps.
+"""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views import View
+
+from EmployeApp.authentification import role_requis
+from EmployeApp.models import Employe
+from MaterialsApp.models import EtatMateriel, MaterielMedical
+from MaterialsApp.views import filtrer_materiels
+from PatientApp.models import Patient
+from RendezVousApp.models import RendezVous
+from RendezVousApp.pagination import CurseurPaginator
+from RendezVousApp.recherche import filtrer_par_nom, filtrer_patients, filtrer_employes
+
+LIMITE_DEFAUT = 50
+LIMITE_MAX = 500
+
+
+class RessourceApi(View):
+    """
+    Vue générique : les sous-classes définissent le modèle, les champs
+    exposés {nom public: chemin ORM}, l'ordre du curseur et les filtres.
+    """
+    http_method_names = ['get', 'head']
+    model = None
+    champs = {}
+    ordre = ('id',)
+    roles = ()  # rôles autorisés (tous les employés connectés si vide)
+
+    def dispatch(self, request, *args, **kwargs):
+        return role_requis(*self.roles)(super().dispatch)(request, *args, **kwargs)
+
+    def filtrer(self, qs, params):
+        return qs
+
+    def get_queryset(self):
+        return self.model.objects.all()
+
+    def erreur(self, message, status=400):
+        return JsonResponse({'erreur': message}, status=status)
+
+    def champs_demandes(self):
+        """Champs de `fields=` (dans l'ordre demandé) ; ValueError si inconnu."""
+        demandes = [c.strip() for c in self.request.GET.get('fields', '').split(',') if c.strip()]
+        inconnus = [c for c in demandes if c not in self.champs]
+        if inconnus:
+            raise ValueError(f"Champs inconnus : {', '.join(inconnus)}.")
+        return demandes or list(self.champs)
+
+    def lignes(self, qs, noms):
+        """Queryset de dicts contenant `noms` et les champs de l'ordre du curseur."""
+        cles = [o.lstrip('-') for o in self.ordre]
+        directs = {self.champs[n] for n in noms if self.champs[n] == n} | set(cles)
+        alias = {n: F(self.champs[n]) for n in noms if self.champs[n] != n}
+        return qs.values(*directs, **alias)
+
+    def get(self, request, pk=None):
+        try:
+            noms = self.champs_demandes()
+        except ValueError as e:
+            return self.erreur(str(e))
+        qs = self.get_queryset()
+
+        if pk is not None:
+            ligne = self.lignes(qs.filter(pk=pk), noms).first()
+            if ligne is None:
+                return self.erreur("Objet introuvable.", status=404)
+            return self.reponse({n: ligne[n] for n in noms})
+
+        try:
+            limite = min(int(request.GET.get('limite', LIMITE_DEFAUT)), LIMITE_MAX)
+        except ValueError:
+            return self.erreur("Paramètre limite invalide.")
+        if limite < 1:
+            return self.erreur("Paramètre limite invalide.")
+        qs = self.filtrer(qs, request.GET)
+        page = CurseurPaginator(self.lignes(qs, noms), limite, self.ordre).page(request.GET.get('curseur'))
+        return self.reponse({
+            'resultats': [{n: ligne[n] for n in noms} for ligne in page.object_list],
+            'suivant': self.lien(page.curseur_suivant),
+            'precedent': self.lien(page.curseur_precedent),
+        })
+
+    def lien(self, curseur):
+        if curseur is None:
+            return None
+        params = self.request.GET.copy()
+        params['curseur'] = curseur
+        return f'{self.request.path}?{params.urlencode()}'
+
+    def reponse(self, donnees):
+        contenu = json.dumps(donnees, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+        etag = '"%s"' % hashlib.md5(contenu.encode()).hexdigest()
+        non_modifie = get_conditional_response(self.request, etag=etag)
+        if non_modifie is not None:
+            non_modifie['ETag'] = etag
+            return non_modifie
+        response = HttpResponse(contenu, content_type='application/json; charset=utf-8')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class RendezVousApi(RessourceApi):
+    model = RendezVous
+    ordre = ('-date_rdv', '-heure_rdv', '-id')
+    champs = {
+        'id': 'id',
+        'date_rdv': 'date_rdv',
+        'heure_rdv': 'heure_rdv',
+        'statut': 'statut',
+        'patient_id': 'patient_id',
+        'patient_nom': 'patient__nom',
+        'patient_prenom': 'patient__prenom',
+        'medecin_id': 'medecin_id',
+        'medecin_nom': 'medecin__nom',
+        'medecin_prenom': 'medecin__prenom',
+    }
+
+    def filtrer(self, qs, params):
+        if params.get('statut'):
+            qs = qs.filter(statut=params['statut'])
+        if params.get('medecin', '').isdigit():
+            qs = qs.filter(medecin_id=params['medecin'])
+        if params.get('patient', '').isdigit():
+            qs = qs.filter(patient_id=params['patient'])
+        if params.get('search'):
+            qs = filtrer_par_nom(qs, params['search'])
+        return qs
+
+
+class PatientApi(RessourceApi):
+    model = Patient
+    champs = {
+        'id': 'id',
+        'nom': 'nom',
+        'prenom': 'prenom',
+        'dateNaissance': 'dateNaissance',
+        'sexe': 'sexe',
+        'num_tel': 'num_tel',
+        'dossier': 'dossier',
+    }
+
+    def filtrer(self, qs, params):
+        if params.get('sexe'):
+            qs = qs.filter(sexe=params['sexe'])
+        if params.get('search'):
+            qs = filtrer_patients(qs, params['search'])
+        return qs
+
+
+class EmployeApi(RessourceApi):
+    model = Employe
+    roles = ('administrateur',)
+    # mot_de_passe, login et email ne sont jamais exposés
+    champs = {
+        'id': 'id',
+        'nom': 'nom',
+        'prenom': 'prenom',
+        'role': 'role',
+        'telephone': 'telephone',
+        'date_embauche': 'date_embauche',
+        'service': 'service',
+    }
+
+    def filtrer(self, qs, params):
+        if params.get('role'):
+            qs = qs.filter(role=params['role'])
+        if params.get('service'):
+            qs = qs.filter(service=params['service'])
+        if params.get('search'):
+            qs = filtrer_employes(qs, params['search'])
+        return qs
+
+
+class MaterielApi(RessourceApi):
+    model = MaterielMedical
+    ordre = ('IdMaterial',)
+    champs = {
+        'IdMaterial': 'IdMaterial',
+        'Nom': 'Nom',
+        'Type': 'Type',
+        'Reference': 'Reference',
+        'Etat': 'Etat',
+        'Quantite': 'Quantite',
+        'PrixAchat': 'PrixAchat',
+        'DateAcquisition': 'DateAcquisition',
+        'DateExpiration': 'DateExpiration',
+    }
+
+    def filtrer(self, qs, params):
+        # Mêmes filtres que liste_materiels : sans ?etat=, les hors service sont exclus
+        # (le détail /materiels/<id>/ les renvoie toujours)
+        if not params.get('etat'):
+            qs = qs.exclude(Etat=EtatMateriel.HORS_SERVICE)
+        return filtrer_materiels(qs, params.get('search'), params.get('type'), params.get('etat'),
+                                 expiration=params.get('expiration', ''))
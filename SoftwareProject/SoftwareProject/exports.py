@@ -0,0 +1,245 @@
+"""
+Export CSV / XLSX des pages de liste (patients, employés, matériels,
+historique des rendez-vous).
+
+    ?export=csv    ou    ?export=xlsx
+
+sur l'URL de la page, avec ses filtres (search, tri, statut, type...).
+
+Les lignes sont lues par .values_list().iterator(chunk_size=...) (paquet
+par paquet via sync_to_async sous ASGI) et écrites au fil de l'eau dans une
+StreamingHttpResponse : la mémoire reste constante quel que soit le nombre
+de lignes, et le téléchargement commence dès le premier paquet.
+
+Le XLSX est produit sans dépendance : zipfile accepte une sortie non
+positionnable, la feuille est écrite en flux dans l'archive, les textes en
+chaînes en ligne (inlineStr, pas de table de chaînes partagées à garder en
+mémoire).
+"""
+import csv
+import datetime
+import io
+import re
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+
+from .outils import lots
+
+TAILLE_LOT = 2000  # lignes lues par requête
+LIGNES_PAR_PAQUET = 500  # lignes par écriture réseau
+
+
+def format_demande(request):
+    """'csv' ou 'xlsx' si la page est demandée en export (?export=), sinon None."""
+    format_ = request.GET.get('export')
+    return format_ if format_ in FORMATS else None
+
+
+class _Sortie:
+    """Tampon d'écriture vidé après chaque paquet (zipfile n'y fait pas de seek)."""
+
+    def __init__(self):
+        self.morceaux = []
+
+    def write(self, donnees):
+        self.morceaux.append(donnees)
+        return len(donnees)
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        donnees = b''.join(self.morceaux)
+        self.morceaux = []
+        return donnees
+
+
+class ExportCsv:
+    extension = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def __init__(self, entetes):
+        self.entetes = entetes
+        self._texte = io.StringIO()
+        self._writer = csv.writer(self._texte)
+
+    def _vider(self):
+        donnees = self._texte.getvalue().encode('utf-8')
+        self._texte.seek(0)
+        self._texte.truncate()
+        return donnees
+
+    def debut(self):
+        # BOM : Excel reconnaît l'UTF-8 (accents des noms)
+        self._writer.writerow(self.entetes)
+        return b'\xef\xbb\xbf' + self._vider()
+
+    def paquet(self, lignes):
+        self._writer.writerows([_cellule_csv(v) for v in ligne] for ligne in lignes)
+        return self._vider()
+
+    def fin(self):
+        return b''
+
+
+def _cellule_csv(valeur):
+    # Un texte commençant par = + - @ serait lu comme une formule par un tableur
+    if isinstance(valeur, str) and valeur[:1] in ('=', '+', '-', '@'):
+        return "'" + valeur
+    return '' if valeur is None else valeur
+
+
+_XLSX_PARTIES = [
+    ('[Content_Types].xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+     '<Default Extension="xml" ContentType="application/xml"/>'
+     '<Override PartName="/xl/workbook.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+     '<Override PartName="/xl/worksheets/sheet1.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+     '<Override PartName="/xl/styles.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+     '</Types>'),
+    ('_rels/.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+     'Target="xl/workbook.xml"/>'
+     '</Relationships>'),
+    ('xl/workbook.xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+     'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+     '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets>'
+     '</workbook>'),
+    ('xl/_rels/workbook.xml.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+     'Target="worksheets/sheet1.xml"/>'
+     '<Relationship Id="rId2" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+     'Target="styles.xml"/>'
+     '</Relationships>'),
+    # Styles de cellule : 0 standard, 1 date, 2 heure, 3 date et heure
+    ('xl/styles.xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+     '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+     '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+     '<fill><patternFill patternType="gray125"/></fill></fills>'
+     '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+     '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+     '<cellXfs count="4">'
+     '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+     '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+     '<xf numFmtId="20" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+     '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+     '</cellXfs>'
+     '</styleSheet>'),
+]
+_XLSX_FEUILLE_DEBUT = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_XLSX_FEUILLE_FIN = '</sheetData></worksheet>'
+_EPOQUE_EXCEL = datetime.datetime(1899, 12, 30)
+_CARACTERES_INTERDITS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')  # refusés par XML 1.0
+
+
+def _cellule_xlsx(valeur):
+    if valeur is None:
+        return '<c/>'
+    if isinstance(valeur, bool):
+        return f'<c t="b"><v>{int(valeur)}</v></c>'
+    if isinstance(valeur, (int, float, Decimal)):
+        return f'<c><v>{valeur}</v></c>'
+    # Dates et heures : numéros de série Excel, affichés avec le style correspondant
+    if isinstance(valeur, datetime.datetime):
+        if timezone.is_aware(valeur):
+            valeur = timezone.make_naive(valeur)
+        return f'<c s="3"><v>{(valeur - _EPOQUE_EXCEL).total_seconds() / 86400}</v></c>'
+    if isinstance(valeur, datetime.date):
+        return f'<c s="1"><v>{(valeur - _EPOQUE_EXCEL.date()).days}</v></c>'
+    if isinstance(valeur, datetime.time):
+        secondes = valeur.hour * 3600 + valeur.minute * 60 + valeur.second
+        return f'<c s="2"><v>{secondes / 86400}</v></c>'
+    texte = escape(_CARACTERES_INTERDITS.sub('', str(valeur)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texte}</t></is></c>'
+
+
+def _ligne_xlsx(valeurs):
+    return '<row>' + ''.join(_cellule_xlsx(v) for v in valeurs) + '</row>'
+
+
+class ExportXlsx:
+    extension = 'xlsx'
+    content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+    def __init__(self, entetes):
+        self.entetes = entetes
+        self._sortie = _Sortie()
+        self._zip = zipfile.ZipFile(self._sortie, 'w', zipfile.ZIP_DEFLATED)
+
+    def debut(self):
+        for nom, contenu in _XLSX_PARTIES:
+            self._zip.writestr(nom, contenu)
+        # Taille inconnue d'avance : en-têtes ZIP64 au cas où la feuille dépasse 4 Go
+        self._feuille = self._zip.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True)
+        self._feuille.write((_XLSX_FEUILLE_DEBUT + _ligne_xlsx(self.entetes)).encode('utf-8'))
+        return self._sortie.vider()
+
+    def paquet(self, lignes):
+        self._feuille.write(''.join(_ligne_xlsx(ligne) for ligne in lignes).encode('utf-8'))
+        return self._sortie.vider()
+
+    def fin(self):
+        self._feuille.write(_XLSX_FEUILLE_FIN.encode('utf-8'))
+        self._feuille.close()
+        self._zip.close()
+        return self._sortie.vider()
+
+
+FORMATS = {'csv': ExportCsv, 'xlsx': ExportXlsx}
+
+
+def _flux(export, paquets):
+    yield export.debut()
+    for paquet in paquets:
+        yield export.paquet(paquet)
+    yield export.fin()
+
+
+async def _aflux(export, paquets):
+    # Chaque paquet est lu dans le thread de l'ORM, la boucle n'est pas bloquée
+    yield export.debut()
+    while paquet := await sync_to_async(next)(paquets, None):
+        yield export.paquet(paquet)
+    yield export.fin()
+
+
+def reponse_export(request, qs, colonnes, nom):
+    """
+    Réponse en flux du queryset `qs` au format demandé (format_demande()).
+    `colonnes` : [(chemin ORM, en-tête)] ; `nom` : début du nom de fichier.
+    """
+    export = FORMATS[format_demande(request)]([entete for _, entete in colonnes])
+    lignes = qs.values_list(*[chemin for chemin, _ in colonnes]).iterator(chunk_size=TAILLE_LOT)
+    paquets = lots(lignes, LIGNES_PAR_PAQUET)
+    # Sous ASGI, un itérateur synchrone serait lu en entier avant l'envoi
+    flux = _aflux(export, paquets) if hasattr(request, 'scope') else _flux(export, paquets)
+    response = StreamingHttpResponse(flux, content_type=export.content_type)
+    nom_fichier = f'{nom}_{timezone.localdate():%Y-%m-%d}.{export.extension}'
+    response['Content-Disposition'] = content_disposition_header(True, nom_fichier)
+    response['Cache-Control'] = 'private, no-store'
+    return response
@@ -0,0 +1,39 @@
+"""
+Petits utilitaires communs aux applications (imports, exports, commandes).
+"""
+import csv
+from itertools import islice
+
+ERREURS_GARDEES = 200
+
+
+def lots(iterable, taille):
+    """Découpe `iterable` en listes d'au plus `taille` éléments, sans tout charger."""
+    iterateur = iter(iterable)
+    while lot := list(islice(iterateur, taille)):
+        yield lot
+
+
+class RapportImport:
+    """
+    Bilan d'un import. Chaque ligne rejetée est écrite aussitôt dans `rejets`
+    (fichier CSV ligne,erreur) s'il est fourni ; seules les `gardees`
+    premières restent en mémoire, pour l'aperçu, avec le nombre total.
+    """
+
+    def __init__(self, rejets=None, gardees=ERREURS_GARDEES):
+        self.lignes = 0
+        self.crees = 0
+        self.rejetees = 0
+        self.erreurs = []  # [(numéro de ligne, message)], au plus `gardees`
+        self.gardees = gardees
+        self._writer = csv.writer(rejets) if rejets is not None else None
+        if self._writer:
+            self._writer.writerow(['ligne', 'erreur'])
+
+    def erreur(self, ligne, message):
+        self.rejetees += 1
+        if self._writer:
+            self._writer.writerow([ligne, message])
+        if len(self.erreurs) < self.gardees:
+            self.erreurs.append((ligne, message))
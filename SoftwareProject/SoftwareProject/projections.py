@@ -0,0 +1,127 @@
+"""
+Valeurs calculées gardées dans le cache partagé (CACHES, voir settings.py) :
+agendas de la semaine, mois du tableau d'occupation, annuaire des médecins,
+types de matériel, résumé des expirations.
+
+Ces clés sont lues et invalidées par plusieurs processus : les workers web et
+les commandes lancées par cron (clôture, import, alertes). Le cache doit donc
+être commun à tous ; `manage.py check --deploy` refuse un cache propre à
+chaque processus (contrôle verifier_cache_partage ci-dessous).
+
+Chaque valeur est rangée sous sa clé suivie d'un jeton de version, lui-même
+en cache. Invalider, c'est supprimer le jeton : la lecture suivante en tire
+un nouveau et recalcule. Le jeton est lu avant le calcul : un calcul commencé
+avant l'invalidation (lecture d'une transaction pas encore validée) est rangé
+sous l'ancien jeton, que plus personne ne lit, et ne peut donc pas écraser
+l'invalidation. Les valeurs expirent en outre au bout de `duree` : filet de
+sécurité si une invalidation manque (écriture directe en base).
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.checks import Error, Tags, register
+from django.db import transaction
+
+DUREE = 15 * 60
+DUREE_VERSION = 24 * 3600
+CACHES_LOCAUX = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def _cle_version(cle):
+    return f'{cle}:version'
+
+
+def _jeton():
+    return uuid.uuid4().hex[:12]
+
+
+def _versions(cles):
+    """{clé: jeton}, jetons manquants créés par add() (un seul gagnant)."""
+    cles_version = {_cle_version(cle): cle for cle in cles}
+    jetons = cache.get_many(cles_version)
+    for cle_version in cles_version.keys() - jetons.keys():
+        jeton = _jeton()
+        if not cache.add(cle_version, jeton, DUREE_VERSION):
+            jeton = cache.get(cle_version, jeton)
+        jetons[cle_version] = jeton
+    return {cles_version[cle_version]: jeton for cle_version, jeton in jetons.items()}
+
+
+async def _aversions(cles):
+    cles_version = {_cle_version(cle): cle for cle in cles}
+    jetons = await cache.aget_many(cles_version)
+    for cle_version in cles_version.keys() - jetons.keys():
+        jeton = _jeton()
+        if not await cache.aadd(cle_version, jeton, DUREE_VERSION):
+            jeton = await cache.aget(cle_version, jeton)
+        jetons[cle_version] = jeton
+    return {cles_version[cle_version]: jeton for cle_version, jeton in jetons.items()}
+
+
+def lire(cle, calculer, duree=DUREE):
+    """Valeur de `cle`, ou calculer() rangée sous la version lue avant le calcul (None n'est pas gardé)."""
+    cle_valeur = f'{cle}:{_versions([cle])[cle]}'
+    valeur = cache.get(cle_valeur)
+    if valeur is None:
+        valeur = calculer()
+        if valeur is not None:
+            cache.set(cle_valeur, valeur, duree)
+    return valeur
+
+
+async def alire(cle, acalculer, duree=DUREE):
+    """Version asynchrone de lire() ; `acalculer` est une fonction async."""
+    cle_valeur = f'{cle}:{(await _aversions([cle]))[cle]}'
+    valeur = await cache.aget(cle_valeur)
+    if valeur is None:
+        valeur = await acalculer()
+        if valeur is not None:
+            await cache.aset(cle_valeur, valeur, duree)
+    return valeur
+
+
+def lire_plusieurs(cles, calculer, duree=DUREE):
+    """
+    {clé: valeur} des `cles` ; celles qui manquent sont calculées ensemble
+    par calculer(clés manquantes) -> {clé: valeur}.
+    """
+    cles_valeur = {f'{cle}:{jeton}': cle for cle, jeton in _versions(cles).items()}
+    valeurs = {cles_valeur[c]: v for c, v in cache.get_many(cles_valeur).items()}
+    manquantes = [cle for cle in cles if cle not in valeurs]
+    if manquantes:
+        calculees = calculer(manquantes)
+        cache.set_many({c: calculees[cle] for c, cle in cles_valeur.items() if cle in calculees}, duree)
+        valeurs.update(calculees)
+    return valeurs
+
+
+def invalider(cles):
+    """Nouvelle version pour chacune des `cles`, tout de suite."""
+    cache.delete_many([_cle_version(cle) for cle in cles])
+
+
+def invalider_apres_validation(cles):
+    """
+    invalider() une fois la transaction en cours validée : avant, une lecture
+    rangerait l'ancien contenu de la base sous la nouvelle version.
+    """
+    cles = list(cles)
+    if cles:
+        transaction.on_commit(lambda: invalider(cles))
+
+
+@register(Tags.caches, deploy=True)
+def verifier_cache_partage(app_configs, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in CACHES_LOCAUX:
+        return [Error(
+            "Le cache par défaut n'est pas partagé entre les processus : sessions, "
+            "tentatives de connexion et projections divergeraient d'un worker à l'autre.",
+            hint="Définir CACHE_URL (redis://hôte:6379/0 ou memcached://hôte:11211).",
+            id='SoftwareProject.E001',
+        )]
+    return []
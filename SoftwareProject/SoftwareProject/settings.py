@@ -126,6 +126,48 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 
+# Fichiers envoyés (dossiers patients sous dossiers_patients/), hors de
+# l'arborescence du code ; MEDIA_ROOT dans l'environnement pour les placer ailleurs
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', BASE_DIR / 'media'))
+
+# Dossiers patients : taille maximale d'un envoi, et remise du fichier au
+# serveur frontal s'il en est configuré un : None (Django sert le fichier),
+# 'x-sendfile' (Apache, lighttpd) ou 'x-accel-redirect' (nginx, emplacement
+# interne DOSSIERS_ACCEL_PREFIXE pointant sur MEDIA_ROOT).
+DOSSIERS_TAILLE_MAX = 500 * 1024 * 1024
+DOSSIERS_ENVOI = None
+DOSSIERS_ACCEL_PREFIXE = '/protege/'
+
+# Page de connexion des vues réservées au personnel
+LOGIN_URL = 'connexion_employe'
+
+# Connexion des employés (login / mot de passe de Employe) en plus des
+# comptes de l'administration ; mots de passe hachés par PASSWORD_HASHERS
+AUTHENTICATION_BACKENDS = [
+    'django.contrib.auth.backends.ModelBackend',
+    'EmployeApp.authentification.EmployeBackend',
+]
+
+# Cache commun à tous les processus : les workers web et les commandes lancées
+# par cron (clôture, import, alertes) lisent et invalident les mêmes clés
+# (sessions, tentatives de connexion, projections de SoftwareProject/projections.py).
+# CACHE_URL : redis://hôte:6379/0 (paquet redis) ou memcached://hôte:11211
+# (paquet pymemcache). Sans CACHE_URL, cache propre au processus : pour le
+# développement avec un seul processus, refusé par `manage.py check --deploy`.
+CACHE_URL = os.environ.get('CACHE_URL', '')
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}}
+elif CACHE_URL.startswith('memcached://'):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+                          'LOCATION': CACHE_URL.removeprefix('memcached://')}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Sessions lues dans le cache (écrites aussi en base) : le rôle de
+# l'employé connecté est relu sans requête SQL
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,393 @@
+"""
+Budgets de requêtes SQL par vue.
+
+Chaque vue de liste/détail des applications est rendue sur des données de
+test, puis de nouveau après avoir multiplié le nombre de lignes : le nombre
+de requêtes doit rester identique (pas de N+1) et ne pas dépasser le budget
+fixé ci-dessous.
+"""
+import csv
+import datetime
+import io
+import time
+import zipfile
+from xml.etree import ElementTree
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from EmployeApp.models import Employe
+from MaterialsApp.models import EtatMateriel, MaterielMedical
+from PatientApp.models import Patient
+from RendezVousApp.models import RendezVous
+
+from . import projections
+
+
+class BudgetRequetesTests(TestCase):
+
+    # nom de l'URL -> nombre maximal de requêtes
+    BUDGETS = {
+        'liste_rdv': 2,
+        'historique_rdv': 3,
+        'historique_medecin': 3,
+        'ajouter_rdv': 0,
+        'update_rdv': 3,
+        'ajouter_serie_rdv': 0,
+        'liste_patients': 1,
+        'ajouter_patient': 0,
+        'liste_employes': 2,  # page + projection des médecins (cache vidé avant chaque mesure)
+        'ajouter_employe': 1,  # session relue en base : le cache est vidé avant chaque mesure
+        'liste_materiels': 4,
+        'ajouter_materiel': 0,
+        'materiel_detail': 1,
+        'modifier_materiel': 1,
+        'supprimer_materiel': 1,
+        # session + bornes de l'index (2) + projection des médecins + charges + carte
+        'tableau_occupation': 6,
+    }
+
+    def setUp(self):
+        self.compteur = 0
+        self.jour = timezone.localdate() + datetime.timedelta(days=7)
+        while self.jour.weekday() in [5, 6]:
+            self.jour += datetime.timedelta(days=1)
+        self.peupler(3)
+        # ajouter_employe est réservée aux administrateurs connectés
+        session = self.client.session
+        session['employe'] = {'id': self.medecin.pk, 'nom': 'Admin', 'prenom': 'Test',
+                              'role': 'administrateur', 'service': 'Direction', 'connecte_le': time.time()}
+        session.save()
+
+    def peupler(self, n):
+        """Ajoute n lignes de chaque sorte (patients, médecins, RDV de chaque statut, matériels)."""
+        for _ in range(n):
+            self.compteur += 1
+            i = self.compteur
+            patient = Patient.objects.create(
+                nom=f'Nom{i}', prenom=f'Prenom{i}', dateNaissance=datetime.date(1980, 1, 1),
+                sexe='Femme', num_tel='98123456', dossier='dossiers_patients/test.pdf',
+            )
+            medecin = Employe.objects.create(
+                nom=f'Dr{i}', prenom=f'Med{i}', role='medecin', login=f'med{i}', mot_de_passe='x',
+                email=f'med{i}@clinique.tn', telephone='71000000',
+                date_embauche=datetime.date(2020, 1, 1), service='Cardiologie',
+            )
+            for h, statut in enumerate(['prévu', 'terminé', 'annulé']):
+                RendezVous.objects.create(patient=patient, medecin=medecin, date_rdv=self.jour,
+                                          heure_rdv=datetime.time(8 + h, 0), statut=statut)
+            for etat in ['EN_SERVICE', 'HORS_SERVICE']:
+                MaterielMedical.objects.create(
+                    Nom=f'Materiel{i}', Type=f'Type{i % 4}', Reference=f'REF-{i}', Etat=etat, Quantite=1,
+                    PrixAchat=10, DateAcquisition=datetime.date(2024, 1, 1), DateExpiration=datetime.date(2030, 1, 1),
+                )
+        self.medecin = Employe.objects.filter(role='medecin').first()
+        self.rdv = RendezVous.objects.filter(statut='prévu').first()
+        self.materiel = MaterielMedical.objects.first()
+
+    def urls(self):
+        args = {
+            'historique_medecin': [self.medecin.pk],
+            'update_rdv': [self.rdv.pk],
+            'materiel_detail': [self.materiel.pk],
+            'modifier_materiel': [self.materiel.pk],
+            'supprimer_materiel': [self.materiel.pk],
+        }
+        return {nom: reverse(nom, args=args.get(nom)) for nom in self.BUDGETS}
+
+    def mesurer(self):
+        resultats = {}
+        for nom, url in self.urls().items():
+            cache.clear()
+            with CaptureQueriesContext(connection) as requetes:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, nom)
+            resultats[nom] = requetes
+        return resultats
+
+    # vue synchrone (WSGI) -> variante async servie sur sa propre route (ASGI)
+    VARIANTES_ASYNC = {
+        'liste_rdv': 'liste_rdv_async',
+        'historique_rdv': 'historique_rdv_async',
+        'historique_medecin': 'historique_medecin_async',
+        'liste_patients': 'liste_patients_async',
+        'liste_employes': 'liste_employes_async',
+        'liste_materiels': 'liste_materiels_async',
+        'materiel_detail': 'materiel_detail_async',
+    }
+
+    def test_vues_synchrones_et_variantes_async(self):
+        urls = self.urls()
+        for nom, nom_async in self.VARIANTES_ASYNC.items():
+            with self.subTest(vue=nom):
+                correspondance = resolve(urls[nom])
+                self.assertFalse(iscoroutinefunction(correspondance.func))
+                self.assertTrue(iscoroutinefunction(resolve(reverse(nom_async, kwargs=correspondance.kwargs)).func))
+
+    async def test_vues_async_sous_asgi(self):
+        """Les variantes async répondent via la pile ASGI (AsyncClient), avec le même contenu."""
+        urls = await sync_to_async(self.urls)()
+        for nom, nom_async in self.VARIANTES_ASYNC.items():
+            with self.subTest(vue=nom_async):
+                url_async = reverse(nom_async, kwargs=resolve(urls[nom]).kwargs)
+                response = await self.async_client.get(url_async, {'search': 'nom1'})
+                self.assertEqual(response.status_code, 200)
+                attendu = await sync_to_async(self.client.get)(urls[nom], {'search': 'nom1'})
+                self.assertEqual(response.templates[0].name, attendu.templates[0].name)
+        response = await self.async_client.get(reverse('historique_rdv_async'), {'page': 'x'})
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get(reverse('liste_rdv_async'), {'page': 99})
+        self.assertEqual(response.status_code, 404)
+
+    def test_budget_independant_du_nombre_de_lignes(self):
+        avant = self.mesurer()
+        self.peupler(12)
+        apres = self.mesurer()
+        for nom, budget in self.BUDGETS.items():
+            with self.subTest(vue=nom):
+                requetes = '\n'.join(q['sql'] for q in apres[nom].captured_queries)
+                self.assertEqual(len(avant[nom]), len(apres[nom]), requetes)
+                self.assertLessEqual(len(apres[nom]), budget, requetes)
+
+
+class ApiLectureTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jour = timezone.localdate() + datetime.timedelta(days=7)
+        while cls.jour.weekday() in [5, 6]:
+            cls.jour += datetime.timedelta(days=1)
+        cls.patient = Patient.objects.create(
+            nom='Ben Salah', prenom='Amine', dateNaissance=datetime.date(1980, 1, 1),
+            sexe='Homme', num_tel='98123456', dossier='dossiers_patients/test.pdf',
+        )
+        cls.medecin = Employe.objects.create(
+            nom='Trabelsi', prenom='Sami', role='medecin', login='strabelsi', mot_de_passe='secret',
+            email='s.trabelsi@clinique.tn', telephone='71000000',
+            date_embauche=datetime.date(2020, 1, 1), service='Cardiologie',
+        )
+        for h in range(5):
+            RendezVous.objects.create(patient=cls.patient, medecin=cls.medecin, date_rdv=cls.jour,
+                                      heure_rdv=datetime.time(8 + h, 0), statut='terminé' if h else 'prévu')
+        MaterielMedical.objects.create(
+            Nom='Tensiomètre', Type='Diagnostic', Reference='REF-1', Quantite=2,
+            PrixAchat='120.50', DateAcquisition=datetime.date(2024, 1, 1), DateExpiration=datetime.date(2030, 1, 1),
+        )
+
+    def setUp(self):
+        self.connecter('administrateur')
+
+    def connecter(self, role):
+        session = self.client.session
+        session['employe'] = {'id': self.medecin.pk, 'nom': 'Trabelsi', 'prenom': 'Sami',
+                              'role': role, 'service': 'Cardiologie', 'connecte_le': time.time()}
+        session.save()
+
+    def test_reservee_aux_employes_connectes(self):
+        self.client.logout()
+        for nom in ['api_rendezvous', 'api_patients', 'api_employes', 'api_materiels']:
+            with self.subTest(api=nom):
+                response = self.client.get(reverse(nom))
+                self.assertEqual(response.status_code, 302)
+                self.assertTrue(response['Location'].startswith(reverse('connexion_employe')))
+        # Employés : administrateurs seulement
+        self.connecter('medecin')
+        self.assertEqual(self.client.get(reverse('api_patients')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('api_employes')).status_code, 403)
+
+    def test_champs_et_pagination_par_curseur(self):
+        url = reverse('api_rendezvous')
+        with self.assertNumQueries(1):
+            donnees = self.client.get(url, {'fields': 'id,heure_rdv,patient_nom', 'limite': 2}).json()
+        self.assertEqual(donnees['resultats'][0], {
+            'id': RendezVous.objects.get(heure_rdv=datetime.time(12, 0)).pk,
+            'heure_rdv': '12:00:00', 'patient_nom': 'Ben Salah',
+        })
+        self.assertIsNone(donnees['precedent'])
+        vus = [r['heure_rdv'] for r in donnees['resultats']]
+        while donnees['suivant']:
+            donnees = self.client.get(donnees['suivant']).json()
+            vus += [r['heure_rdv'] for r in donnees['resultats']]
+        self.assertEqual(vus, ['12:00:00', '11:00:00', '10:00:00', '09:00:00', '08:00:00'])
+
+    def test_filtres(self):
+        donnees = self.client.get(reverse('api_rendezvous'), {'statut': 'prévu', 'search': 'amine'}).json()
+        self.assertEqual(len(donnees['resultats']), 1)
+        donnees = self.client.get(reverse('api_employes'), {'role': 'medecin', 'search': 'trab'}).json()
+        self.assertEqual([e['nom'] for e in donnees['resultats']], ['Trabelsi'])
+        self.assertNotIn('login', donnees['resultats'][0])
+        self.assertNotIn('email', donnees['resultats'][0])
+        self.assertNotIn('mot_de_passe', donnees['resultats'][0])
+        donnees = self.client.get(reverse('api_materiels'), {'type': 'diag', 'fields': 'Nom,PrixAchat'}).json()
+        self.assertEqual(donnees['resultats'], [{'Nom': 'Tensiomètre', 'PrixAchat': '120.50'}])
+        # Hors service : exclus par défaut, comme dans liste_materiels
+        ancien = MaterielMedical.objects.create(
+            Nom='Ancien tensiomètre', Type='Diagnostic', Reference='REF-2', Etat=EtatMateriel.HORS_SERVICE,
+            Quantite=1, PrixAchat='10.00', DateAcquisition=datetime.date(2010, 1, 1),
+            DateExpiration=datetime.date(2015, 1, 1),
+        )
+        donnees = self.client.get(reverse('api_materiels'), {'type': 'diag', 'fields': 'Nom'}).json()
+        self.assertEqual(donnees['resultats'], [{'Nom': 'Tensiomètre'}])
+        donnees = self.client.get(reverse('api_materiels'), {'etat': EtatMateriel.HORS_SERVICE, 'fields': 'Nom'}).json()
+        self.assertEqual(donnees['resultats'], [{'Nom': 'Ancien tensiomètre'}])
+        detail = self.client.get(reverse('api_materiels_detail', args=[ancien.pk]), {'fields': 'Nom'}).json()
+        self.assertEqual(detail, {'Nom': 'Ancien tensiomètre'})
+        donnees = self.client.get(reverse('api_patients'), {'search': 'ben sal'}).json()
+        self.assertEqual(donnees['resultats'][0]['prenom'], 'Amine')
+
+    def test_detail_et_erreurs(self):
+        url = reverse('api_patients_detail', args=[self.patient.pk])
+        self.assertEqual(self.client.get(url, {'fields': 'nom'}).json(), {'nom': 'Ben Salah'})
+        self.assertEqual(self.client.get(reverse('api_patients_detail', args=[9999])).status_code, 404)
+        response = self.client.get(reverse('api_employes'), {'fields': 'nom,mot_de_passe'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('mot_de_passe', response.json()['erreur'])
+        self.assertEqual(self.client.get(reverse('api_patients'), {'limite': 'x'}).status_code, 400)
+        self.assertEqual(self.client.post(reverse('api_patients')).status_code, 405)
+
+    def test_etag(self):
+        url = reverse('api_rendezvous')
+        response = self.client.get(url)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        RendezVous.objects.filter(statut='prévu').update(statut='annulé')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ExportListesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patients = [
+            Patient.objects.create(nom=nom, prenom=prenom, dateNaissance=datetime.date(1980, 1, i + 1),
+                                   sexe='Homme', num_tel=f'9812345{i}')
+            for i, (nom, prenom) in enumerate([('Ben Salah', 'Amine'), ('Gharbi', 'Inès'), ('=Jaziri', 'Ali')])
+        ]
+        cls.medecin = Employe.objects.create(
+            nom='Trabelsi', prenom='Sami', role='medecin', login='strabelsi', mot_de_passe='secret',
+            email='s.trabelsi@clinique.tn', telephone='71000000',
+            date_embauche=datetime.date(2020, 1, 1), service='Cardiologie',
+        )
+        jour = datetime.date(2024, 3, 4)
+        for h, statut in enumerate(['terminé', 'annulé', 'terminé', 'prévu']):
+            RendezVous.objects.create(patient=cls.patients[0], medecin=cls.medecin, date_rdv=jour,
+                                      heure_rdv=datetime.time(8 + h, 0), statut=statut)
+        for nom, etat in [('Tensiomètre', 'EN_SERVICE'), ('Défibrillateur', 'HORS_SERVICE')]:
+            MaterielMedical.objects.create(
+                Nom=nom, Type='Diagnostic', Reference='REF-1', Etat=etat, Quantite=2, PrixAchat='120.50',
+                DateAcquisition=datetime.date(2024, 1, 1), DateExpiration=datetime.date(2030, 1, 1),
+            )
+
+    def lignes_csv(self, response):
+        self.assertTrue(response.streaming)
+        contenu = b''.join(response.streaming_content)
+        self.assertTrue(contenu.startswith(b'\xef\xbb\xbf'))
+        return list(csv.reader(io.StringIO(contenu.decode('utf-8-sig'))))
+
+    def test_csv_patients_filtre_et_trie(self):
+        response = self.client.get(reverse('liste_patients'), {'export': 'csv', 'tri': '-nom'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="patients_', response['Content-Disposition'])
+        lignes = self.lignes_csv(response)
+        self.assertEqual(lignes[0], ['ID', 'Nom', 'Prénom', 'Date de naissance', 'Sexe', 'Téléphone'])
+        # Texte commençant par '=' neutralisé pour les tableurs
+        self.assertEqual([l[1] for l in lignes[1:]], ['Gharbi', 'Ben Salah', "'=Jaziri"])
+        lignes = self.lignes_csv(self.client.get(reverse('liste_patients'), {'export': 'csv', 'search': 'ines'}))
+        self.assertEqual(lignes[1][1:], ['Gharbi', 'Inès', '1980-01-02', 'Homme', '98123451'])
+
+    def test_csv_employes_materiels_historique(self):
+        # Logins et emails : export réservé aux administrateurs
+        response = self.client.get(reverse('liste_employes'), {'export': 'csv'})
+        self.assertTrue(response['Location'].startswith(reverse('connexion_employe')))
+        session = self.client.session
+        session['employe'] = {'id': self.medecin.pk, 'nom': 'Trabelsi', 'prenom': 'Sami',
+                              'role': 'medecin', 'service': 'Cardiologie', 'connecte_le': time.time()}
+        session.save()
+        self.assertEqual(self.client.get(reverse('liste_employes'), {'export': 'csv'}).status_code, 403)
+        session['employe'] = {**session['employe'], 'role': 'administrateur'}
+        session.save()
+        lignes = self.lignes_csv(self.client.get(reverse('liste_employes'), {'export': 'csv'}))
+        self.assertNotIn('secret', sum(lignes, []))
+        self.assertEqual(lignes[1][1:5], ['Trabelsi', 'Sami', 'medecin', 'Cardiologie'])
+
+        # Hors service compris, filtres de la page appliqués
+        lignes = self.lignes_csv(self.client.get(reverse('liste_materiels'), {'export': 'csv', 'type': 'diag'}))
+        self.assertEqual([l[1] for l in lignes[1:]], ['Défibrillateur', 'Tensiomètre'])
+        lignes = self.lignes_csv(self.client.get(reverse('liste_materiels'), {'export': 'csv', 'etat': 'en_service'}))
+        self.assertEqual(len(lignes), 2)
+
+        lignes = self.lignes_csv(self.client.get(reverse('historique_rdv'), {'export': 'csv', 'statut': 'terminé'}))
+        self.assertEqual([l[:3] for l in lignes[1:]], [['2024-03-04', '10:00:00', 'terminé'],
+                                                       ['2024-03-04', '08:00:00', 'terminé']])
+
+    def test_xlsx(self):
+        response = self.client.get(reverse('historique_rdv'), {'export': 'xlsx'})
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIn('xl/workbook.xml', archive.namelist())
+        ns = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        feuille = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        lignes = feuille.findall('.//x:row', ns)
+        self.assertEqual(len(lignes), 4)  # en-tête + 3 RDV passés
+        entete = [c.findtext('.//x:t', namespaces=ns) for c in lignes[0]]
+        self.assertEqual(entete[:3], ['Date', 'Heure', 'Statut'])
+        date, heure, statut = list(lignes[1])[:3]
+        # Numéros de série Excel : 04/03/2024 = 45355, 10 h = 10/24
+        self.assertEqual((date.get('s'), date.findtext('x:v', namespaces=ns)), ('1', '45355'))
+        self.assertAlmostEqual(float(heure.findtext('x:v', namespaces=ns)), 10 / 24)
+        self.assertEqual(statut.findtext('.//x:t', namespaces=ns), 'terminé')
+
+    async def test_flux_asynchrone_sous_asgi(self):
+        response = await self.async_client.get(reverse('liste_patients'), {'export': 'csv'})
+        self.assertTrue(response.is_async)
+        contenu = b''.join([morceau async for morceau in response.streaming_content])
+        self.assertEqual(len(contenu.decode('utf-8-sig').splitlines()), 4)
+        # Variante async de la liste des employés : même contrôle du rôle
+        response = await self.async_client.get(reverse('liste_employes_async'), {'export': 'csv'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_page_normale_sans_export(self):
+        response = self.client.get(reverse('liste_patients'), {'export': 'pdf'})
+        self.assertFalse(response.streaming)
+        self.assertContains(response, 'Ben Salah')
+
+
+class ProjectionsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_remplissage_tardif_ignore(self):
+        calculs = []
+
+        def calculer():
+            calculs.append(1)
+            if len(calculs) == 1:
+                # Invalidation (écriture validée ailleurs) pendant le calcul
+                projections.invalider(['test:cle'])
+            return len(calculs)
+
+        self.assertEqual(projections.lire('test:cle', calculer), 1)
+        # Le premier résultat, rangé sous l'ancienne version, n'est pas relu
+        self.assertEqual(projections.lire('test:cle', calculer), 2)
+        self.assertEqual(projections.lire('test:cle', calculer), 2)
+
+    def test_invalidation_apres_validation(self):
+        projections.lire('test:cle', lambda: 'ancien')
+        with self.captureOnCommitCallbacks(execute=True):
+            projections.invalider_apres_validation(['test:cle'])
+            self.assertEqual(projections.lire('test:cle', lambda: 'pendant'), 'ancien')
+        self.assertEqual(projections.lire('test:cle', lambda: 'nouveau'), 'nouveau')
+
+    def test_cache_partage_exige_en_deploiement(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([e.id for e in projections.verifier_cache_partage(None)], ['SoftwareProject.E001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                                                   'LOCATION': 'redis://127.0.0.1:6379/0'}}):
+            self.assertEqual(projections.verifier_cache_partage(None), [])
@@ -17,6 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path,include
 from . import views  # importe la vue home
+from . import api
 
 
 urlpatterns = [
@@ -39,5 +40,15 @@ urlpatterns = [
     path('patients/', include('PatientApp.urls')),
     path('employes/', include('EmployeApp.urls')),
 
+    # API JSON en lecture seule
+    path('api/v1/rendezvous/', api.RendezVousApi.as_view(), name='api_rendezvous'),
+    path('api/v1/rendezvous/<int:pk>/', api.RendezVousApi.as_view(), name='api_rendezvous_detail'),
+    path('api/v1/patients/', api.PatientApi.as_view(), name='api_patients'),
+    path('api/v1/patients/<int:pk>/', api.PatientApi.as_view(), name='api_patients_detail'),
+    path('api/v1/employes/', api.EmployeApi.as_view(), name='api_employes'),
+    path('api/v1/employes/<int:pk>/', api.EmployeApi.as_view(), name='api_employes_detail'),
+    path('api/v1/materiels/', api.MaterielApi.as_view(), name='api_materiels'),
+    path('api/v1/materiels/<int:pk>/', api.MaterielApi.as_view(), name='api_materiels_detail'),
+
 
 ]